@@ -13,7 +13,18 @@ def create_app():
     app.config['SESSION_TYPE'] = 'filesystem'
 
     # Import routes after app is created to avoid circular imports
-    from src import routes
+    from src import routes, utils
+    from src.finance import import_jobs
+    from src.models import db
+
+    # Dates are stored as ISO YYYY-MM-DD and displayed as DD/MM/YYYY
+    app.add_template_filter(utils.format_date_for_display, 'display_date')
+
+    # One database connection and transaction per request
+    db.init_app(app)
+
+    # Statement imports cut short by the previous run can be resumed
+    import_jobs.init_app(app)
 
     # Register routes
     routes.register_routes(app)
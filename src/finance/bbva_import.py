@@ -1,24 +1,213 @@
 """
-BBVA bank statement import functionality.
+Bank statement import: categorization, duplicate checks and bulk insertion.
+
+Statements in any of the formats of src.finance.importers (BBVA Excel, CSV,
+OFX, CAMT.053 and Norma 43) are streamed as common transaction records and
+go through the same pipeline, batch by batch.
+
+Each batch is inserted in bulk and committed in a transaction of its own,
+so the write lock is only held while one batch is stored. An import as a
+whole is therefore not atomic: if it fails, the batches committed before
+the error stay in the database, and the import is resumed after them
+(see import_statement's skip_rows) rather than rolled back.
 """
 import os
-import openpyxl
-from datetime import datetime
-from src.finance import expenses
-from src.finance.category_matcher import match_expense_category, match_income_source
+import sqlite3
+import time
+from collections import defaultdict
+from datetime import date, timedelta
+from itertools import islice
+from src.finance import expenses, importers
+# Kept importable from here for the callers of the Excel-only importer
+from src.finance.importers.xlsx import iter_statement_rows, parse_transactions
+from src.models.db import get_db_connection, savepoint, unit_of_work
+from src.finance.category_matcher import DEFAULT_EXPENSE_CATEGORY, DEFAULT_INCOME_SOURCE, get_rule_engine
+from src.finance.merchant_cache import MerchantCategory, merchant_cache, normalize_merchant
+
+# Statement rows parsed, checked for duplicates and inserted at a time
+IMPORT_BATCH_SIZE = 500
+
+# Amounts looked up per query when checking undated transactions for duplicates
+LOOKUP_CHUNK_SIZE = 500
+
+def iter_batches(items, batch_size):
+    """Group an iterable into lists of up to batch_size items"""
+    items = iter(items)
+    while True:
+        batch = list(islice(items, batch_size))
+        if not batch:
+            return
+        yield batch
+
+def _categorize_transaction(transaction, engine, category, default_expense_category, default_income_source, notes):
+    """
+    Build the expense or income record of a transaction.
+
+    Transactions without a category get the default category or source
+    chosen for the import, or "Others".
 
-def import_bbva_statement(file_path, default_expense_category=None, default_income_source=None, check_duplicates=True):
+    Args:
+        category (MerchantCategory): Category and tax deductible flag from the merchant cache or the rules
+        notes (str): Notes of the record, naming the statement it comes from
+
+    Returns:
+        tuple: ('expense', expense dict) or ('income', income dict)
+    """
+    description = transaction['description']
+
+    if transaction['amount'] < 0:
+        category_id = category.target_id
+        if category_id is None:
+            category_id = default_expense_category or DEFAULT_EXPENSE_CATEGORY
+        tax_deductible = category.tax_deductible
+        if tax_deductible is None:
+            tax_deductible = engine.category_is_tax_deductible(category_id)
+
+        # Determine payment method based on description
+        details = f"{description} {transaction['movement']}".upper()
+        return 'expense', {
+            'category_id': category_id,
+            'description': description,
+            'amount': abs(transaction['amount']),
+            'date': transaction['date'],
+            'payment_method': 'Tarjeta' if 'TARJETA' in details else 'Transferencia',
+            'notes': notes,
+            'tax_deductible': tax_deductible
+        }
+
+    source_id = category.target_id
+    if source_id is None:
+        source_id = default_income_source or DEFAULT_INCOME_SOURCE
+
+    return 'income', {
+        'source_id': source_id,
+        'description': description,
+        'amount': transaction['amount'],
+        'date': transaction['date'],
+        'notes': notes
+    }
+
+def _categorize_batch(batch, engine, default_expense_category, default_income_source, notes, errors):
+    """
+    Build the records of a batch of transactions.
+
+    Merchants seen before get their remembered category with one lookup;
+    the others are matched with the categorization rules, and the category
+    the rules give them is remembered for the next imports.
+
+    Returns:
+        tuple: List of records (see _categorize_transaction), and the number of
+               transactions categorized from the merchant cache
+    """
+    merchants = [normalize_merchant(transaction['description']) for transaction in batch]
+    known = {
+        kind: merchant_cache.get_many(
+            kind, {merchant for transaction, merchant in zip(batch, merchants) if transaction['type'] == kind},
+            engine.version)
+        for kind in ('expense', 'income')
+    }
+    learned = {'expense': {}, 'income': {}}
+
+    records = []
+    cached = 0
+    for transaction, merchant in zip(batch, merchants):
+        kind = transaction['type']
+        try:
+            category = known[kind].get(merchant)
+            if category is not None:
+                cached += 1
+            else:
+                category = MerchantCategory(*engine.classify(transaction['description'], kind))
+                if category.target_id is not None:
+                    learned[kind][merchant] = category
+            records.append(_categorize_transaction(transaction, engine, category, default_expense_category,
+                                                   default_income_source, notes))
+        except Exception as e:
+            errors.append(str(e))
+
+    for kind, categories in learned.items():
+        merchant_cache.learn(kind, categories, 'import', engine.version)
+    return records, cached
+
+def _store_records(conn, records, errors):
+    """
+    Insert a batch of categorized records, isolating rows that fail.
+
+    The batch is written with one executemany() per table inside a savepoint.
+    If it fails, the savepoint is rolled back and the rows are inserted one
+    by one, each in its own savepoint, so a bad row is reported in errors
+    without losing the rest of the batch.
+
+    Returns:
+        tuple: Number of expenses and incomes stored
+    """
+    expense_rows = [record for kind, record in records if kind == 'expense']
+    income_rows = [record for kind, record in records if kind == 'income']
+    try:
+        with savepoint(conn, 'import_batch'):
+            return expenses.add_expenses_bulk(expense_rows), expenses.add_incomes_bulk(income_rows)
+    except sqlite3.Error:
+        pass
+
+    stored = {'expense': 0, 'income': 0}
+    for kind, record in records:
+        try:
+            with savepoint(conn, 'import_row'):
+                if kind == 'expense':
+                    expenses.add_expenses_bulk([record])
+                else:
+                    expenses.add_incomes_bulk([record])
+        except sqlite3.Error as e:
+            errors.append(f"{record['date']} {record['description']}: {e}")
+            continue
+        stored[kind] += 1
+    return stored['expense'], stored['income']
+
+def import_bbva_statement(file_path, default_expense_category=None, default_income_source=None, check_duplicates=True,
+                          batch_size=IMPORT_BATCH_SIZE, progress=None):
     """
     Import expenses and incomes from BBVA bank statement.
 
+    Same as import_statement for an Excel statement; see there for the arguments and result.
+    """
+    return import_statement(file_path, default_expense_category, default_income_source, check_duplicates,
+                            batch_size, progress, statement_format='xlsx')
+
+def import_statement(file_path, default_expense_category=None, default_income_source=None, check_duplicates=True,
+                     batch_size=IMPORT_BATCH_SIZE, progress=None, statement_format=None, skip_rows=0,
+                     checkpoint=None):
+    """
+    Import expenses and incomes from a bank statement.
+
+    Transactions are streamed from the file and inserted in bulk, batch by
+    batch, each batch in a transaction of its own, so the database is only
+    locked for writing while a batch is stored. A failing row is skipped and
+    reported in errors without aborting the import. Each batch is checked
+    for duplicates of the transactions already stored before it is inserted.
+
+    If the import stops with an error, the batches committed before it are
+    kept; 'rows' tells how many, and passing it as skip_rows resumes the
+    import after them.
+
     Args:
-        file_path: Path to the BBVA Excel file
+        file_path: Path to the statement file
         default_expense_category: Default category ID for expenses
         default_income_source: Default source ID for incomes
         check_duplicates: Whether to check for duplicate transactions
+        batch_size: Number of rows parsed and inserted at a time
+        progress: Called after each committed batch with the rows done (including skipped ones)
+                  and the expenses and incomes imported so far
+        statement_format: Name of the format (see src.finance.importers), detected from the file if None
+        skip_rows: Number of transactions at the start of the statement already imported
+        checkpoint: Called inside each batch's transaction, before it commits, with its connection,
+                    the rows done and the expenses, incomes and duplicates found so far; what it
+                    writes is committed or rolled back together with the batch
 
     Returns:
-        dict: Result of the import operation
+        dict: Result of the import operation, including the 'format' of the
+              statement, the 'rows' done, 'elapsed' seconds, 'rows_per_second'
+              and the number of rows 'categorized_from_cache' (merchants seen
+              in earlier imports)
     """
     if not os.path.exists(file_path):
         return {
@@ -26,153 +215,122 @@ def import_bbva_statement(file_path, default_expense_category=None, default_inco
             'message': f'File not found: {file_path}',
             'expenses_imported': 0,
             'incomes_imported': 0,
-            'errors': [f'File not found: {file_path}']
-        }
-
-    try:
-        # Load the workbook
-        wb = openpyxl.load_workbook(file_path)
-
-        # Get the active sheet
-        sheet = wb.active
-
-        # Get all values
-        rows = []
-        for row in sheet.iter_rows(values_only=True):
-            rows.append(row)
-
-        # Skip header row
-        data_rows = rows[1:]
-
-        # Initialize counters
-        expenses_imported = 0
-        incomes_imported = 0
-        errors = []
-        transactions = []
-
-        # Process each row
-        for row in data_rows:
-            try:
-                # Skip empty rows
-                if not row or len(row) < 3:
-                    continue
-
-                date = row[0]
-                description = row[1]
-                amount = row[2]
-
-                # Skip rows with missing data
-                if not date or not description or amount is None:
-                    continue
-
-                # Convert date to string format if it's a datetime object
-                if isinstance(date, datetime):
-                    date_str = date.strftime('%d/%m/%Y')
-                else:
-                    # Try to parse the date string
-                    try:
-                        date_obj = datetime.strptime(str(date), '%d/%m/%Y')
-                        date_str = date_obj.strftime('%d/%m/%Y')
-                    except ValueError:
-                        # If parsing fails, use the original value
-                        date_str = str(date)
-
-                # Clean up description
-                if description:
-                    description = str(description).strip()
-                else:
-                    description = "Sin descripción"
-
-                # Add transaction to list for duplicate checking
-                transactions.append({
-                    'date': date_str,
-                    'description': description,
-                    'amount': amount,
-                    'type': 'expense' if amount < 0 else 'income'
-                })
-
-                # Determine if it's an expense or income based on the amount
-                if amount < 0:
-                    # It's an expense (negative amount)
-                    # Make the amount positive for storage
-                    amount = abs(amount)
-
-                    # Categorize the expense based on the description using the improved matcher
-                    category_id = match_expense_category(description)
-
-                    # If no category was found, use the default
-                    if not category_id and default_expense_category:
-                        category_id = default_expense_category
-
-                    # Determine payment method based on description
-                    payment_method = 'Tarjeta' if 'TARJETA' in description.upper() else 'Transferencia'
-
-                    # If we have a category, save the expense
-                    if category_id:
-                        expenses.add_expense(
-                            category_id=category_id,
-                            description=description,
-                            amount=amount,
-                            date=date_str,
-                            payment_method=payment_method,
-                            notes='Imported from BBVA statement',
-                            tax_deductible=is_tax_deductible(description, category_id)
-                        )
-                        expenses_imported += 1
-                else:
-                    # It's an income (positive amount)
-                    # Categorize the income based on the description using the improved matcher
-                    source_id = match_income_source(description)
-
-                    # If no source was found, use the default
-                    if not source_id and default_income_source:
-                        source_id = default_income_source
-
-                    # If we have a source, save the income
-                    if source_id:
-                        expenses.add_income(
-                            source_id=source_id,
-                            description=description,
-                            amount=amount,
-                            date=date_str,
-                            notes='Imported from BBVA statement'
-                        )
-                        incomes_imported += 1
-
-            except Exception as e:
-                errors.append(str(e))
-
-        result = {
-            'success': True,
-            'message': f'Successfully imported {expenses_imported} expenses and {incomes_imported} incomes',
-            'expenses_imported': expenses_imported,
-            'incomes_imported': incomes_imported,
-            'errors': errors,
-            'transactions': transactions
+            'errors': [f'File not found: {file_path}'],
+            'rows': skip_rows
         }
 
-        # Check for duplicates if requested
-        if check_duplicates and transactions:
-            duplicates = detect_duplicate_transactions(transactions)
-            if duplicates:
-                result['duplicates'] = duplicates
-                result['message'] += f' (Found {len(duplicates)} potential duplicates)'
+    # Initialize counters
+    expenses_imported = 0
+    incomes_imported = 0
+    errors = []
+    duplicates = []
+    categorized_from_cache = 0
+    rows = skip_rows
+    started = time.perf_counter()
 
-        return result
+    try:
+        statement_format, statement = importers.iter_transactions(file_path, statement_format)
+        notes = f'Imported from {statement_format.label} statement'
+
+        for batch in iter_batches(islice(statement, skip_rows, None), batch_size):
+            with unit_of_work() as session:
+                # Rules are only reloaded if they changed since the previous batch
+                engine = get_rule_engine()
+                records, cached = _categorize_batch(batch, engine, default_expense_category,
+                                                    default_income_source, notes, errors)
+
+                # Compared with the rows stored before this batch, not with the batch itself
+                batch_duplicates = detect_duplicate_transactions(batch) if check_duplicates else []
+
+                stored_expenses, stored_incomes = _store_records(session.connection, records, errors)
+                if checkpoint:
+                    checkpoint(session.connection, rows + len(batch), expenses_imported + stored_expenses,
+                               incomes_imported + stored_incomes, len(duplicates) + len(batch_duplicates))
+
+            # Counted once the batch is committed
+            categorized_from_cache += cached
+            duplicates.extend(batch_duplicates)
+            expenses_imported += stored_expenses
+            incomes_imported += stored_incomes
+            rows += len(batch)
+            if progress:
+                progress(rows, expenses_imported, incomes_imported)
 
     except Exception as e:
         return {
             'success': False,
-            'message': f'Error importing data: {str(e)}',
-            'expenses_imported': 0,
-            'incomes_imported': 0,
-            'errors': [str(e)]
+            'message': f'Error importing data: {str(e)} ({rows} rows imported before the error)',
+            'expenses_imported': expenses_imported,
+            'incomes_imported': incomes_imported,
+            'errors': errors + [str(e)],
+            'format': getattr(statement_format, 'name', statement_format),
+            'duplicates': duplicates,
+            'rows': rows
         }
 
+    elapsed = time.perf_counter() - started
+    rows_per_second = (rows - skip_rows) / elapsed if elapsed > 0 else 0.0
+
+    result = {
+        'success': True,
+        'message': f'Successfully imported {expenses_imported} expenses and {incomes_imported} incomes',
+        'expenses_imported': expenses_imported,
+        'incomes_imported': incomes_imported,
+        'errors': errors,
+        'format': statement_format.name,
+        'rows': rows,
+        'elapsed': elapsed,
+        'rows_per_second': rows_per_second,
+        'categorized_from_cache': categorized_from_cache
+    }
+
+    if duplicates:
+        result['duplicates'] = duplicates
+        result['message'] += f' (Found {len(duplicates)} potential duplicates)'
+
+    return result
+
+def _amount_key(amount):
+    """Bucket key of an amount: whole cents, so equal amounts share a key"""
+    return int(round(float(amount) * 100))
+
+def _normalize_description(description):
+    """Lower-case a description and collapse the padding spaces of bank exports"""
+    return ' '.join(str(description).lower().split())
+
+def _parse_date(value):
+    try:
+        return date.fromisoformat(str(value)[:10])
+    except ValueError:
+        return None
+
+def _existing_transactions(where, params):
+    """Yield stored expenses (negative amounts) and incomes matching a WHERE clause on date/amount"""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        for kind, table in (('expense', 'expenses'), ('income', 'incomes')):
+            sign = -1 if kind == 'expense' else 1
+            cursor.execute(f'SELECT id, date, description, amount FROM {table} WHERE {where}', params)
+            for row_id, row_date, description, amount in cursor.fetchall():
+                yield {
+                    'id': row_id,
+                    'date': row_date,
+                    'description': description,
+                    'amount': sign * amount,
+                    'type': kind
+                }
+
 def detect_duplicate_transactions(transactions, days_threshold=3):
     """
     Detect potential duplicate transactions in the database.
 
+    A transaction is a potential duplicate of a stored one with the same
+    amount (to the cent), a description contained in the other's, and a date
+    at most days_threshold days apart. Only stored rows dated within the
+    statement's date range (widened by the threshold) are read; they are
+    indexed by amount and date, so each transaction is compared with the
+    few rows of its own buckets.
+
     Args:
         transactions (list): List of transaction dictionaries
         days_threshold (int): Number of days to consider for duplicates
@@ -180,68 +338,75 @@ def detect_duplicate_transactions(transactions, days_threshold=3):
     Returns:
         list: List of potential duplicate transactions
     """
-    # Get existing transactions from database
-    existing_expenses = expenses.get_expenses()
-    existing_incomes = expenses.get_incomes()
-
-    # Convert to dictionaries for easier comparison
-    existing_transactions = []
-
-    for expense in existing_expenses:
-        existing_transactions.append({
-            'id': expense[0],
-            'date': expense[3],
-            'description': expense[2],
-            'amount': -expense[4],  # Negative for expenses
-            'type': 'expense'
-        })
-
-    for income in existing_incomes:
-        existing_transactions.append({
-            'id': income[0],
-            'date': income[3],
-            'description': income[2],
-            'amount': income[4],
-            'type': 'income'
-        })
-
-    # Find potential duplicates
+    dated = []
+    undated = []
+    for transaction in transactions:
+        transaction_date = _parse_date(transaction['date'])
+        if transaction_date is None:
+            undated.append(transaction)
+        else:
+            dated.append((transaction, transaction_date))
+
     duplicates = []
 
-    for new_trans in transactions:
-        for existing in existing_transactions:
-            # Check if amounts match
-            if abs(new_trans['amount'] - existing['amount']) < 0.01:
-                # Check if descriptions are similar
-                if (new_trans['description'].lower() in existing['description'].lower() or
-                    existing['description'].lower() in new_trans['description'].lower()):
-
-                    # Check if dates are close
-                    try:
-                        new_date = datetime.strptime(new_trans['date'], '%d/%m/%Y')
-                        existing_date = datetime.strptime(existing['date'], '%d/%m/%Y')
-                        days_diff = abs((new_date - existing_date).days)
-
-                        if days_diff <= days_threshold:
-                            duplicates.append({
-                                'new_transaction': new_trans,
-                                'existing_transaction': existing,
-                                'days_difference': days_diff
-                            })
-                    except ValueError:
-                        # If date parsing fails, still consider it a potential duplicate
+    if dated:
+        window = timedelta(days=days_threshold)
+        date_from = (min(day for _, day in dated) - window).isoformat()
+        date_to = (max(day for _, day in dated) + window).isoformat()
+
+        # (amount in cents, day ordinal) -> stored transactions
+        buckets = defaultdict(list)
+        for existing in _existing_transactions('date >= ? AND date <= ?', (date_from, date_to)):
+            existing_date = _parse_date(existing['date'])
+            if existing_date is not None:
+                key = (_amount_key(existing['amount']), existing_date.toordinal())
+                buckets[key].append((_normalize_description(existing['description']), existing))
+
+        for new_trans, new_date in dated:
+            amount_key = _amount_key(new_trans['amount'])
+            description = _normalize_description(new_trans['description'])
+            ordinal = new_date.toordinal()
+            for offset in range(-days_threshold, days_threshold + 1):
+                for existing_description, existing in buckets.get((amount_key, ordinal + offset), ()):
+                    if description in existing_description or existing_description in description:
                         duplicates.append({
                             'new_transaction': new_trans,
                             'existing_transaction': existing,
-                            'days_difference': 'unknown'
+                            'days_difference': abs(offset)
                         })
 
+    if undated:
+        # Without a date only the amount and description can be compared
+        amount_keys = sorted({_amount_key(transaction['amount']) for transaction in undated})
+        buckets = defaultdict(list)
+        for start in range(0, len(amount_keys), LOOKUP_CHUNK_SIZE):
+            keys = amount_keys[start:start + LOOKUP_CHUNK_SIZE]
+            where = f"CAST(ROUND(amount * 100) AS INTEGER) IN ({', '.join('?' * len(keys))})"
+            # Stored amounts are positive, so look up both signs
+            params = [abs(key) for key in keys]
+            for existing in _existing_transactions(where, params):
+                buckets[_amount_key(existing['amount'])].append(
+                    (_normalize_description(existing['description']), existing))
+
+        for new_trans in undated:
+            description = _normalize_description(new_trans['description'])
+            for existing_description, existing in buckets.get(_amount_key(new_trans['amount']), ()):
+                if description in existing_description or existing_description in description:
+                    duplicates.append({
+                        'new_transaction': new_trans,
+                        'existing_transaction': existing,
+                        'days_difference': 'unknown'
+                    })
+
     return duplicates
 
 def is_tax_deductible(description, category_id):
     """
     Determine if an expense is tax deductible based on its description and category.
 
+    A matching categorization rule with a deductible flag decides; otherwise
+    the flag of the expense category does.
+
     Args:
         description: The expense description
         category_id: The expense category ID
@@ -249,20 +414,4 @@ def is_tax_deductible(description, category_id):
     Returns:
         bool: True if tax deductible, False otherwise
     """
-    # Non-deductible categories
-    non_deductible_categories = [3, 10]  # Comidas, Otros
-
-    # Check if category is non-deductible
-    if category_id in non_deductible_categories:
-        return False
-
-    # Check for specific non-deductible keywords in description
-    non_deductible_keywords = ['personal', 'privado', 'regalo', 'ocio', 'entretenimiento']
-    desc_lower = description.lower()
-
-    for keyword in non_deductible_keywords:
-        if keyword in desc_lower:
-            return False
-
-    # Default to deductible
-    return True
+    return get_rule_engine().is_tax_deductible(description, category_id)
@@ -0,0 +1,115 @@
+"""
+Storage of the user-editable rules that categorize bank transactions.
+
+Every change bumps the rules' version (see migration 10), which tells the
+compiled rule engine in src/finance/category_matcher.py to reload.
+"""
+from datetime import datetime
+from src.models.db import get_db_connection
+from src.finance.category_matcher import MATCH_TYPES, RULE_KINDS, compile_rule_pattern, get_rules_version
+
+RULE_COLUMNS = ('id', 'pattern', 'match_type', 'kind', 'target_id', 'target_name', 'priority', 'tax_deductible')
+
+_RULE_SQL = '''
+SELECT r.id, r.pattern, r.match_type, r.kind, r.target_id, COALESCE(c.name, s.name), r.priority, r.tax_deductible
+FROM categorization_rules r
+LEFT JOIN expense_categories c ON r.kind = 'expense' AND c.id = r.target_id
+LEFT JOIN income_sources s ON r.kind = 'income' AND s.id = r.target_id
+'''
+
+def get_categorization_rules(kind=None):
+    """
+    Get the categorization rules, highest priority first.
+
+    Args:
+        kind (str): Only rules for 'expense' or 'income' transactions
+
+    Returns:
+        list: Rule dicts with the RULE_COLUMNS keys
+    """
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        if kind:
+            cursor.execute(f'{_RULE_SQL} WHERE r.kind = ? ORDER BY r.priority, r.id', (kind,))
+        else:
+            cursor.execute(f'{_RULE_SQL} ORDER BY r.kind, r.priority, r.id')
+        return [dict(zip(RULE_COLUMNS, row)) for row in cursor.fetchall()]
+
+def get_categorization_rule(rule_id):
+    """Get a rule dict by id, or None if it does not exist"""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(f'{_RULE_SQL} WHERE r.id = ?', (rule_id,))
+        row = cursor.fetchone()
+        return dict(zip(RULE_COLUMNS, row)) if row else None
+
+def _validate_rule(pattern, match_type, kind, target_id, tax_deductible):
+    if not pattern or not pattern.strip():
+        raise ValueError("The pattern is required")
+    if kind not in RULE_KINDS:
+        raise ValueError(f"Unknown kind: {kind}")
+    if match_type not in MATCH_TYPES:
+        raise ValueError(f"Unknown match type: {match_type}")
+    if match_type != 'contains':
+        compile_rule_pattern(pattern, match_type)
+    if kind == 'income' and tax_deductible is not None:
+        raise ValueError("Only expense rules can set the tax deductible flag")
+    if target_id is None and tax_deductible is None:
+        raise ValueError("A rule must set a category or source, or the tax deductible flag")
+
+def save_categorization_rule(pattern, match_type, kind, target_id=None, priority=100, tax_deductible=None,
+                             rule_id=None):
+    """
+    Add a rule, or update it if rule_id is given.
+
+    Args:
+        pattern (str): Text matched against transaction descriptions
+        match_type (str): One of MATCH_TYPES
+        kind (str): 'expense' or 'income'
+        target_id (int): Expense category or income source assigned, or None
+        priority (int): Rules with a lower number win
+        tax_deductible (bool): Deductible flag for matching expenses, or None to use the category's
+
+    Returns:
+        int: The rule id
+
+    Raises:
+        ValueError: If the rule is invalid or does not exist
+    """
+    pattern = (pattern or '').strip()
+    _validate_rule(pattern, match_type, kind, target_id, tax_deductible)
+    values = (pattern, match_type, kind, target_id, int(priority),
+              None if tax_deductible is None else int(bool(tax_deductible)),
+              datetime.now().isoformat(timespec='seconds'))
+
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        if rule_id:
+            cursor.execute('''
+            UPDATE categorization_rules
+            SET pattern = ?, match_type = ?, kind = ?, target_id = ?, priority = ?, tax_deductible = ?, updated_at = ?
+            WHERE id = ?
+            ''', values + (rule_id,))
+            if cursor.rowcount == 0:
+                raise ValueError(f"Rule not found: {rule_id}")
+        else:
+            cursor.execute('''
+            INSERT INTO categorization_rules (pattern, match_type, kind, target_id, priority, tax_deductible, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', values)
+            rule_id = cursor.lastrowid
+        conn.commit()
+        return rule_id
+
+def delete_categorization_rule(rule_id):
+    """Delete a rule; returns False if it did not exist"""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('DELETE FROM categorization_rules WHERE id = ?', (rule_id,))
+        conn.commit()
+        return cursor.rowcount > 0
+
+def get_categorization_rules_version():
+    """Get the current version of the rules"""
+    with get_db_connection() as conn:
+        return get_rules_version(conn)
@@ -1,6 +1,16 @@
 """
 Category matching module for automatic categorization of bank transactions.
+
+Transactions are categorized with the rules of the categorization_rules
+table. The rules are compiled once into a RuleEngine that is kept in memory
+and rebuilt only when the rules' version changes, so a statement is matched
+without database access per row. The keyword maps below are the rules the
+table is seeded with.
 """
+import re
+import threading
+from collections import deque
+from src.models.db import get_db_connection, get_pool
 
 # Mapping of keywords to expense categories
 EXPENSE_KEYWORDS = {
@@ -85,52 +95,278 @@ INCOME_KEYWORDS = {
     ]
 }
 
+# Expenses in these categories are not tax deductible by default (Comidas, Otros)
+NON_DEDUCTIBLE_CATEGORIES = (3, 10)
+
+# Descriptions with these words are personal, not deductible, expenses
+NON_DEDUCTIBLE_KEYWORDS = ('personal', 'privado', 'regalo', 'ocio', 'entretenimiento')
+
+# How a rule's pattern is matched against a description (always case-insensitive):
+# contains: substring; word: whole words; regex: regular expression search
+MATCH_TYPES = ('contains', 'word', 'regex')
+
+# Transactions a rule applies to
+RULE_KINDS = ('expense', 'income')
+
+class KeywordMatcher:
+    """
+    Aho-Corasick automaton over the keywords of a {label: [keywords]} map.
+
+    Every keyword is found in a single pass over the text, so the cost of a
+    match depends on the length of the description and not on the number of
+    keywords. Matching is case-insensitive and by substring, like the
+    keyword checks it replaces. Hits are ranked by the order of the labels
+    in the map and of the keywords within each label.
+    """
+
+    def __init__(self, keywords_by_label):
+        self.patterns = []  # (label, keyword) in priority order
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]]  # Pattern indexes ending at each state
+
+        for label, keywords in keywords_by_label.items():
+            for keyword in keywords:
+                self._add(keyword.upper(), len(self.patterns))
+                self.patterns.append((label, keyword))
+        self._link()
+
+    def _add(self, keyword, index):
+        state = 0
+        for char in keyword:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            state = next_state
+        self._output[state].append(index)
+
+    def _link(self):
+        """Compute failure links breadth-first and merge the outputs of suffix states"""
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(char, 0)
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+
+    def find_all(self, text):
+        """
+        Find every keyword contained in a text.
+
+        Returns:
+            list: (label, keyword) tuples in priority order, without repeats
+        """
+        found = set()
+        goto, fail, output = self._goto, self._fail, self._output
+        state = 0
+        for char in (text or '').upper():
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                found.update(output[state])
+        return [self.patterns[index] for index in sorted(found)]
+
+    def match(self, text, default=None):
+        """Get the label of the highest priority keyword in a text, or default"""
+        hits = self.find_all(text)
+        return hits[0][0] if hits else default
+
+
+def compile_rule_pattern(pattern, match_type):
+    """
+    Compile the regular expression of a 'word' or 'regex' rule.
+
+    Raises:
+        ValueError: If the match type is unknown or the pattern is not a valid regular expression
+    """
+    if match_type == 'word':
+        return re.compile(r'\b' + re.escape(pattern) + r'\b', re.IGNORECASE)
+    if match_type == 'regex':
+        try:
+            return re.compile(pattern, re.IGNORECASE)
+        except re.error as e:
+            raise ValueError(f"Invalid regular expression '{pattern}': {e}")
+    raise ValueError(f"Unknown match type: {match_type}")
+
+
+class RuleEngine:
+    """
+    Categorization rules compiled for matching.
+
+    The 'contains' rules of each kind share one KeywordMatcher, so they are
+    all checked in a single pass over a description however many there are;
+    'word' and 'regex' rules are precompiled expressions. When several rules
+    match, the lowest priority number (then the lowest id) wins.
+
+    Args:
+        rules: Rule dicts with 'id', 'pattern', 'match_type', 'kind', 'target_id',
+               'priority' and 'tax_deductible'
+        category_deductible (dict): Expense category id -> tax deductible flag
+        version (int): Version of the rules in the database
+    """
+
+    def __init__(self, rules, category_deductible=None, version=None):
+        self.version = version
+        self.category_deductible = dict(category_deductible or {})
+        self._rules = {}
+        self._keywords = {}
+        self._expressions = {}
+        for kind in RULE_KINDS:
+            rules_of_kind = sorted((rule for rule in rules if rule['kind'] == kind),
+                                   key=lambda rule: (rule['priority'], rule['id']))
+            self._rules[kind] = rules_of_kind
+            self._keywords[kind] = KeywordMatcher({
+                position: [rule['pattern']]
+                for position, rule in enumerate(rules_of_kind) if rule['match_type'] == 'contains'
+            })
+            self._expressions[kind] = [
+                (position, compile_rule_pattern(rule['pattern'], rule['match_type']))
+                for position, rule in enumerate(rules_of_kind) if rule['match_type'] != 'contains'
+            ]
+
+    def find_rules(self, description, kind):
+        """Get the rules matching a description, highest priority first"""
+        positions = {position for position, _ in self._keywords[kind].find_all(description)}
+        text = description or ''
+        positions.update(position for position, expression in self._expressions[kind] if expression.search(text))
+        return [self._rules[kind][position] for position in sorted(positions)]
+
+    def classify(self, description, kind):
+        """
+        Match a description in one pass.
+
+        Returns:
+            tuple: Target (category or source) id of the best rule with a target, and
+                   tax deductible flag of the best rule with a flag; None for either if no rule sets it
+        """
+        target_id = None
+        tax_deductible = None
+        for rule in self.find_rules(description, kind):
+            if target_id is None and rule['target_id'] is not None:
+                target_id = rule['target_id']
+            if tax_deductible is None and rule['tax_deductible'] is not None:
+                tax_deductible = bool(rule['tax_deductible'])
+        return target_id, tax_deductible
+
+    def is_tax_deductible(self, description, category_id):
+        """
+        Decide whether an expense is tax deductible.
+
+        A matching rule's flag takes precedence over the flag of the category;
+        expenses are deductible unless one of them says otherwise.
+        """
+        _, rule_flag = self.classify(description, 'expense')
+        if rule_flag is not None:
+            return rule_flag
+        return self.category_is_tax_deductible(category_id)
+
+    def category_is_tax_deductible(self, category_id):
+        """Get the tax deductible flag of an expense category (True for unknown categories)"""
+        try:
+            return self.category_deductible.get(int(category_id), True)
+        except (TypeError, ValueError):
+            return True
+
+
+_engine_lock = threading.Lock()
+_engine = None  # ((database path, rules version), RuleEngine)
+
+def get_rules_version(conn):
+    """Get the version of the categorization rules, bumped by triggers on every change"""
+    return conn.execute('SELECT version FROM categorization_rules_version').fetchone()[0]
+
+def get_rule_engine():
+    """
+    Get the compiled categorization rules of the current database.
+
+    The engine is cached in memory; a single version query per call decides
+    whether the rules have to be loaded and compiled again.
+    """
+    global _engine
+    with get_db_connection() as conn:
+        key = (get_pool().db_path, get_rules_version(conn))
+        with _engine_lock:
+            if _engine is not None and _engine[0] == key:
+                return _engine[1]
+
+        cursor = conn.cursor()
+        cursor.execute('''
+        SELECT id, pattern, match_type, kind, target_id, priority, tax_deductible
+        FROM categorization_rules
+        ''')
+        columns = [column[0] for column in cursor.description]
+        rules = [dict(zip(columns, row)) for row in cursor.fetchall()]
+        cursor.execute('SELECT id, tax_deductible FROM expense_categories')
+        category_deductible = {category_id: bool(flag) for category_id, flag in cursor.fetchall()}
+
+    engine = RuleEngine(rules, category_deductible, version=key[1])
+    with _engine_lock:
+        _engine = (key, engine)
+    return engine
+
+def reset_rule_engine():
+    """Drop the cached rule engine (it is rebuilt on next use)"""
+    global _engine
+    with _engine_lock:
+        _engine = None
+
+
+# Expense category and income source used when no rule matches ("Others")
+DEFAULT_EXPENSE_CATEGORY = 10
+DEFAULT_INCOME_SOURCE = 4
+
 def match_expense_category(description):
     """
     Match a transaction description to an expense category.
-    
+
     Args:
         description (str): The transaction description
-        
+
     Returns:
         int: The category ID, or 10 (Others) if no match is found
     """
-    if not description:
-        return 10  # Default to "Others"
-    
-    # Convert to uppercase for case-insensitive matching
-    upper_desc = description.upper()
-    
-    # Check each category's keywords
-    for category_id, keywords in EXPENSE_KEYWORDS.items():
-        for keyword in keywords:
-            if keyword in upper_desc:
-                return category_id
-    
-    # Default to "Others" (category_id = 10)
-    return 10
+    category_id, _ = get_rule_engine().classify(description, 'expense')
+    return category_id if category_id is not None else DEFAULT_EXPENSE_CATEGORY
 
 def match_income_source(description):
     """
     Match a transaction description to an income source.
-    
+
     Args:
         description (str): The transaction description
-        
+
     Returns:
         int: The source ID, or 4 (Others) if no match is found
     """
-    if not description:
-        return 4  # Default to "Others"
-    
-    # Convert to uppercase for case-insensitive matching
-    upper_desc = description.upper()
-    
-    # Check each source's keywords
-    for source_id, keywords in INCOME_KEYWORDS.items():
-        for keyword in keywords:
-            if keyword in upper_desc:
-                return source_id
-    
-    # Default to "Others" (source_id = 4)
-    return 4
+    source_id, _ = get_rule_engine().classify(description, 'income')
+    return source_id if source_id is not None else DEFAULT_INCOME_SOURCE
+
+def categorize_many(descriptions, kind='expense'):
+    """
+    Match many descriptions at once, loading the rules at most once.
+
+    Args:
+        descriptions: Iterable of transaction descriptions
+        kind (str): 'expense' for expense categories, 'income' for income sources
+
+    Returns:
+        list: Category or source IDs, in the order of the descriptions
+    """
+    if kind not in RULE_KINDS:
+        raise ValueError(f"Unknown kind: {kind}")
+    default = DEFAULT_EXPENSE_CATEGORY if kind == 'expense' else DEFAULT_INCOME_SOURCE
+    engine = get_rule_engine()
+    results = []
+    for description in descriptions:
+        target_id, _ = engine.classify(description, kind)
+        results.append(target_id if target_id is not None else default)
+    return results
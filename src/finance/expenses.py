@@ -1,7 +1,8 @@
 """
 Expenses and income tracking module for the Invoice Generator application.
 """
-from src.models.db import get_db_connection
+from src.models.db import get_db_connection, get_year_date_range
+from src.utils import to_iso_date
 
 def get_expense_categories():
     """Get all expense categories from the database"""
@@ -24,7 +25,7 @@ def add_expense(category_id, description, amount, date, payment_method=None, rec
         cursor.execute('''
         INSERT INTO expenses (category_id, description, amount, date, payment_method, receipt_image, notes, tax_deductible)
         VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (category_id, description, amount, date, payment_method, receipt_image, notes, tax_deductible))
+        ''', (category_id, description, amount, to_iso_date(date), payment_method, receipt_image, notes, tax_deductible))
         expense_id = cursor.lastrowid
         conn.commit()
         return expense_id
@@ -36,11 +37,96 @@ def add_income(source_id, description, amount, date, notes=None):
         cursor.execute('''
         INSERT INTO incomes (source_id, description, amount, date, notes)
         VALUES (?, ?, ?, ?, ?)
-        ''', (source_id, description, amount, date, notes))
+        ''', (source_id, description, amount, to_iso_date(date), notes))
         income_id = cursor.lastrowid
         conn.commit()
         return income_id
 
+def recategorize_expense(expense_id, category_id):
+    """
+    Change the category of an expense.
+
+    Returns:
+        str: Description of the expense, or None if it does not exist
+    """
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT description FROM expenses WHERE id = ?', (expense_id,))
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        cursor.execute('UPDATE expenses SET category_id = ? WHERE id = ?', (category_id, expense_id))
+        conn.commit()
+        return row[0]
+
+def recategorize_income(income_id, source_id):
+    """
+    Change the source of an income.
+
+    Returns:
+        str: Description of the income, or None if it does not exist
+    """
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT description FROM incomes WHERE id = ?', (income_id,))
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        cursor.execute('UPDATE incomes SET source_id = ? WHERE id = ?', (source_id, income_id))
+        conn.commit()
+        return row[0]
+
+def add_expenses_bulk(expenses):
+    """
+    Add many expenses with a single executemany() and one commit.
+
+    Args:
+        expenses: Iterable of dicts with the arguments of add_expense
+
+    Returns:
+        int: Number of expenses added
+    """
+    rows = [
+        (expense['category_id'], expense['description'], expense['amount'], to_iso_date(expense['date']),
+         expense.get('payment_method'), expense.get('receipt_image'), expense.get('notes'),
+         expense.get('tax_deductible', True))
+        for expense in expenses
+    ]
+    if not rows:
+        return 0
+    with get_db_connection() as conn:
+        conn.executemany('''
+        INSERT INTO expenses (category_id, description, amount, date, payment_method, receipt_image, notes, tax_deductible)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', rows)
+        conn.commit()
+    return len(rows)
+
+def add_incomes_bulk(incomes):
+    """
+    Add many incomes with a single executemany() and one commit.
+
+    Args:
+        incomes: Iterable of dicts with the arguments of add_income
+
+    Returns:
+        int: Number of incomes added
+    """
+    rows = [
+        (income['source_id'], income['description'], income['amount'], to_iso_date(income['date']),
+         income.get('notes'))
+        for income in incomes
+    ]
+    if not rows:
+        return 0
+    with get_db_connection() as conn:
+        conn.executemany('''
+        INSERT INTO incomes (source_id, description, amount, date, notes)
+        VALUES (?, ?, ?, ?, ?)
+        ''', rows)
+        conn.commit()
+    return len(rows)
+
 def get_expenses(limit=None):
     """Get all expenses from the database"""
     with get_db_connection() as conn:
@@ -90,10 +176,10 @@ def get_expenses_by_category(year=None):
             SELECT c.name, SUM(e.amount) as total
             FROM expenses e
             JOIN expense_categories c ON e.category_id = c.id
-            WHERE substr(e.date, 7, 4) = ?
+            WHERE e.date >= ? AND e.date < ?
             GROUP BY c.name
             ORDER BY total DESC
-            ''', (str(year),))
+            ''', get_year_date_range(year))
         else:
             cursor.execute('''
             SELECT c.name, SUM(e.amount) as total
@@ -112,28 +198,30 @@ def get_tax_deductible_expenses(year):
         SELECT e.*, c.name as category_name
         FROM expenses e
         LEFT JOIN expense_categories c ON e.category_id = c.id
-        WHERE e.tax_deductible = 1 AND substr(e.date, 7, 4) = ?
+        WHERE e.tax_deductible = 1 AND e.date >= ? AND e.date < ?
         ORDER BY e.date DESC
-        ''', (str(year),))
+        ''', get_year_date_range(year))
         return cursor.fetchall()
 
 def get_financial_summary(year):
     """Get financial summary for a specific year"""
+    date_range = get_year_date_range(year)
+
     with get_db_connection() as conn:
         cursor = conn.cursor()
 
         # Get total expenses
         cursor.execute('''
         SELECT SUM(amount) FROM expenses
-        WHERE substr(date, 7, 4) = ?
-        ''', (str(year),))
+        WHERE date >= ? AND date < ?
+        ''', date_range)
         total_expenses = cursor.fetchone()[0] or 0
 
         # Get total incomes (including invoices)
         cursor.execute('''
         SELECT SUM(amount) FROM incomes
-        WHERE substr(date, 7, 4) = ?
-        ''', (str(year),))
+        WHERE date >= ? AND date < ?
+        ''', date_range)
         total_incomes = cursor.fetchone()[0] or 0
 
         # Get total from invoices
@@ -141,15 +229,15 @@ def get_financial_summary(year):
         SELECT SUM(s.unit_price * i.quantity)
         FROM invoices i
         JOIN services s ON i.service_id = s.id
-        WHERE substr(i.date, 7, 4) = ?
-        ''', (str(year),))
+        WHERE i.date >= ? AND i.date < ?
+        ''', date_range)
         total_invoices = cursor.fetchone()[0] or 0
 
         # Get tax deductible expenses
         cursor.execute('''
         SELECT SUM(amount) FROM expenses
-        WHERE tax_deductible = 1 AND substr(date, 7, 4) = ?
-        ''', (str(year),))
+        WHERE tax_deductible = 1 AND date >= ? AND date < ?
+        ''', date_range)
         tax_deductible = cursor.fetchone()[0] or 0
 
         return {
@@ -1,10 +1,15 @@
 """
 Route definitions for the expenses and income tracking module.
 """
-import os
-from flask import render_template, request, redirect, flash
+from flask import render_template, request, redirect, flash, jsonify
 from datetime import datetime
 from src.finance import expenses
+from src.finance import categorization_rules
+from src.finance import import_jobs
+from src.finance.importers import FORMATS, SUPPORTED_EXTENSIONS
+from src.finance.category_matcher import MATCH_TYPES
+from src.finance.merchant_cache import learn_manual_category
+from src.models.db import mark_session_failed
 
 def register_expense_routes(app):
     """Register all expense and income routes"""
@@ -64,9 +69,13 @@ def register_expense_routes(app):
                 notes=notes,
                 tax_deductible=tax_deductible
             )
+            # Imports give this merchant the same category from now on
+            learn_manual_category('expense', description, category_id, tax_deductible)
 
             flash('Expense added successfully', 'success')
         except Exception as e:
+            # Keep none of the request's writes
+            mark_session_failed()
             flash(f'Error adding expense: {str(e)}', 'error')
 
         return redirect('/expenses')
@@ -118,13 +127,51 @@ def register_expense_routes(app):
                 date=date,
                 notes=notes
             )
+            learn_manual_category('income', description, source_id)
 
             flash('Income added successfully', 'success')
         except Exception as e:
+            mark_session_failed()
             flash(f'Error adding income: {str(e)}', 'error')
 
         return redirect('/incomes')
 
+    @app.route('/recategorize_expense', methods=['POST'])
+    def recategorize_expense():
+        """Change the category of an expense; imports give its merchant the new category"""
+        expense_id = request.form.get('expense_id', type=int)
+        category_id = request.form.get('category_id', type=int)
+        if expense_id is None or category_id is None:
+            flash('Please select a category', 'error')
+            return redirect('/expenses')
+
+        description = expenses.recategorize_expense(expense_id, category_id)
+        if description is None:
+            flash('Expense not found', 'error')
+            return redirect('/expenses')
+
+        learn_manual_category('expense', description, category_id)
+        flash('Expense category updated', 'success')
+        return redirect('/expenses')
+
+    @app.route('/recategorize_income', methods=['POST'])
+    def recategorize_income():
+        """Change the source of an income; imports give its payer the new source"""
+        income_id = request.form.get('income_id', type=int)
+        source_id = request.form.get('source_id', type=int)
+        if income_id is None or source_id is None:
+            flash('Please select a source', 'error')
+            return redirect('/incomes')
+
+        description = expenses.recategorize_income(income_id, source_id)
+        if description is None:
+            flash('Income not found', 'error')
+            return redirect('/incomes')
+
+        learn_manual_category('income', description, source_id)
+        flash('Income source updated', 'success')
+        return redirect('/incomes')
+
     @app.route('/financial_summary')
     def financial_summary():
         """Financial summary page"""
@@ -148,6 +195,7 @@ def register_expense_routes(app):
                               expense_stats=expense_stats,
                               tax_deductible=tax_deductible,
                               selected_year=selected_year,
+                              current_year=datetime.now().year,
                               current_page=current_page)
 
     @app.route('/import_expenses', methods=['GET', 'POST'])
@@ -166,46 +214,99 @@ def register_expense_routes(app):
                 flash('No selected file', 'error')
                 return redirect('/expenses')
 
-            # Check if file is an Excel file
-            if not file.filename.endswith(('.xlsx', '.xls')):
-                flash('File must be an Excel file (.xlsx or .xls)', 'error')
+            # Check if file is a bank statement
+            if not file.filename.lower().endswith(SUPPORTED_EXTENSIONS):
+                flash(f"File must be a bank statement ({', '.join(SUPPORTED_EXTENSIONS)})", 'error')
+                return redirect('/expenses')
+
+            # Detected from the file unless chosen
+            statement_format = request.form.get('statement_format') or None
+            if statement_format and statement_format not in [f.name for f in FORMATS]:
+                flash(f'Unknown statement format: {statement_format}', 'error')
                 return redirect('/expenses')
 
             try:
-                # Save file temporarily
-                temp_path = 'temp_bank_statement.xlsx'
-                file.save(temp_path)
-
-                # Get default category and source
-                default_category = request.form.get('default_category')
-                default_source = request.form.get('default_source')
-
-                # Import expenses from file
-                from src.finance.bbva_import import import_bbva_statement
-                result = import_bbva_statement(
-                    temp_path,
-                    default_expense_category=default_category,
-                    default_income_source=default_source,
-                    check_duplicates=True
+                # The import runs in the background; the page polls its progress
+                job = import_jobs.start_import_job(
+                    file,
+                    file.filename,
+                    default_expense_category=request.form.get('default_category') or None,
+                    default_income_source=request.form.get('default_source') or None,
+                    statement_format=statement_format
                 )
-
-                # Remove temporary file
-                os.remove(temp_path)
-
-                if result['success']:
-                    # Check if there are duplicates
-                    if 'duplicates' in result and result['duplicates']:
-                        duplicate_count = len(result['duplicates'])
-                        flash(f"Successfully imported {result['expenses_imported']} expenses and {result['incomes_imported']} incomes. Found {duplicate_count} potential duplicates.", 'warning')
-                    else:
-                        flash(f"Successfully imported {result['expenses_imported']} expenses and {result['incomes_imported']} incomes", 'success')
-                else:
-                    flash(f"Error importing data: {result['message']}", 'error')
             except Exception as e:
+                mark_session_failed()
                 flash(f'Error importing data: {str(e)}', 'error')
+                return redirect('/expenses')
 
-            return redirect('/expenses')
+            return redirect(f"/import_expenses?job={job['id']}")
 
-        # GET request - show import form
+        # GET request - show import form, or the progress of an import job
+        job = import_jobs.get_import_job(request.args['job']) if request.args.get('job') else None
         return render_template('finance/import_expenses.html',
+                              job=job,
+                              statement_formats=FORMATS,
+                              supported_extensions=SUPPORTED_EXTENSIONS,
                               current_page='expenses')
+
+    @app.route('/import_jobs/<job_id>/resume', methods=['POST'])
+    def resume_import_job(job_id):
+        """Import the rest of a failed bank statement import"""
+        try:
+            import_jobs.resume_import_job(job_id)
+        except ValueError as e:
+            flash(f'Error resuming import: {str(e)}', 'error')
+        return redirect(f'/import_expenses?job={job_id}')
+
+    @app.route('/api/import_jobs/<job_id>')
+    def api_import_job(job_id):
+        """Get the status and row counters of a bank statement import job"""
+        job = import_jobs.get_import_job(job_id)
+        if not job:
+            return jsonify({'error': 'Unknown import job'}), 404
+        return jsonify(job)
+
+    @app.route('/categorization_rules')
+    def manage_categorization_rules():
+        """Page to edit the rules that categorize imported transactions"""
+        return render_template('finance/categorization_rules.html',
+                              rules=categorization_rules.get_categorization_rules(),
+                              categories=expenses.get_expense_categories(),
+                              sources=expenses.get_income_sources(),
+                              match_types=MATCH_TYPES,
+                              version=categorization_rules.get_categorization_rules_version(),
+                              current_page='categorization_rules')
+
+    @app.route('/save_categorization_rule', methods=['POST'])
+    def save_categorization_rule():
+        """Save a categorization rule (add or update)"""
+        rule_id = request.form.get('rule_id')
+        target_id = request.form.get('target_id')
+        tax_deductible = request.form.get('tax_deductible')
+
+        try:
+            categorization_rules.save_categorization_rule(
+                pattern=request.form.get('pattern'),
+                match_type=request.form.get('match_type', 'contains'),
+                kind=request.form.get('kind'),
+                target_id=int(target_id) if target_id else None,
+                priority=int(request.form.get('priority') or 100),
+                tax_deductible=tax_deductible == '1' if tax_deductible in ('0', '1') else None,
+                rule_id=int(rule_id) if rule_id and rule_id.isdigit() else None
+            )
+            flash('Rule saved successfully', 'success')
+        except ValueError as e:
+            mark_session_failed()
+            flash(f'Error saving rule: {str(e)}', 'error')
+
+        return redirect('/categorization_rules')
+
+    @app.route('/delete_categorization_rule', methods=['POST'])
+    def delete_categorization_rule():
+        """Delete a categorization rule"""
+        rule_id = request.form.get('delete_id')
+
+        if rule_id and rule_id.isdigit():
+            categorization_rules.delete_categorization_rule(int(rule_id))
+
+        return redirect('/categorization_rules')
@@ -0,0 +1,281 @@
+"""
+Background jobs importing bank statements.
+
+An upload is saved to a file of its own (so concurrent uploads don't
+overwrite each other) and imported on a worker thread while the request
+returns at once. Jobs are recorded in the import_jobs table. The import
+commits batch by batch, and the job's counters are saved in each batch's
+transaction, so a job that fails or is interrupted by a restart can be
+resumed after the rows it already imported; its file is kept until it
+succeeds.
+"""
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from src.models import db
+from src.finance.bbva_import import import_statement
+
+# Worker threads running imports. SQLite has a single writer, so more
+# workers would only wait for each other's batches.
+IMPORT_WORKERS = 1
+
+# Errors of a job kept in the table
+MAX_STORED_ERRORS = 100
+
+JOB_COLUMNS = ('id', 'filename', 'status', 'rows_read', 'expenses_imported', 'incomes_imported', 'duplicates',
+               'errors', 'message', 'created_at', 'finished_at', 'path', 'statement_format',
+               'default_expense_category', 'default_income_source')
+
+def get_upload_dir():
+    """Get the directory of uploaded statements waiting to be imported, next to the database file"""
+    return os.path.join(os.path.dirname(os.path.abspath(db.DB_FILE)), 'imports')
+
+def mark_interrupted_jobs():
+    """
+    Mark the jobs left running by a previous process as failed, so they can be resumed.
+
+    Returns:
+        int: Number of jobs marked
+    """
+    with db.get_db_connection() as conn:
+        cursor = conn.execute('''
+        UPDATE import_jobs SET status = 'failed', message = 'Interrupted by a restart', finished_at = ?
+        WHERE status IN ('queued', 'running')
+        ''', (datetime.now().isoformat(timespec='seconds'),))
+        conn.commit()
+        return cursor.rowcount
+
+def init_app(app):
+    """Mark the import jobs cut short by the previous run of the application as failed"""
+    try:
+        count = mark_interrupted_jobs()
+    except sqlite3.Error as e:
+        print(f"Error checking for interrupted import jobs: {e}")
+        return
+    if count:
+        print(f"Marked {count} interrupted import jobs as failed")
+
+
+_executor_lock = threading.Lock()
+_executor = None
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=IMPORT_WORKERS, thread_name_prefix='statement-import')
+        return _executor
+
+def shutdown_import_workers(wait=True):
+    """Stop the import worker threads (they are started again on demand)"""
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=wait)
+
+
+_jobs_lock = threading.Lock()
+_live_jobs = {}  # job id -> job dict of queued and running jobs
+
+def _update_live_job(job_id, **values):
+    with _jobs_lock:
+        _live_jobs[job_id].update(values)
+
+def _write_job(conn, job):
+    conn.execute(f'''
+    INSERT OR REPLACE INTO import_jobs ({', '.join(JOB_COLUMNS)})
+    VALUES ({', '.join('?' * len(JOB_COLUMNS))})
+    ''', [json.dumps(job['errors'][:MAX_STORED_ERRORS]) if column == 'errors' else job[column]
+          for column in JOB_COLUMNS])
+
+def _save_job(job_id):
+    with _jobs_lock:
+        job = dict(_live_jobs[job_id])
+    with db.unit_of_work() as session:
+        _write_job(session.connection, job)
+
+def _run_import_job(job_id):
+    with _jobs_lock:
+        job = dict(_live_jobs[job_id])
+    path = job['path']
+    # A resumed job continues after the rows imported by its earlier runs
+    skip_rows = job['rows_read']
+    expenses_before, incomes_before = job['expenses_imported'], job['incomes_imported']
+
+    def checkpoint(conn, rows, expenses_imported, incomes_imported, duplicates):
+        # Saved in the batch's own transaction, so the stored rows_read never lags the stored rows
+        values = dict(rows_read=rows, expenses_imported=expenses_before + expenses_imported,
+                      incomes_imported=incomes_before + incomes_imported, duplicates=job['duplicates'] + duplicates)
+        with _jobs_lock:
+            saved = dict(_live_jobs[job_id], **values)
+        _write_job(conn, saved)
+        db.after_commit(lambda: _update_live_job(job_id, **values))
+
+    succeeded = False
+    try:
+        _update_live_job(job_id, status='running')
+        _save_job(job_id)
+
+        result = import_statement(
+            path,
+            default_expense_category=job['default_expense_category'],
+            default_income_source=job['default_income_source'],
+            check_duplicates=True,
+            statement_format=job['statement_format'],
+            skip_rows=skip_rows,
+            checkpoint=checkpoint
+        )
+        succeeded = result['success']
+        _update_live_job(
+            job_id,
+            status='done' if succeeded else 'failed',
+            rows_read=result.get('rows', skip_rows),
+            expenses_imported=expenses_before + result['expenses_imported'],
+            incomes_imported=incomes_before + result['incomes_imported'],
+            duplicates=job['duplicates'] + len(result.get('duplicates', [])),
+            errors=job['errors'] + result['errors'],
+            message=result['message'],
+            finished_at=datetime.now().isoformat(timespec='seconds')
+        )
+    except Exception as e:
+        print(f"Error importing bank statement {path}: {e}")
+        _update_live_job(job_id, status='failed', errors=job['errors'] + [str(e)],
+                         message=f'Error importing data: {e}',
+                         finished_at=datetime.now().isoformat(timespec='seconds'))
+    finally:
+        # A failed import keeps its file to be resumed
+        if succeeded:
+            if os.path.exists(path):
+                os.remove(path)
+            _update_live_job(job_id, path=None)
+
+    try:
+        _save_job(job_id)
+    except Exception as e:
+        print(f"Error saving import job {job_id}: {e}")
+    with _jobs_lock:
+        del _live_jobs[job_id]
+
+def save_upload(upload, filename):
+    """
+    Save an uploaded statement to a new file in the upload directory.
+
+    Args:
+        upload: Uploaded file (werkzeug FileStorage) or file-like object
+        filename (str): Name of the uploaded file, for its extension
+
+    Returns:
+        str: Path of the saved file
+    """
+    directory = get_upload_dir()
+    os.makedirs(directory, exist_ok=True)
+    fd, path = tempfile.mkstemp(dir=directory, prefix='statement-', suffix=os.path.splitext(filename)[1].lower())
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            if hasattr(upload, 'save'):
+                upload.save(f)
+            else:
+                f.write(upload.read())
+    except BaseException:
+        os.remove(path)
+        raise
+    return path
+
+def _submit(job):
+    """Queue a job on the import workers"""
+    with _jobs_lock:
+        if job['id'] in _live_jobs:
+            raise ValueError("The import job is already running")
+        _live_jobs[job['id']] = job
+    try:
+        _get_executor().submit(_run_import_job, job['id'])
+    except BaseException:
+        with _jobs_lock:
+            del _live_jobs[job['id']]
+        raise
+
+def start_import_job(upload, filename, default_expense_category=None, default_income_source=None,
+                     statement_format=None):
+    """
+    Save an uploaded statement and import it in the background.
+
+    The format of the statement (see src.finance.importers) is detected
+    from the file when statement_format is None.
+
+    Returns:
+        dict: The job (see get_import_job)
+    """
+    path = save_upload(upload, filename)
+    job = {column: None for column in JOB_COLUMNS}
+    job.update(id=uuid.uuid4().hex, filename=os.path.basename(filename), status='queued', rows_read=0,
+               expenses_imported=0, incomes_imported=0, duplicates=0, errors=[], message='',
+               created_at=datetime.now().isoformat(timespec='seconds'), path=path,
+               statement_format=statement_format, default_expense_category=default_expense_category,
+               default_income_source=default_income_source)
+    try:
+        _submit(job)
+    except BaseException:
+        os.remove(path)
+        raise
+    return get_import_job(job['id'])
+
+def resume_import_job(job_id):
+    """
+    Import the rest of a failed job's statement, after the rows it already imported.
+
+    Returns:
+        dict: The job (see get_import_job)
+
+    Raises:
+        ValueError: If the job is unknown, not failed, or its file is gone
+    """
+    job = _load_job(job_id)
+    if job is None:
+        raise ValueError(f"Unknown import job: {job_id}")
+    if job['status'] != 'failed':
+        raise ValueError("Only failed import jobs can be resumed")
+    if not job['path'] or not os.path.exists(job['path']):
+        raise ValueError("The statement of this import job is no longer available")
+
+    job.update(status='queued', message='', finished_at=None)
+    _submit(job)
+    return get_import_job(job_id)
+
+def _load_job(job_id):
+    with _jobs_lock:
+        job = _live_jobs.get(job_id)
+        if job is not None:
+            return dict(job, errors=list(job['errors']))
+
+    with db.get_db_connection() as conn:
+        row = conn.execute(f'SELECT {", ".join(JOB_COLUMNS)} FROM import_jobs WHERE id = ?', (job_id,)).fetchone()
+    if row is None:
+        return None
+    job = dict(zip(JOB_COLUMNS, row))
+    job['errors'] = json.loads(job['errors']) if job['errors'] else []
+    return job
+
+def get_import_job(job_id):
+    """
+    Get an import job.
+
+    Returns:
+        dict: 'id', 'filename', 'status' (queued, running, done or failed), 'rows_read',
+              'expenses_imported', 'incomes_imported', 'duplicates', 'errors', 'message',
+              'created_at', 'finished_at', the import options ('statement_format',
+              'default_expense_category' and 'default_income_source') and whether it
+              is 'resumable'; None if the job is unknown
+    """
+    job = _load_job(job_id)
+    if job is None:
+        return None
+    # The location of the file stays on the server
+    path = job.pop('path')
+    job['resumable'] = job['status'] == 'failed' and bool(path) and os.path.exists(path)
+    return job
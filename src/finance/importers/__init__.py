@@ -0,0 +1,65 @@
+"""
+Bank statement formats.
+
+Each module is a plugin exposing a StatementFormat (see base.py) that detects
+its files and streams their transactions as common transaction records, which
+src.finance.bbva_import categorizes, checks for duplicates and stores. To
+support another format, add a module with a FORMAT and list it in FORMATS.
+"""
+import os
+from src.finance.importers import camt053, delimited, norma43, ofx, xlsx
+from src.finance.importers.base import SNIFF_SIZE, StatementFormat
+
+# In detection order: CSV accepts any delimited text, so it goes last
+FORMATS = [xlsx.FORMAT, camt053.FORMAT, ofx.FORMAT, norma43.FORMAT, delimited.FORMAT]
+
+SUPPORTED_EXTENSIONS = tuple(sorted({extension for statement_format in FORMATS
+                                     for extension in statement_format.extensions}))
+
+def get_format(name):
+    """
+    Get a statement format by name.
+
+    Raises:
+        ValueError: If the format is unknown
+    """
+    for statement_format in FORMATS:
+        if statement_format.name == name:
+            return statement_format
+    raise ValueError(f"Unknown statement format: {name}")
+
+def detect_format(file_path, filename=None):
+    """
+    Detect the format of a statement from its first bytes and extension.
+
+    Args:
+        file_path (str): Statement file
+        filename (str): Original file name, when file_path is a temporary copy
+
+    Raises:
+        ValueError: If the file is in none of the supported formats
+    """
+    extension = os.path.splitext(filename or file_path)[1].lower()
+    with open(file_path, 'rb') as f:
+        head = f.read(SNIFF_SIZE)
+    for statement_format in FORMATS:
+        if statement_format.sniff(head, extension):
+            return statement_format
+    raise ValueError("Unrecognized statement format")
+
+def iter_transactions(file_path, statement_format=None):
+    """
+    Stream the transactions of a statement.
+
+    Args:
+        file_path (str): Statement file
+        statement_format (str or StatementFormat): Format of the file; detected if None
+
+    Returns:
+        tuple: (StatementFormat, generator of transaction dicts)
+    """
+    if statement_format is None:
+        statement_format = detect_format(file_path)
+    elif not isinstance(statement_format, StatementFormat):
+        statement_format = get_format(statement_format)
+    return statement_format, statement_format.iter_transactions(file_path)
@@ -0,0 +1,179 @@
+"""
+Common transaction record and parsing helpers shared by the statement formats.
+"""
+import codecs
+import re
+from collections import namedtuple
+from datetime import datetime
+from src.utils import to_iso_date
+
+# A statement format plugin.
+# name: identifier (e.g. 'ofx'); label: shown to users and in the notes of imported rows;
+# extensions: usual file extensions; sniff(head, extension): whether the first bytes of
+# a file are in this format; iter_transactions(file_path): generator of transaction dicts
+StatementFormat = namedtuple('StatementFormat', ['name', 'label', 'extensions', 'sniff', 'iter_transactions'])
+
+# Bytes read from the start of a file to detect its format and encoding
+SNIFF_SIZE = 4096
+
+# Header names of the statement columns, lower case. The first ones are those
+# of the BBVA "Últimos movimientos" export (F.Valor, Fecha, Concepto, Movimiento, Importe, ...)
+STATEMENT_COLUMNS = {
+    'date': ('fecha', 'f.valor', 'fecha valor', 'fecha operación', 'fecha operacion', 'date', 'booking date',
+             'transaction date', 'posted date'),
+    'description': ('concepto', 'descripción', 'descripcion', 'description', 'payee', 'details', 'memo'),
+    'movement': ('movimiento', 'tipo', 'type'),
+    'amount': ('importe', 'amount', 'cantidad'),
+    'debit': ('cargo', 'debe', 'debit'),
+    'credit': ('abono', 'haber', 'credit'),
+}
+
+# Columns of statements without a recognized header: date, description, amount
+DEFAULT_COLUMN_POSITIONS = {'date': 0, 'description': 1, 'amount': 2}
+
+def find_columns(header):
+    """
+    Find the statement columns in a header row.
+
+    The amount is either one signed column or a pair of debit and credit columns.
+
+    Returns:
+        dict: Column positions by field, or None if the row is not a statement header
+    """
+    names = [str(value).strip().lower() if value is not None else '' for value in header or ()]
+    positions = {}
+    for field, candidates in STATEMENT_COLUMNS.items():
+        for candidate in candidates:
+            if candidate in names:
+                positions[field] = names.index(candidate)
+                break
+    has_amount = 'amount' in positions or ('debit' in positions and 'credit' in positions)
+    if 'date' in positions and 'description' in positions and has_amount:
+        return positions
+    return None
+
+def get_column_positions(header):
+    """Get the positions of the statement columns from its header row, or the default positions"""
+    return find_columns(header) or dict(DEFAULT_COLUMN_POSITIONS)
+
+_NUMBER_CHARACTERS = re.compile(r'[^\d,.\-+()]')
+
+def parse_amount(value):
+    """
+    Parse an amount from a number or text in Spanish or English notation.
+
+    '1.234,56', '1,234.56', '-12,5 €', '(30.00)' and '45-' are all understood.
+
+    Raises:
+        ValueError: If the value is not an amount
+    """
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    text = _NUMBER_CHARACTERS.sub('', str(value or ''))
+    negative = text.startswith('-') or text.endswith('-') or (text.startswith('(') and text.endswith(')'))
+    text = text.strip('-+()')
+    if not text:
+        raise ValueError(f"Invalid amount: {value}")
+
+    if ',' in text and '.' in text:
+        # The last separator is the decimal one
+        thousands = '.' if text.rfind(',') > text.rfind('.') else ','
+        text = text.replace(thousands, '').replace(',', '.')
+    elif ',' in text:
+        # A comma followed by three digits (and nothing else) groups thousands
+        text = text.replace(',', '') if re.fullmatch(r'\d{1,3}(,\d{3})+', text) else text.replace(',', '.')
+    elif re.fullmatch(r'\d{1,3}(\.\d{3}){2,}', text):
+        text = text.replace('.', '')
+
+    amount = float(text)
+    return -amount if negative else amount
+
+def debit_credit_amount(debit, credit):
+    """Get the signed amount of a row with separate debit and credit columns"""
+    if debit not in (None, ''):
+        amount = parse_amount(debit)
+        if amount:
+            return -abs(amount)
+    return credit
+
+_DATE_FORMATS = ('%d.%m.%Y', '%Y%m%d', '%d/%m/%y', '%Y/%m/%d')
+
+def parse_date(value):
+    """Normalize a statement date to ISO YYYY-MM-DD, or return it unchanged if it can't be parsed"""
+    iso = to_iso_date(value)
+    if iso is not value:
+        return iso
+    for input_format in _DATE_FORMATS:
+        try:
+            return datetime.strptime(str(value).strip()[:10], input_format).strftime('%Y-%m-%d')
+        except ValueError:
+            continue
+    return value
+
+def make_transaction(date, description, amount, movement=None):
+    """
+    Build the transaction record every format yields.
+
+    Returns:
+        dict: 'date' (ISO, or the original text if it can't be parsed), 'description',
+              'movement' (bank's operation type, may be empty), 'amount' (negative for
+              expenses) and 'type' ('expense' or 'income'); None if a field is missing
+              or the amount is invalid
+    """
+    if not date or not description or amount is None or amount == '':
+        return None
+    try:
+        amount = parse_amount(amount)
+    except ValueError:
+        return None
+    return {
+        'date': str(parse_date(date)),
+        'description': str(description).strip(),
+        'movement': str(movement).strip() if movement else '',
+        'amount': amount,
+        'type': 'expense' if amount < 0 else 'income'
+    }
+
+def row_transaction(row, positions):
+    """
+    Build the transaction of a tabular statement row.
+
+    Args:
+        row (sequence): Cell values
+        positions (dict): Column positions from get_column_positions
+
+    Returns:
+        dict: The transaction (see make_transaction), or None if the row is empty or incomplete
+    """
+    if not row or len(row) <= max(positions.values()):
+        return None
+    if 'amount' in positions:
+        amount = row[positions['amount']]
+    else:
+        try:
+            amount = debit_credit_amount(row[positions['debit']], row[positions['credit']])
+        except ValueError:
+            return None
+    return make_transaction(
+        row[positions['date']],
+        row[positions['description']],
+        amount,
+        row[positions['movement']] if 'movement' in positions else None
+    )
+
+def detect_encoding(head):
+    """Guess the text encoding of a file from its first bytes: UTF-8 (with or without BOM) or Windows-1252"""
+    if head.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+    try:
+        # The sample may end in the middle of a character
+        codecs.getincrementaldecoder('utf-8')().decode(head, final=False)
+        return 'utf-8'
+    except UnicodeDecodeError:
+        return 'cp1252'
+
+def open_text(file_path):
+    """Open a text statement for streaming with its detected encoding"""
+    with open(file_path, 'rb') as f:
+        head = f.read(SNIFF_SIZE)
+    return open(file_path, encoding=detect_encoding(head), errors='replace', newline='')
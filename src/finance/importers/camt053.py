@@ -0,0 +1,66 @@
+"""
+ISO 20022 CAMT.053 statements (bank-to-customer statement XML).
+
+The document is parsed incrementally and each entry (Ntry) is cleared once
+read, so memory does not grow with the statement. Elements are matched by
+their local name, so every version of the camt.053 namespace is accepted.
+"""
+from xml.etree.ElementTree import iterparse
+from src.finance.importers.base import StatementFormat, make_transaction
+
+def _local_name(tag):
+    return tag.rsplit('}', 1)[-1]
+
+def _find(element, *path):
+    """Get the first descendant reached through the local names of path, or None"""
+    for name in path:
+        element = next((child for child in element if _local_name(child.tag) == name), None)
+        if element is None:
+            return None
+    return element
+
+def _text(element, *path):
+    found = _find(element, *path)
+    return found.text.strip() if found is not None and found.text else None
+
+def _counterparty(details, indicator):
+    # The other party: the creditor of a payment, the debtor of a receipt
+    party = 'Cdtr' if indicator == 'DBIT' else 'Dbtr'
+    return _text(details, 'RltdPties', party, 'Nm') or _text(details, 'RltdPties', party, 'Pty', 'Nm')
+
+def _description(entry, indicator):
+    details = _find(entry, 'NtryDtls', 'TxDtls')
+    if details is not None:
+        description = (_text(details, 'RmtInf', 'Ustrd') or _counterparty(details, indicator)
+                       or _text(details, 'AddtlTxInf'))
+        if description:
+            return description
+    return _text(entry, 'AddtlNtryInf')
+
+def _transaction(entry):
+    indicator = _text(entry, 'CdtDbtInd')
+    amount = _text(entry, 'Amt')
+    if amount and indicator == 'DBIT':
+        amount = f'-{amount}'
+    date = (_text(entry, 'BookgDt', 'Dt') or _text(entry, 'BookgDt', 'DtTm')
+            or _text(entry, 'ValDt', 'Dt') or _text(entry, 'ValDt', 'DtTm'))
+    return make_transaction(
+        date[:10] if date else None,
+        _description(entry, indicator),
+        amount,
+        _text(entry, 'BkTxCd', 'Prtry', 'Cd')
+    )
+
+def iter_transactions(file_path):
+    """Stream the entries of a CAMT.053 statement"""
+    for _, element in iterparse(file_path, events=('end',)):
+        if _local_name(element.tag) == 'Ntry':
+            transaction = _transaction(element)
+            element.clear()
+            if transaction:
+                yield transaction
+
+def sniff(head, extension):
+    return b'camt.053' in head or b'BkToCstmrStmt' in head
+
+FORMAT = StatementFormat('camt053', 'CAMT.053', ('.xml',), sniff, iter_transactions)
@@ -0,0 +1,68 @@
+"""
+CSV statements, as exported by most online banking sites.
+
+The delimiter (comma, semicolon, tab or pipe) and the text encoding are detected,
+columns are found by their header names like in Excel statements, and
+amounts may use Spanish or English number notation.
+"""
+import csv
+import itertools
+from collections import Counter
+from src.finance.importers.base import (
+    SNIFF_SIZE, StatementFormat, detect_encoding, find_columns, get_column_positions, open_text, row_transaction
+)
+
+DELIMITERS = ',;\t|'
+
+# Rows before the header some banks write (account number, period, ...)
+MAX_PREAMBLE_ROWS = 10
+
+def detect_delimiter(sample):
+    """
+    Detect the delimiter of a CSV sample: the one that splits the most lines
+    into the same number of fields.
+
+    Preamble lines and decimal commas throw off csv.Sniffer; the rows of
+    the statement itself still agree on one delimiter.
+    """
+    lines = [line for line in sample.splitlines() if line.strip()]
+    best, best_score = ',', (0, 0)
+    for delimiter in DELIMITERS:
+        counts = Counter(line.count(delimiter) for line in lines)
+        counts.pop(0, None)
+        if counts:
+            fields, consistent_lines = max(counts.items(), key=lambda item: (item[1], item[0]))
+            if (consistent_lines, fields) > best_score:
+                best, best_score = delimiter, (consistent_lines, fields)
+    return best
+
+def iter_transactions(file_path):
+    """Stream the transactions of a CSV statement"""
+    with open_text(file_path) as f:
+        sample = f.read(SNIFF_SIZE)
+        f.seek(0)
+        reader = csv.reader(f, delimiter=detect_delimiter(sample))
+
+        # The header is the first row naming the columns; without one, rows are date, description, amount
+        preamble = list(itertools.islice(reader, MAX_PREAMBLE_ROWS))
+        header_index = next((index for index, row in enumerate(preamble) if find_columns(row)), None)
+        if header_index is None:
+            header, rows = None, itertools.chain(preamble, reader)
+        else:
+            header, rows = preamble[header_index], itertools.chain(preamble[header_index + 1:], reader)
+
+        positions = get_column_positions(header)
+        for row in rows:
+            transaction = row_transaction(row, positions)
+            if transaction:
+                yield transaction
+
+def sniff(head, extension):
+    # Any text file with a delimiter in its first line; checked after the other formats
+    if extension not in ('', '.csv', '.txt', '.tsv'):
+        return False
+    text = head.decode(detect_encoding(head), errors='replace')
+    lines = text.splitlines()
+    return bool(lines) and any(delimiter in lines[0] for delimiter in DELIMITERS)
+
+FORMAT = StatementFormat('csv', 'CSV', ('.csv', '.tsv', '.txt'), sniff, iter_transactions)
@@ -0,0 +1,84 @@
+"""
+Norma 43 statements (AEB Cuaderno 43), the fixed-width format of Spanish banks.
+
+Each line is an 80 character record: 11 opens an account, 22 is a movement,
+23 holds the concept text of the movement before it and 33 closes the
+account. The file is read line by line.
+"""
+import re
+from datetime import datetime
+from src.finance.importers.base import StatementFormat, make_transaction, open_text
+
+# Common concept codes (positions 23-24 of a movement)
+COMMON_CONCEPTS = {
+    '01': 'Talones - reintegros',
+    '02': 'Abonarés - entregas - ingresos',
+    '03': 'Domiciliados - recibos - letras - pagos por su cuenta',
+    '04': 'Giros - transferencias - traspasos - cheques',
+    '05': 'Amortizaciones préstamos, créditos, etc.',
+    '06': 'Remesas efectos',
+    '07': 'Suscripciones - dividendos - ventas de derechos',
+    '08': 'Dividendos - cupones - prima junta - amortizaciones',
+    '09': 'Operaciones de bolsa y/o compra/venta valores',
+    '10': 'Cheques gasolina',
+    '11': 'Cajero automático',
+    '12': 'Tarjetas de crédito/débito',
+    '13': 'Operaciones extranjero',
+    '14': 'Devoluciones e impagados',
+    '15': 'Nóminas - seguros sociales',
+    '16': 'Timbres - corretaje - póliza',
+    '17': 'Intereses - comisiones - custodia - gastos e impuestos',
+    '98': 'Anulaciones - correcciones asiento',
+    '99': 'Varios',
+}
+
+def _date(value):
+    try:
+        return datetime.strptime(value, '%y%m%d').strftime('%Y-%m-%d')
+    except ValueError:
+        return None
+
+def _movement(line):
+    """Read a movement record (22), keeping the fields needed once its concepts are known"""
+    amount = line[28:42]
+    if not amount.isdigit():
+        return None
+    amount = int(amount) / 100
+    return {
+        'date': _date(line[10:16]) or _date(line[16:22]),
+        'concept': COMMON_CONCEPTS.get(line[22:24], ''),
+        'reference': line[64:80].strip(),
+        # Key 1 is a debit, 2 a credit
+        'amount': -amount if line[27] == '1' else amount,
+        'texts': []
+    }
+
+def _transaction(movement):
+    description = ' '.join(movement['texts']) or movement['reference'] or movement['concept']
+    return make_transaction(movement['date'], description, movement['amount'], movement['concept'])
+
+def iter_transactions(file_path):
+    """Stream the movements of a Norma 43 statement"""
+    with open_text(file_path) as f:
+        movement = None
+        for line in f:
+            line = line.rstrip('\r\n').ljust(80)
+            record = line[:2]
+            if record == '23' and movement is not None:
+                movement['texts'].extend(text for text in (line[4:42].strip(), line[42:80].strip()) if text)
+                continue
+            if movement is not None:
+                transaction = _transaction(movement)
+                if transaction:
+                    yield transaction
+            movement = _movement(line) if record == '22' else None
+        if movement is not None:
+            transaction = _transaction(movement)
+            if transaction:
+                yield transaction
+
+def sniff(head, extension):
+    # An account header record: 11, bank, branch and account number
+    return re.match(rb'11\d{18}', head) is not None
+
+FORMAT = StatementFormat('norma43', 'Norma 43', ('.n43', '.aeb', '.q43', '.txt'), sniff, iter_transactions)
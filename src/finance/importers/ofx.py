@@ -0,0 +1,59 @@
+"""
+OFX and QFX statements (Open Financial Exchange), versions 1.x (SGML) and 2.x (XML).
+
+The file is scanned tag by tag in chunks, so only the transaction being read
+is held in memory. Version 1 files leave most elements unclosed, so a value
+is the text after its opening tag, and a transaction ends at </STMTTRN>.
+"""
+import html
+import re
+from src.finance.importers.base import StatementFormat, make_transaction, open_text
+
+# Characters read from the file at a time
+CHUNK_SIZE = 64 * 1024
+
+_TAG = re.compile(r'<(/?)([A-Za-z0-9.]+)[^>]*>([^<]*)')
+
+def _iter_tags(f):
+    buffer = ''
+    while True:
+        chunk = f.read(CHUNK_SIZE)
+        buffer += chunk
+        # The last tag and its text may continue in the next chunk
+        end = max(buffer.rfind('<'), 0) if chunk else len(buffer)
+        for match in _TAG.finditer(buffer, 0, end):
+            yield match.group(1) == '/', match.group(2).upper(), html.unescape(match.group(3).strip())
+        if not chunk:
+            return
+        buffer = buffer[end:]
+
+def _transaction(fields):
+    description = fields.get('NAME') or fields.get('MEMO') or fields.get('PAYEE')
+    memo = fields.get('MEMO')
+    if description and memo and memo != description:
+        description = f'{description} {memo}'
+    return make_transaction(
+        fields.get('DTPOSTED', '')[:8] or fields.get('DTUSER', '')[:8],
+        description,
+        fields.get('TRNAMT'),
+        fields.get('TRNTYPE')
+    )
+
+def iter_transactions(file_path):
+    """Stream the transactions of an OFX statement"""
+    with open_text(file_path) as f:
+        fields = None
+        for closing, tag, text in _iter_tags(f):
+            if tag == 'STMTTRN':
+                if closing and fields is not None:
+                    transaction = _transaction(fields)
+                    if transaction:
+                        yield transaction
+                fields = None if closing else {}
+            elif fields is not None and not closing and text:
+                fields.setdefault(tag, text)
+
+def sniff(head, extension):
+    return b'OFXHEADER' in head or b'<OFX>' in head.upper()
+
+FORMAT = StatementFormat('ofx', 'OFX', ('.ofx', '.qfx'), sniff, iter_transactions)
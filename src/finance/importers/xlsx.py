@@ -0,0 +1,49 @@
+"""
+Excel statements, such as the BBVA "Últimos movimientos" export.
+
+The workbook is opened read-only, so rows are streamed from the file rather
+than loaded into memory. Columns are found by their header names (see
+STATEMENT_COLUMNS); other sheets are read as date, description and amount.
+"""
+import openpyxl
+from src.finance.importers.base import StatementFormat, get_column_positions, row_transaction
+
+def iter_statement_rows(file_path):
+    """
+    Yield the rows of a statement's active sheet as they are parsed.
+
+    The workbook is opened read-only with cached formula values instead of formulas.
+    """
+    wb = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        yield from wb.active.iter_rows(values_only=True)
+    finally:
+        wb.close()
+
+def parse_transactions(rows):
+    """
+    Turn raw statement rows into transaction dicts, skipping incomplete rows.
+
+    The first row is the header. Amounts are negative for expenses and
+    positive for incomes.
+
+    Yields:
+        dict: Transaction records (see make_transaction)
+    """
+    rows = iter(rows)
+    positions = get_column_positions(next(rows, None))
+    for row in rows:
+        # Rows that are empty, have missing data or no valid amount are skipped
+        transaction = row_transaction(row, positions)
+        if transaction:
+            yield transaction
+
+def iter_transactions(file_path):
+    """Stream the transactions of an Excel statement"""
+    return parse_transactions(iter_statement_rows(file_path))
+
+def sniff(head, extension):
+    # Workbooks are zip files; other zip files fail when opened
+    return head.startswith(b'PK\x03\x04') and extension in ('', '.xlsx', '.xlsm')
+
+FORMAT = StatementFormat('xlsx', 'BBVA', ('.xlsx',), sniff, iter_transactions)
@@ -0,0 +1,181 @@
+"""
+Memoized merchant to category mapping for bank statement imports.
+
+Statements repeat the same merchants every month. The category a merchant
+was given is remembered in the merchant_categories table, keyed by the
+normalized description, and consulted before the categorization rules, so
+a recurring merchant is categorized with one lookup and always the same
+way. Categories set by hand (expenses and incomes added from the forms)
+take precedence over the ones learned from imports, which are only trusted
+while the categorization rules they came from are unchanged.
+
+Lookups go through a size-bounded in-memory LRU cache in front of the table.
+"""
+import re
+import threading
+from collections import OrderedDict, namedtuple
+from datetime import datetime
+from src.models.db import get_db_connection, get_pool
+
+# Merchants kept in memory
+MERCHANT_CACHE_SIZE = 5000
+
+# Merchants looked up per query
+LOOKUP_CHUNK_SIZE = 500
+
+# Where a merchant's category came from; manual entries are never overwritten by imports
+SOURCES = ('manual', 'import')
+
+MerchantCategory = namedtuple('MerchantCategory', ['target_id', 'tax_deductible'])
+
+_NOISE = re.compile(r'[^A-ZÀ-Ý ]+')
+
+def normalize_merchant(description):
+    """
+    Reduce a description to a merchant key.
+
+    Upper case, without digits (dates, card and reference numbers) or
+    punctuation, and with runs of spaces collapsed:
+    'Macao nikkei    madrid  es 12/05' -> 'MACAO NIKKEI MADRID ES'
+    """
+    return ' '.join(_NOISE.sub(' ', str(description or '').upper()).split())
+
+
+class MerchantCache:
+    """Thread-safe LRU cache in front of the merchant_categories table"""
+
+    def __init__(self, max_entries=MERCHANT_CACHE_SIZE):
+        self.max_entries = max_entries
+        # (database path, rules version, kind, merchant) -> MerchantCategory, or None if unknown
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+    def _put(self, key, value):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats['evictions'] += 1
+
+    def get_many(self, kind, merchants, rules_version):
+        """
+        Get the remembered categories of merchants.
+
+        Merchants not in memory are read from the table with one query per
+        LOOKUP_CHUNK_SIZE merchants; unknown merchants are remembered as such
+        until a category is learned for them.
+
+        Args:
+            kind (str): 'expense' or 'income'
+            merchants: Normalized merchant keys
+            rules_version (int): Current version of the categorization rules
+
+        Returns:
+            dict: merchant -> MerchantCategory for the known merchants
+        """
+        path = get_pool().db_path
+        found = {}
+        missing = []
+        with self._lock:
+            for merchant in set(merchants):
+                if not merchant:
+                    continue
+                key = (path, rules_version, kind, merchant)
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    self.stats['hits'] += 1
+                    if self._entries[key] is not None:
+                        found[merchant] = self._entries[key]
+                else:
+                    self.stats['misses'] += 1
+                    missing.append(merchant)
+
+        if not missing:
+            return found
+
+        loaded = {}
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            for start in range(0, len(missing), LOOKUP_CHUNK_SIZE):
+                chunk = missing[start:start + LOOKUP_CHUNK_SIZE]
+                cursor.execute(f'''
+                SELECT merchant, target_id, tax_deductible FROM merchant_categories
+                WHERE kind = ? AND merchant IN ({', '.join('?' * len(chunk))})
+                AND (source = 'manual' OR rules_version = ?)
+                ''', [kind] + chunk + [rules_version])
+                for merchant, target_id, tax_deductible in cursor.fetchall():
+                    loaded[merchant] = MerchantCategory(
+                        target_id, None if tax_deductible is None else bool(tax_deductible))
+
+        with self._lock:
+            for merchant in missing:
+                self._put((path, rules_version, kind, merchant), loaded.get(merchant))
+        found.update(loaded)
+        return found
+
+    def learn(self, kind, categories, source, rules_version=None):
+        """
+        Remember the categories of merchants.
+
+        Args:
+            kind (str): 'expense' or 'income'
+            categories (dict): merchant -> MerchantCategory
+            source (str): 'manual' or 'import'; imports do not replace manual entries
+            rules_version (int): Version of the rules an imported category came from
+        """
+        rows = [(kind, merchant, category.target_id,
+                 None if category.tax_deductible is None else int(category.tax_deductible),
+                 source, rules_version, datetime.now().isoformat(timespec='seconds'))
+                for merchant, category in categories.items() if merchant]
+        if not rows:
+            return
+        with get_db_connection() as conn:
+            conn.executemany('''
+            INSERT INTO merchant_categories (kind, merchant, target_id, tax_deductible, source, rules_version, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (kind, merchant) DO UPDATE SET
+                target_id = excluded.target_id,
+                tax_deductible = excluded.tax_deductible,
+                source = excluded.source,
+                rules_version = excluded.rules_version,
+                updated_at = excluded.updated_at
+            WHERE excluded.source = 'manual' OR merchant_categories.source != 'manual'
+            ''', rows)
+            conn.commit()
+
+        # Entries of these merchants may now be out of date under any rules version
+        path = get_pool().db_path
+        learned = {row[1] for row in rows}
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == path and key[2] == kind and key[3] in learned]:
+                del self._entries[key]
+
+    def clear(self):
+        """Drop every entry kept in memory"""
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self):
+        """Return a snapshot of the counters, with the hit rate of the in-memory cache"""
+        with self._lock:
+            stats = dict(self.stats)
+            stats['entries'] = len(self._entries)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        stats['max_entries'] = self.max_entries
+        return stats
+
+
+merchant_cache = MerchantCache()
+
+def learn_manual_category(kind, description, target_id, tax_deductible=None):
+    """Remember the category given by hand to a transaction's merchant"""
+    if target_id in (None, ''):
+        return
+    merchant_cache.learn(kind, {normalize_merchant(description): MerchantCategory(int(target_id), tax_deductible)},
+                         'manual')
+
+def get_merchant_cache_stats():
+    """Get the counters of the in-memory merchant cache"""
+    return merchant_cache.get_stats()
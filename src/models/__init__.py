@@ -30,17 +30,32 @@ from src.models.invoices import (
     save_invoice,
     get_recent_invoices,
     get_invoice_by_number,
+    get_invoice_records,
+    get_invoice_currency,
     delete_invoice,
     get_invoices_by_year,
+    get_invoices_page,
+    list_invoices,
+    summarize_invoices,
+    get_invoice_summary_by_year,
+    get_invoice_client_names,
     get_available_invoice_years
 )
 
+# Import preference functions
+from src.models.preferences import (
+    get_preferences,
+    set_preferences,
+    flush_preferences
+)
+
 # Import statistics functions
 from src.models.stats import (
     get_invoice_stats_by_month,
     get_revenue_stats_by_month,
     get_invoice_stats_by_client,
-    get_monthly_invoice_stats_by_client
+    get_monthly_invoice_stats_by_client,
+    get_dashboard_stats
 )
 
 # Export all functions
@@ -60,11 +75,22 @@ __all__ = [
     'save_invoice',
     'get_recent_invoices',
     'get_invoice_by_number',
+    'get_invoice_records',
+    'get_invoice_currency',
     'delete_invoice',
     'get_invoices_by_year',
+    'get_invoices_page',
+    'list_invoices',
+    'summarize_invoices',
+    'get_invoice_summary_by_year',
+    'get_invoice_client_names',
     'get_available_invoice_years',
+    'get_preferences',
+    'set_preferences',
+    'flush_preferences',
     'get_invoice_stats_by_month',
     'get_revenue_stats_by_month',
     'get_invoice_stats_by_client',
-    'get_monthly_invoice_stats_by_client'
+    'get_monthly_invoice_stats_by_client',
+    'get_dashboard_stats'
 ]
@@ -0,0 +1,216 @@
+"""
+Bulk invoice generation for month-end billing runs.
+
+All invoices of a run are validated and priced in one pass, numbered with one
+counter increment per client prefix and inserted with a single executemany in
+one transaction.
+
+Usage:
+    python -m src.models.billing items.json [--db PATH]
+
+where items.json holds a list of objects (or {"items": [...]}) with
+client_id, service_id, quantity and optional date, apply_iva and apply_irpf.
+"""
+import argparse
+import json
+import sys
+import time
+from datetime import datetime
+from src import utils
+from src.models import db
+from src.models.db import unit_of_work
+from src.models.invoices import get_invoice_period, get_client_prefix
+from src.models.sequences import allocate_document_numbers
+
+# Maximum number of ids bound in a single IN (...) lookup
+LOOKUP_CHUNK_SIZE = 500
+
+def _fetch_rows_by_id(cursor, table, ids):
+    """Load rows of a table for a set of ids, keyed by id"""
+    rows = {}
+    ids = list(ids)
+    for start in range(0, len(ids), LOOKUP_CHUNK_SIZE):
+        chunk = ids[start:start + LOOKUP_CHUNK_SIZE]
+        placeholders = ', '.join('?' * len(chunk))
+        cursor.execute(f'SELECT * FROM {table} WHERE id IN ({placeholders})', chunk)
+        for row in cursor.fetchall():
+            rows[row[0]] = row
+    return rows
+
+def _to_int(value):
+    try:
+        return int(value)
+    except (ValueError, TypeError):
+        return None
+
+# Accepted spellings of the apply_iva / apply_irpf flags in JSON and CLI input
+_FLAG_VALUES = {'true': True, '1': True, 'yes': True, 'false': False, '0': False, 'no': False}
+
+def _to_flag(value, name, index):
+    """Parse a tax flag strictly, so a string such as "false" does not count as True"""
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, int) and value in (0, 1):
+        return bool(value)
+    if isinstance(value, str) and value.strip().lower() in _FLAG_VALUES:
+        return _FLAG_VALUES[value.strip().lower()]
+    raise ValueError(f"Item {index}: invalid {name} value {value!r} (expected true or false)")
+
+def _is_iso_date(value):
+    try:
+        datetime.strptime(value, '%Y-%m-%d')
+        return True
+    except (ValueError, TypeError):
+        return False
+
+def generate_invoices_bulk(items):
+    """
+    Create many invoices in one transaction.
+
+    Args:
+        items (list): Dicts with client_id, service_id, quantity and optional
+                      date (YYYY-MM-DD or DD/MM/YYYY), apply_iva and apply_irpf;
+                      entries that are not dicts are reported as failed items
+
+    Returns:
+        dict: 'created', 'failed', per-item 'results' (in input order),
+              'elapsed_seconds' and 'invoices_per_second'
+
+    Raises:
+        ValueError: If an apply_iva or apply_irpf flag is not a boolean; nothing is created then
+    """
+    start_time = time.perf_counter()
+    results = [None] * len(items)
+
+    valid_items = []
+    for index, item in enumerate(items):
+        if isinstance(item, dict):
+            valid_items.append((index, item))
+        else:
+            results[index] = {'index': index, 'success': False,
+                              'error': 'Expected an object with client_id, service_id and quantity'}
+
+    # Tax flags are checked before anything is written, so a malformed run is rejected as a whole
+    flags = {index: (_to_flag(item.get('apply_iva', True), 'apply_iva', index),
+                     _to_flag(item.get('apply_irpf', True), 'apply_irpf', index))
+             for index, item in valid_items}
+
+    # Tax rates are read once for the whole run
+    tax_rates = utils.get_tax_rates()
+    today = datetime.now().strftime('%Y-%m-%d')
+    period = get_invoice_period()
+
+    with unit_of_work() as session:
+        cursor = session.connection.cursor()
+
+        clients = _fetch_rows_by_id(cursor, 'clients',
+                                    {_to_int(item.get('client_id')) for _, item in valid_items} - {None})
+        services = _fetch_rows_by_id(cursor, 'services',
+                                     {_to_int(item.get('service_id')) for _, item in valid_items} - {None})
+
+        # Validate and price every item in one pass
+        pending = []
+        for index, item in valid_items:
+            client = clients.get(_to_int(item.get('client_id')))
+            service = services.get(_to_int(item.get('service_id')))
+            success, quantity, error_msg = utils.validate_and_convert_quantity(item.get('quantity', 1))
+            invoice_date = utils.to_iso_date(item.get('date') or today)
+
+            if client is None:
+                error_msg = f"Client {item.get('client_id')} not found"
+            elif service is None:
+                error_msg = f"Service {item.get('service_id')} not found"
+            elif success and not _is_iso_date(invoice_date):
+                error_msg = f"Invalid date: {item.get('date')}"
+
+            if error_msg:
+                results[index] = {'index': index, 'success': False, 'error': error_msg}
+                continue
+
+            apply_iva, apply_irpf = flags[index]
+            totals = utils.calculate_financials(
+                service[2] * quantity,
+                tax_rates.iva if apply_iva else 0,
+                tax_rates.irpf if apply_irpf else 0
+            )
+            pending.append((index, client, service, quantity, invoice_date, apply_iva, apply_irpf, totals))
+
+        # Reserve all numbers of a client prefix with a single counter update
+        by_prefix = {}
+        for entry in pending:
+            by_prefix.setdefault(get_client_prefix(entry[1][1]), []).append(entry)
+
+        rows = []
+        for prefix, entries in by_prefix.items():
+            numbers = allocate_document_numbers('invoice', period, count=len(entries), prefix=prefix)
+            for invoice_number, (index, client, service, quantity, invoice_date, apply_iva, apply_irpf, totals) in zip(numbers, entries):
+                currency_code = client[6] or 'EUR'
+                currency_symbol = client[7] or '€'
+                rows.append((client[0], service[0], quantity, invoice_date, invoice_number, apply_iva, apply_irpf,
+                             totals['subtotal'], totals['iva_amount'], totals['irpf_amount'], totals['total'],
+                             currency_code, currency_symbol))
+                results[index] = {
+                    'index': index,
+                    'success': True,
+                    'invoice_number': invoice_number,
+                    'client_id': client[0],
+                    'date': invoice_date,
+                    'total': totals['total'],
+                    'currency_code': currency_code
+                }
+
+        cursor.executemany('''
+        INSERT INTO invoices (client_id, service_id, quantity, date, invoice_number, apply_iva, apply_irpf,
+                             subtotal, iva_amount, irpf_amount, total_amount, currency_code, currency_symbol)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', rows)
+
+    elapsed = time.perf_counter() - start_time
+    return {
+        'created': len(rows),
+        'failed': len(items) - len(rows),
+        'results': results,
+        'elapsed_seconds': round(elapsed, 4),
+        'invoices_per_second': round(len(rows) / elapsed, 1) if elapsed > 0 else None
+    }
+
+def main(argv=None):
+    """Command line entry point for bulk billing runs"""
+    parser = argparse.ArgumentParser(description='Generate invoices in bulk from a JSON file.')
+    parser.add_argument('items_file', help='JSON file with a list of invoice items (or {"items": [...]})')
+    parser.add_argument('--db', help='Database file (defaults to the application database)')
+    args = parser.parse_args(argv)
+
+    if args.db:
+        db.DB_FILE = args.db
+    db.init_db()
+
+    try:
+        with open(args.items_file, 'r') as f:
+            data = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"ERROR: Could not read {args.items_file}: {e}")
+        return 1
+    items = data.get('items', []) if isinstance(data, dict) else data
+    if not isinstance(items, list):
+        print('ERROR: Expected a JSON list of invoice items or {"items": [...]}')
+        return 1
+
+    try:
+        report = generate_invoices_bulk(items)
+    except ValueError as e:
+        print(f"ERROR: {e}")
+        return 1
+
+    for result in report['results']:
+        if result['success']:
+            print(f"[{result['index']}] {result['invoice_number']} {result['date']} {result['total']:.2f} {result['currency_code']}")
+        else:
+            print(f"[{result['index']}] ERROR: {result['error']}")
+
+    print(f"Created {report['created']} invoices, {report['failed']} failed "
+          f"in {report['elapsed_seconds']}s ({report['invoices_per_second']} invoices/s)")
+    return 0 if report['failed'] == 0 else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
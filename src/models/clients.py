@@ -1,7 +1,8 @@
 """
 Client-related database operations for the Invoice Generator application.
 """
-from src.models.db import get_db_connection
+from src.models.db import after_commit, get_db_connection
+from src.render_cache import invalidate_invoices
 
 def get_clients():
     """Get all clients from the database"""
@@ -43,6 +44,8 @@ def update_client(client_id, name, tax_id, address, country, email, currency_cod
         ''', (name, tax_id, address, country, email, currency_code, currency_symbol, client_id))
 
         conn.commit()
+        # Rendered invoices print the client's details; drop them once the update is committed
+        after_commit(invalidate_invoices)
         return True
 
 def delete_client(client_id):
@@ -3,122 +3,365 @@ Database connection and initialization for the Invoice Generator application.
 """
 import sqlite3
 import os
+import threading
 from contextlib import contextmanager
+from flask import g, has_request_context
 
 # Database file
 DB_FILE = 'db/invoices.db'
 
+# Maximum number of idle connections kept open per database file
+POOL_SIZE = 5
+
+# Pragmas applied once when a pooled connection is opened
+SQLITE_PRAGMAS = (
+    ('journal_mode', 'WAL'),
+    ('synchronous', 'NORMAL'),
+    ('cache_size', -8000),  # Negative value means KiB, i.e. 8 MB of page cache
+    ('mmap_size', 268435456),  # 256 MB
+    ('temp_store', 'MEMORY'),
+)
+
+
+class ConnectionPool:
+    """Thread-safe pool of SQLite connections for a single database file.
+
+    A thread that already holds a connection gets the same one back on nested
+    calls, so a request only ever uses one connection per database. Released
+    connections are kept idle (up to pool_size) and handed to the next caller
+    instead of reconnecting.
+    """
+
+    def __init__(self, db_path, pool_size=POOL_SIZE):
+        self.db_path = db_path
+        self.pool_size = pool_size
+        self._idle = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.stats = {'hits': 0, 'misses': 0, 'connections_opened': 0, 'connections_closed': 0}
+
+    def _connect(self):
+        """Open a new connection and apply the tuning pragmas"""
+        # Connections move between threads through the pool, but only one
+        # thread uses a given connection at a time
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        for name, value in SQLITE_PRAGMAS:
+            conn.execute(f'PRAGMA {name} = {value}')
+        with self._lock:
+            self.stats['connections_opened'] += 1
+        return conn
+
+    def acquire(self):
+        """Get a connection for the current thread"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            self._local.depth += 1
+            with self._lock:
+                self.stats['hits'] += 1
+            return conn
+
+        with self._lock:
+            conn = self._idle.pop() if self._idle else None
+            self.stats['hits' if conn is not None else 'misses'] += 1
+
+        if conn is None:
+            conn = self._connect()
+
+        self._local.conn = conn
+        self._local.depth = 1
+        return conn
+
+    def release(self):
+        """Give back the current thread's connection once its outermost user is done"""
+        self._local.depth -= 1
+        if self._local.depth > 0:
+            return
+
+        conn = self._local.conn
+        self._local.conn = None
+
+        try:
+            # Same semantics as closing a connection: uncommitted work is discarded
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            self._close(conn)
+            return
+
+        with self._lock:
+            if len(self._idle) < self.pool_size:
+                self._idle.append(conn)
+                return
+        self._close(conn)
+
+    def _close(self, conn):
+        conn.close()
+        with self._lock:
+            self.stats['connections_closed'] += 1
+
+    def close(self):
+        """Close all idle connections"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            self._close(conn)
+
+    def get_stats(self):
+        """Return a snapshot of the pool counters"""
+        with self._lock:
+            stats = dict(self.stats)
+            stats['idle'] = len(self._idle)
+        stats['pool_size'] = self.pool_size
+        return stats
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+def get_pool(db_path=None):
+    """Get (or create) the connection pool for a database file"""
+    path = os.path.abspath(db_path if db_path else DB_FILE)
+    with _pools_lock:
+        pool = _pools.get(path)
+        if pool is None:
+            pool = _pools[path] = ConnectionPool(path, POOL_SIZE)
+        return pool
+
+def configure_pool(pool_size):
+    """Set the number of idle connections kept per database file"""
+    global POOL_SIZE
+    POOL_SIZE = pool_size
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.pool_size = pool_size
+
+def get_pool_stats(db_path=None):
+    """Get hit/miss counters for the pool of a database file"""
+    return get_pool(db_path).get_stats()
+
+def close_pool(db_path=None):
+    """Close idle connections of one database file, or of all pools if no path is given"""
+    with _pools_lock:
+        if db_path is None:
+            pools = list(_pools.values())
+            _pools.clear()
+        else:
+            pool = _pools.pop(os.path.abspath(db_path), None)
+            pools = [pool] if pool else []
+    for pool in pools:
+        pool.close()
+
+class _SessionConnection:
+    """Connection proxy handed to model functions inside a unit of work.
+
+    Model functions keep calling conn.commit() as usual; inside a session those
+    calls are deferred so all their writes are committed once, together.
+    conn.rollback() undoes the writes of the current get_db_connection() block
+    (its savepoint), or marks the whole session failed outside of one.
+    """
+
+    def __init__(self, conn, session, savepoint_name=None):
+        self._conn = conn
+        self._session = session
+        self._savepoint = savepoint_name
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        if self._savepoint is None:
+            self._session.failed = True
+        else:
+            self._conn.execute(f'ROLLBACK TO {self._savepoint}')
+
+    def close(self):
+        pass
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+class DatabaseSession:
+    """A single connection and transaction shared by every model call in a unit of work"""
+
+    def __init__(self, db_path=None):
+        self.pool = get_pool(db_path)
+        self._conn = self.pool.acquire()
+        self.connection = _SessionConnection(self._conn, self)
+        # Set when a model rolls back the session or a view reports an error; nothing is committed then
+        self.failed = False
+        self._depth = 0
+        self._after_commit = []
+
+    @contextmanager
+    def call(self):
+        """Run one model call in a savepoint, so its failure only undoes its own writes"""
+        self._depth += 1
+        name = f'call_{self._depth}'
+        try:
+            with savepoint(self._conn, name):
+                yield _SessionConnection(self._conn, self, name)
+        finally:
+            self._depth -= 1
+
+    def after_commit(self, callback):
+        """Run callback once the session's writes are committed; dropped on rollback"""
+        self._after_commit.append(callback)
+
+    def commit(self):
+        if self.failed:
+            self.rollback()
+            return
+        self._conn.commit()
+        callbacks, self._after_commit = self._after_commit, []
+        for callback in callbacks:
+            callback()
+
+    def rollback(self):
+        self._after_commit = []
+        self._conn.rollback()
+
+    def close(self):
+        self.pool.release()
+
+
+_session_local = threading.local()
+
+def _get_session(pool):
+    """Return the active session for this pool, if any"""
+    session = getattr(_session_local, 'session', None)
+    if session is None and has_request_context():
+        session = g.get('db_session')
+        if session is None:
+            # Lazily open the request session on the first database access
+            session = g.db_session = DatabaseSession(pool.db_path)
+    if session is not None and session.pool is pool:
+        return session
+    return None
+
+@contextmanager
+def unit_of_work(db_path=None):
+    """Run a block of model calls on one connection and commit them as one transaction.
+
+    Inside a Flask request the request session is used instead, so nesting
+    joins the outer unit of work rather than committing early. A session
+    marked failed (see mark_session_failed) is rolled back at the end.
+    """
+    pool = get_pool(db_path)
+    existing = _get_session(pool)
+    if existing is not None:
+        yield existing
+        return
+
+    session = DatabaseSession(db_path)
+    _session_local.session = session
+    try:
+        yield session
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        _session_local.session = None
+        session.close()
+
+@contextmanager
+def savepoint(conn, name='sp'):
+    """Run a block of writes inside a SAVEPOINT of the current transaction.
+
+    If the block raises, only its own writes are undone and the enclosing
+    transaction carries on. A transaction is started if none is open yet.
+    """
+    if not conn.in_transaction:
+        conn.execute('BEGIN')
+    conn.execute(f'SAVEPOINT {name}')
+    try:
+        yield conn
+    except BaseException:
+        conn.execute(f'ROLLBACK TO {name}')
+        conn.execute(f'RELEASE {name}')
+        raise
+    conn.execute(f'RELEASE {name}')
+
+def mark_session_failed(db_path=None):
+    """Have the active unit of work roll back instead of committing, e.g. after a view reports an error"""
+    session = _get_session(get_pool(db_path))
+    if session is not None:
+        session.failed = True
+
+def after_commit(callback, db_path=None):
+    """Run callback after the active unit of work commits, or right away outside of one.
+
+    Use it for side effects that must not be seen before the writes they
+    describe, such as dropping cached renderings of a changed row.
+    """
+    session = _get_session(get_pool(db_path))
+    if session is not None:
+        session.after_commit(callback)
+    else:
+        callback()
+
+def init_app(app):
+    """Bind a request-scoped database session to the Flask app.
+
+    The session is opened on the first database access of a request and
+    committed once after the view returns. Requests that raise, respond
+    with an error status or mark the session failed are rolled back.
+    """
+
+    @app.after_request
+    def commit_db_session(response):
+        session = g.pop('db_session', None)
+        if session is not None:
+            try:
+                if response.status_code >= 400:
+                    session.failed = True
+                session.commit()
+            finally:
+                session.close()
+        return response
+
+    @app.teardown_request
+    def close_db_session(exc):
+        session = g.pop('db_session', None)
+        if session is not None:
+            session.rollback()
+            session.close()
+
 @contextmanager
 def get_db_connection(db_path=None):  # Add db_path parameter with a default
-    """Context manager for database connections to ensure proper closing"""
-    path_to_connect = db_path if db_path else DB_FILE  # Use db_path if provided
-    conn = sqlite3.connect(path_to_connect)
+    """Context manager that borrows a pooled connection and always gives it back.
+
+    If a unit of work is active (including the current Flask request), its
+    connection is used and commits are deferred to the end of the unit of work.
+    """
+    pool = get_pool(db_path)
+    session = _get_session(pool)
+    if session is not None:
+        with session.call() as conn:
+            yield conn
+        return
+
+    conn = pool.acquire()
     try:
         yield conn
     finally:
-        conn.close()
+        pool.release()
 
 def init_db():
-    """Initialize database, create tables if they don't exist"""
+    """Initialize database: apply pending schema migrations and seed a new database"""
+    from src.models import migrations
+
     # Check if database file exists
     db_exists = os.path.exists(DB_FILE)
 
-    # Flag to check if we need to update existing clients with currency info
-    need_currency_update = False
-    need_invoice_update = False
-
-    if db_exists:
-        # Check if clients table already has currency columns
-        with get_db_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("PRAGMA table_info(clients)")
-            columns = cursor.fetchall()
-            column_names = [column[1] for column in columns]
-            if 'currency_code' not in column_names or 'currency_symbol' not in column_names:
-                need_currency_update = True
-
-            # Check if invoices table has all required columns
-            cursor.execute("PRAGMA table_info(invoices)")
-            invoice_columns = cursor.fetchall()
-            invoice_column_names = [column[1] for column in invoice_columns]
-            required_invoice_columns = ['subtotal', 'iva_amount', 'irpf_amount', 'total_amount', 'currency_code', 'currency_symbol']
-            for col in required_invoice_columns:
-                if col not in invoice_column_names:
-                    need_invoice_update = True
-                    break
-
     with get_db_connection() as conn:
-        cursor = conn.cursor()
-
-        # Create tables if they don't exist
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS clients (
-            id INTEGER PRIMARY KEY,
-            name TEXT NOT NULL,
-            tax_id TEXT NOT NULL,
-            address TEXT NOT NULL,
-            country TEXT NOT NULL,
-            email TEXT,
-            currency_code TEXT,
-            currency_symbol TEXT
-        )
-        ''')
-
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS services (
-            id INTEGER PRIMARY KEY,
-            description TEXT NOT NULL,
-            unit_price REAL NOT NULL,
-            unit_type TEXT NOT NULL
-        )
-        ''')
-
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS invoices (
-            id INTEGER PRIMARY KEY,
-            client_id INTEGER NOT NULL,
-            service_id INTEGER NOT NULL,
-            quantity INTEGER NOT NULL,
-            date TEXT NOT NULL,
-            invoice_number TEXT NOT NULL,
-            apply_iva BOOLEAN DEFAULT 1,
-            apply_irpf BOOLEAN DEFAULT 1,
-            subtotal REAL,
-            iva_amount REAL,
-            irpf_amount REAL,
-            total_amount REAL,
-            currency_code TEXT,
-            currency_symbol TEXT,
-            FOREIGN KEY (client_id) REFERENCES clients (id),
-            FOREIGN KEY (service_id) REFERENCES services (id)
-        )
-        ''')
-
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS estimates (
-            id INTEGER PRIMARY KEY,
-            estimate_number TEXT NOT NULL,
-            client_id INTEGER NOT NULL,
-            service_id INTEGER NOT NULL,
-            quantity REAL NOT NULL,
-            issue_date TEXT NOT NULL,
-            valid_until_date TEXT NOT NULL,
-            subtotal REAL NOT NULL,
-            iva_amount REAL NOT NULL,
-            irpf_rate REAL NOT NULL,
-            irpf_amount REAL NOT NULL,
-            total REAL NOT NULL,
-            currency TEXT NOT NULL,
-            status TEXT NOT NULL,
-            notes TEXT,
-            terms TEXT,
-            FOREIGN KEY (client_id) REFERENCES clients (id),
-            FOREIGN KEY (service_id) REFERENCES services (id)
-        )
-        ''')
+        # Fast path: a single version query when the schema is current
+        migrations.migrate(conn)
 
         # Insert sample data if database was just created
         if not db_exists:
+            cursor = conn.cursor()
             try:
                 # Sample clients
                 cursor.execute('''
@@ -138,67 +381,28 @@ def init_db():
                      'Desarrollo de software', 65.00, 'hora',
                      'Mantenimiento mensual', 150.00, 'mes'))
 
+                conn.commit()
                 print("Sample data inserted successfully")
             except Exception as e:
                 print(f"Error inserting sample data: {e}")
 
-        conn.commit()
+    print(f"Database initialized at {DB_FILE}")
 
-        # Update existing clients with currency information if needed
-        if need_currency_update:
-            print("Updating existing clients with currency information...")
-            try:
-                # Get all clients
-                cursor.execute('SELECT id, country FROM clients')
-                clients = cursor.fetchall()
-
-                # Update each client based on their country
-                for client_id, country in clients:
-                    if country.upper() in ['USA', 'EEUU', 'UNITED STATES', 'ESTADOS UNIDOS']:
-                        cursor.execute(
-                            'UPDATE clients SET currency_code = ?, currency_symbol = ? WHERE id = ?',
-                            ('USD', '$', client_id)
-                        )
-                    else:
-                        cursor.execute(
-                            'UPDATE clients SET currency_code = ?, currency_symbol = ? WHERE id = ?',
-                            ('EUR', '€', client_id)
-                        )
+def get_year_date_range(year):
+    """Get the [start, end) ISO date bounds of a year"""
+    year = int(year)
+    return (f'{year:04d}-01-01', f'{year + 1:04d}-01-01')
 
-                conn.commit()
-                print("Currency information updated successfully")
-            except Exception as e:
-                print(f"Error updating currency information: {e}")
-
-        # Update invoices table structure if needed
-        if need_invoice_update:
-            print("Updating invoices table structure...")
-            # Add missing columns to invoices table
-            required_invoice_columns = [
-                ('subtotal', 'REAL'),
-                ('iva_amount', 'REAL'),
-                ('irpf_amount', 'REAL'),
-                ('total_amount', 'REAL'),
-                ('currency_code', 'TEXT'),
-                ('currency_symbol', 'TEXT')
-            ]
-
-            for col_name, col_type in required_invoice_columns:
-                try:
-                    cursor.execute(f'ALTER TABLE invoices ADD COLUMN {col_name} {col_type}')
-                    print(f"Added column {col_name} to invoices table.")
-                except Exception as e:
-                    # Column might already exist, ignore the error
-                    pass
-
-            conn.commit()
-            print("Invoices table structure updated successfully.")
-
-    print(f"Database initialized at {DB_FILE}")
+def get_date_filter_clause(year=None, column='date'):
+    """Generate SQL clause for date filtering.
 
-def get_date_filter_clause(year=None):
-    """Generate SQL clause for date filtering"""
-    base_clause = "date IS NOT NULL AND length(date) >= 10"
+    With a year, the clause is a range predicate that can seek the date index;
+    bind it with get_date_filter_params(year).
+    """
     if year:
-        return f"{base_clause} AND substr(date, 7, 4) = ?"
-    return base_clause
+        return f"{column} >= ? AND {column} < ?"
+    return f"{column} IS NOT NULL"
+
+def get_date_filter_params(year=None):
+    """Get the parameters for get_date_filter_clause"""
+    return get_year_date_range(year) if year else ()
@@ -3,22 +3,21 @@ Estimate-related database operations for the Invoice Generator application.
 """
 import sqlite3 # Added import for sqlite3.Error
 from datetime import datetime
-from src.models.db import get_db_connection
-from src.utils import calculate_financials, load_config # Import the new utility function
+from src.models.db import get_db_connection, get_year_date_range
+from src.models.sequences import allocate_document_numbers
+from src.models.queries import ESTIMATE_LISTING, DEFAULT_PAGE_SIZE, run_listing, summarize_listing
+from src.utils import calculate_financials, get_tax_rates
+
+# Statuses offered in the estimate filters (new estimates start as Draft)
+ESTIMATE_STATUSES = ('Draft', 'Sent', 'Accepted', 'Rejected')
 
 def generate_estimate_number(issue_date_obj):
     """Generate a sequential estimate number (e.g., YYYY-MM-PXXX)."""
     # issue_date_obj should be a datetime object
     year_month_prefix = issue_date_obj.strftime("%Y-%m") # Format YYYY-MM
 
-    with get_db_connection() as conn:
-        cursor = conn.cursor()
-        # Count estimates from this year and month
-        query = f"SELECT COUNT(*) FROM estimates WHERE estimate_number LIKE '{year_month_prefix}-P%'"
-        cursor.execute(query)
-        count = cursor.fetchone()[0]
-        # Create estimate number: YYYY-MM-PXXX (e.g., 2024-07-P001)
-        return f"{year_month_prefix}-P{(count + 1):03d}"
+    # Create estimate number: YYYY-MM-PXXX (e.g., 2024-07-P001) by default
+    return allocate_document_numbers('estimate', year_month_prefix)[0]
 
 # TODO: Adapt to handle multiple services per estimate.
 # This would require a separate estimate_items table.
@@ -50,9 +49,7 @@ def save_estimate(client_id, service_id, quantity, issue_date_str, valid_until_d
             
             # 4. Use calculate_financials for tax and total calculation
             # Get IVA rate from configuration for consistency
-            config = load_config()
-            default_iva = config.get('tax_rates', {}).get('default_iva', 0.21)
-            financials = calculate_financials(subtotal, default_iva, float(irpf_rate_decimal))
+            financials = calculate_financials(subtotal, get_tax_rates().iva, float(irpf_rate_decimal))
             
             # 5. Insert into estimates table
             sql = '''INSERT INTO estimates (
@@ -161,3 +158,69 @@ def delete_estimate(estimate_number):
     except sqlite3.Error as e:
         print(f"Database error in delete_estimate: {e}")
         return False
+
+def list_estimates(filters=None, sort=None, direction=None, limit=DEFAULT_PAGE_SIZE, after=None):
+    """
+    Get one page of estimates matching the given filters.
+
+    Args:
+        filters (dict): Filter values, see ESTIMATE_LISTING in src/models/queries.py
+                        (year, month, date_from, date_to, client_id, client, currency,
+                        status, min_amount, max_amount, apply_irpf, search)
+        sort (str): 'date', 'number', 'client', 'amount', 'status' or 'valid_until'
+        direction (str): 'asc' or 'desc'
+        limit (int): Page size
+        after (str): Cursor of the last row of the previous page
+
+    Returns:
+        tuple: (list of estimate dicts, cursor of the next page or None)
+
+    Raises:
+        ValueError: If a filter value is invalid
+    """
+    rows, columns, next_cursor = run_listing(ESTIMATE_LISTING, filters, sort, direction, limit, after)
+    return [dict(zip(columns, row)) for row in rows], next_cursor
+
+def summarize_estimates(filters=None):
+    """
+    Get the totals of all estimates matching the filters, computed in SQL.
+
+    Returns:
+        dict: 'count', 'total_amount', 'unique_clients' and 'by_status' counts
+    """
+    count, total_amount, unique_clients = summarize_listing(ESTIMATE_LISTING, filters)
+
+    where_clause, params = ESTIMATE_LISTING.where(filters)
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(f'''
+        SELECT e.status, COUNT(*) {ESTIMATE_LISTING.from_sql} {where_clause} GROUP BY e.status
+        ''', params)
+        by_status = dict(cursor.fetchall())
+
+    return {'count': count, 'total_amount': total_amount, 'unique_clients': unique_clients, 'by_status': by_status}
+
+def get_estimate_client_names(year):
+    """Get the sorted names of clients with estimates issued in a year"""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+        SELECT DISTINCT c.name
+        FROM estimates e
+        JOIN clients c ON e.client_id = c.id
+        WHERE e.issue_date >= ? AND e.issue_date < ?
+        ORDER BY c.name
+        ''', get_year_date_range(year))
+        return [row[0] for row in cursor.fetchall()]
+
+def get_available_estimate_years():
+    """Get list of years for which estimates exist"""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+        SELECT DISTINCT substr(issue_date, 1, 4) as year
+        FROM estimates
+        WHERE issue_date IS NOT NULL AND length(issue_date) >= 10
+        ORDER BY year DESC
+        ''')
+        return [int(row[0]) for row in cursor.fetchall()]
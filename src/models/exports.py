@@ -0,0 +1,176 @@
+"""
+Streaming CSV and XLSX exports of invoices, expenses and incomes.
+
+Rows are read with fetchmany() in batches and serialized as they arrive, so
+an export of any size uses constant memory. CSV output is produced batch by
+batch and starts downloading immediately; XLSX output is written with
+openpyxl's write-only mode to a temporary file (a workbook is a zip file
+that can only be finished once every row is known) and then streamed.
+"""
+import csv
+import io
+import tempfile
+from collections import namedtuple
+from datetime import date
+from src.models.db import get_db_connection, get_year_date_range
+from src.models.invoices import INVOICE_LIST_COLUMNS
+from src.models.queries import INVOICE_LISTING
+
+# Rows fetched from SQLite per batch
+EXPORT_BATCH_SIZE = 500
+
+# Bytes per chunk when streaming a finished XLSX file
+XLSX_CHUNK_SIZE = 64 * 1024
+
+EXPORT_FORMATS = ('csv', 'xlsx')
+
+# Leading characters that make spreadsheet programs read a text cell as a formula
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+# sql: SELECT without WHERE; where: builds (WHERE clause, params) from the filters
+# (e.g. request.args); date_columns: positions of ISO dates, written as dates to XLSX
+ExportSpec = namedtuple('ExportSpec', ['columns', 'sql', 'where', 'order_by', 'date_columns'])
+
+def _year_where(column):
+    def where(filters):
+        year = (filters or {}).get('year')
+        if not year or year == 'all':
+            return '', []
+        try:
+            return f'WHERE {column} >= ? AND {column} < ?', list(get_year_date_range(year))
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid value for filter 'year': {year}")
+    return where
+
+EXPORTS = {
+    # Same columns as get_invoices_by_year, and the same filters as the invoice listing
+    'invoices': ExportSpec(
+        columns=INVOICE_LIST_COLUMNS,
+        sql=f'SELECT {INVOICE_LISTING.select_sql} {INVOICE_LISTING.from_sql}',
+        where=INVOICE_LISTING.where,
+        order_by='i.date, i.id',
+        date_columns=(2,)
+    ),
+    'expenses': ExportSpec(
+        columns=('id', 'date', 'description', 'category', 'amount', 'payment_method', 'tax_deductible', 'notes'),
+        sql='''SELECT e.id, e.date, e.description, c.name, e.amount, e.payment_method, e.tax_deductible, e.notes
+        FROM expenses e
+        LEFT JOIN expense_categories c ON e.category_id = c.id''',
+        where=_year_where('e.date'),
+        order_by='e.date, e.id',
+        date_columns=(1,)
+    ),
+    'incomes': ExportSpec(
+        columns=('id', 'date', 'description', 'source', 'amount', 'notes'),
+        sql='''SELECT i.id, i.date, i.description, s.name, i.amount, i.notes
+        FROM incomes i
+        LEFT JOIN income_sources s ON i.source_id = s.id''',
+        where=_year_where('i.date'),
+        order_by='i.date, i.id',
+        date_columns=(1,)
+    ),
+}
+
+def get_export_spec(kind):
+    """
+    Get the definition of an export.
+
+    Raises:
+        ValueError: If the export kind is unknown
+    """
+    if kind not in EXPORTS:
+        raise ValueError(f"Unknown export: {kind}")
+    return EXPORTS[kind]
+
+def iter_export_rows(kind, filters=None, batch_size=EXPORT_BATCH_SIZE):
+    """
+    Iterate the rows of an export, fetching them in batches.
+
+    The filters are validated before the first row is produced, so an
+    invalid filter raises ValueError when this function is called rather
+    than in the middle of a download.
+
+    Returns:
+        generator: Row tuples in date order
+    """
+    spec = get_export_spec(kind)
+    where_clause, params = spec.where(filters)
+    sql = f'{spec.sql} {where_clause} ORDER BY {spec.order_by}'
+
+    def rows():
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(sql, params)
+            while True:
+                batch = cursor.fetchmany(batch_size)
+                if not batch:
+                    break
+                yield from batch
+
+    return rows()
+
+def _escape_formulas(row):
+    """Quote text cells that would be run as formulas, e.g. bank concepts controlled by third parties"""
+    return [f"'{value}" if isinstance(value, str) and value.startswith(FORMULA_PREFIXES) else value
+            for value in row]
+
+def iter_csv(kind, filters=None, batch_size=EXPORT_BATCH_SIZE):
+    """
+    Stream an export as CSV text, one chunk per batch of rows.
+
+    The first chunk carries a UTF-8 byte order mark so spreadsheet programs
+    detect the encoding of accented text.
+    """
+    spec = get_export_spec(kind)
+    rows = iter_export_rows(kind, filters, batch_size)
+
+    def chunks():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        buffer.write('\ufeff')
+        writer.writerow(spec.columns)
+        count = 0
+        for row in rows:
+            writer.writerow(_escape_formulas(row))
+            count += 1
+            if count % batch_size == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+
+    return chunks()
+
+def _to_date(value):
+    try:
+        return date.fromisoformat(value)
+    except (TypeError, ValueError):
+        return value
+
+def iter_xlsx(kind, filters=None, batch_size=EXPORT_BATCH_SIZE):
+    """Stream an export as an XLSX workbook built in openpyxl write-only mode"""
+    from openpyxl import Workbook
+
+    spec = get_export_spec(kind)
+    rows = iter_export_rows(kind, filters, batch_size)
+
+    def chunks():
+        workbook = Workbook(write_only=True)
+        sheet = workbook.create_sheet(kind.capitalize())
+        sheet.append(spec.columns)
+        for row in rows:
+            row = _escape_formulas(row)
+            for position in spec.date_columns:
+                row[position] = _to_date(row[position])
+            sheet.append(row)
+
+        with tempfile.TemporaryFile() as f:
+            workbook.save(f)
+            f.seek(0)
+            while True:
+                chunk = f.read(XLSX_CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+
+    return chunks()
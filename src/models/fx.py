@@ -0,0 +1,224 @@
+"""
+Historical exchange rates for multi-currency revenue reporting.
+
+Rates follow the ECB convention: units of a currency per 1 EUR on a date.
+They are imported from a local CSV file (date,currency,rate) or an ECB
+eurofxref XML file into the fx_rates table and served from an in-memory,
+date-sorted index, so an amount is converted at the latest rate published
+on or before its date.
+
+Usage:
+    python -m src.models.fx eurofxref-hist.xml [--db PATH]
+"""
+import argparse
+import csv
+import sys
+import threading
+import xml.etree.ElementTree as ET
+from bisect import bisect_right
+from src.models import db
+from src.models.db import get_db_connection
+
+BASE_CURRENCY = 'EUR'
+
+# Used when a currency has no imported rates (units per EUR)
+DEFAULT_RATES = {
+    'EUR': 1.0,
+    'USD': 1 / 0.85
+}
+
+class FxRateIndex:
+    """Date-sorted exchange rates per currency with as-of-date lookup"""
+
+    def __init__(self, rows=()):
+        """Build the index from (date, currency, rate) rows"""
+        by_currency = {}
+        for rate_date, currency, rate in sorted(rows):
+            dates, rates = by_currency.setdefault(currency, ([], []))
+            dates.append(rate_date)
+            rates.append(rate)
+        self._rates = by_currency
+        self._warned = set()
+
+    def currencies(self):
+        """Get the currencies with imported rates"""
+        return sorted(self._rates)
+
+    def _fallback(self, currency):
+        if currency in DEFAULT_RATES:
+            return DEFAULT_RATES[currency]
+        if currency not in self._warned:
+            self._warned.add(currency)
+            print(f"Warning: no exchange rates for {currency}; amounts are not converted")
+        return None
+
+    def rate_on(self, currency, rate_date):
+        """
+        Get the rate of a currency in force on a date.
+
+        Dates before the first imported rate use the first rate.
+
+        Returns:
+            float: Units of the currency per EUR, or None if unknown
+        """
+        if currency == BASE_CURRENCY:
+            return 1.0
+        if currency not in self._rates:
+            return self._fallback(currency)
+
+        dates, rates = self._rates[currency]
+        position = bisect_right(dates, rate_date)
+        return rates[max(position - 1, 0)]
+
+    def rates_on(self, currency, sorted_dates):
+        """
+        Get the rates of a currency for many dates in one merge pass.
+
+        Args:
+            currency (str): Currency code
+            sorted_dates (list): ISO dates in ascending order
+
+        Returns:
+            list: One rate (or None if unknown) per date
+        """
+        if currency == BASE_CURRENCY or currency not in self._rates:
+            return [self.rate_on(currency, None)] * len(sorted_dates) if sorted_dates else []
+
+        dates, rates = self._rates[currency]
+        result = []
+        position = 0
+        for rate_date in sorted_dates:
+            while position < len(dates) and dates[position] <= rate_date:
+                position += 1
+            result.append(rates[max(position - 1, 0)])
+        return result
+
+    def convert(self, amount, currency, rate_date, target=BASE_CURRENCY):
+        """Convert a single amount at the rates in force on a date"""
+        return self.convert_many([(rate_date, currency, amount)], target)[0]
+
+    def convert_many(self, rows, target=BASE_CURRENCY):
+        """
+        Convert many amounts at the rates in force on their dates.
+
+        Rows are grouped by currency and each group is matched against the
+        rate history in a single pass over its sorted dates.
+
+        Args:
+            rows (list): (date, currency, amount) tuples
+            target (str): Currency to convert to
+
+        Returns:
+            list: Converted amounts, in input order
+        """
+        converted = [None] * len(rows)
+        groups = {}
+        for position, (rate_date, currency, amount) in enumerate(rows):
+            groups.setdefault(currency, []).append((rate_date, position, amount))
+
+        # Target rates are needed for every date that is converted
+        all_dates = sorted({rate_date for rate_date, _, _ in rows})
+        target_rates = dict(zip(all_dates, self.rates_on(target, all_dates)))
+
+        for currency, entries in groups.items():
+            entries.sort()
+            source_rates = self.rates_on(currency, [rate_date for rate_date, _, _ in entries])
+            for (rate_date, position, amount), source_rate in zip(entries, source_rates):
+                target_rate = target_rates[rate_date]
+                if currency == target or source_rate is None or target_rate is None:
+                    converted[position] = amount
+                else:
+                    converted[position] = amount / source_rate * target_rate
+        return converted
+
+
+_index_lock = threading.Lock()
+_index_cache = {}  # db_path -> (rates version, FxRateIndex)
+
+def get_rates_version(conn):
+    """Get the version of the exchange rates, bumped by triggers on every change"""
+    return conn.execute('SELECT version FROM fx_rates_version').fetchone()[0]
+
+def get_rate_index(db_path=None):
+    """Get the rate index for a database, reloading it when the rates changed"""
+    db_path = db_path or db.DB_FILE
+    with get_db_connection(db_path) as conn:
+        version = get_rates_version(conn)
+
+        with _index_lock:
+            cached = _index_cache.get(db_path)
+        if cached and cached[0] == version:
+            return cached[1]
+
+        cursor = conn.cursor()
+        cursor.execute('SELECT date, currency, rate FROM fx_rates')
+        index = FxRateIndex(cursor.fetchall())
+
+    with _index_lock:
+        _index_cache[db_path] = (version, index)
+    return index
+
+def convert_amounts(rows, target=BASE_CURRENCY):
+    """Convert (date, currency, amount) rows to a target currency; see FxRateIndex.convert_many"""
+    return get_rate_index().convert_many(rows, target)
+
+def save_fx_rates(rows):
+    """
+    Store (date, currency, rate) rows, replacing existing rates for the same day.
+
+    Returns:
+        int: Number of rates stored
+    """
+    rows = [(rate_date, currency.upper(), float(rate)) for rate_date, currency, rate in rows]
+    with get_db_connection() as conn:
+        conn.executemany('INSERT OR REPLACE INTO fx_rates (date, currency, rate) VALUES (?, ?, ?)', rows)
+        conn.commit()
+    return len(rows)
+
+def read_fx_rates_csv(path):
+    """Read (date, currency, rate) rows from a CSV file with a date,currency,rate header"""
+    from src.utils import to_iso_date
+
+    with open(path, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            rate = (row.get('rate') or '').strip()
+            if rate and rate.upper() != 'N/A':
+                yield to_iso_date(row['date'].strip()), row['currency'].strip(), float(rate)
+
+def read_fx_rates_ecb_xml(path):
+    """Read (date, currency, rate) rows from an ECB eurofxref daily or historical XML file"""
+    current_date = None
+    for event, element in ET.iterparse(path, events=('start', 'end')):
+        if not element.tag.endswith('Cube'):
+            continue
+        if event == 'start' and 'time' in element.attrib:
+            current_date = element.attrib['time']
+        elif event == 'end' and 'currency' in element.attrib:
+            yield current_date, element.attrib['currency'], float(element.attrib['rate'])
+            element.clear()
+
+def import_fx_rates(path):
+    """Import exchange rates from a .csv or ECB .xml file; returns the number of rates stored"""
+    if path.lower().endswith('.xml'):
+        rows = read_fx_rates_ecb_xml(path)
+    else:
+        rows = read_fx_rates_csv(path)
+    return save_fx_rates(rows)
+
+def main(argv=None):
+    """Command line entry point to import exchange rates"""
+    parser = argparse.ArgumentParser(description='Import exchange rates (units per EUR) from CSV or ECB XML.')
+    parser.add_argument('rates_file', help='CSV file with date,currency,rate columns or ECB eurofxref XML file')
+    parser.add_argument('--db', help='Database file (defaults to the application database)')
+    args = parser.parse_args(argv)
+
+    if args.db:
+        db.DB_FILE = args.db
+    db.init_db()
+
+    count = import_fx_rates(args.rates_file)
+    print(f"Imported {count} exchange rates")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -6,63 +6,93 @@ Recent updates:
 - Updated get_recent_invoices to return all necessary fields for templates
 - Added proper currency handling and tax calculations
 """
+from collections import namedtuple
 from datetime import datetime
-from src.models.db import get_db_connection
-
-def generate_invoice_number(client_id):
-    """Generate a sequential invoice number based on previous month, client and count"""
-    now = datetime.now()
-    # Calculate previous month (for work done in the previous month)
-    if now.month == 1:  # If January, previous month is December of previous year
+from src.models.db import after_commit, get_db_connection, get_year_date_range
+from src.models.sequences import allocate_document_numbers
+from src.models.queries import INVOICE_LISTING, DEFAULT_PAGE_SIZE, run_listing, summarize_listing
+from src.render_cache import invalidate_invoice
+
+# Field order matches the clients and services tables, so templates can keep
+# indexing them positionally (client[1] is the name, service[2] the unit price)
+ClientRecord = namedtuple('ClientRecord', ['id', 'name', 'tax_id', 'address', 'country', 'email',
+                                           'currency_code', 'currency_symbol'])
+ServiceRecord = namedtuple('ServiceRecord', ['id', 'description', 'unit_price', 'unit_type'])
+InvoiceRecord = namedtuple('InvoiceRecord', ['id', 'client_id', 'service_id', 'quantity', 'date', 'invoice_number',
+                                             'apply_iva', 'apply_irpf', 'subtotal', 'iva_amount', 'irpf_amount',
+                                             'total_amount', 'currency_code', 'currency_symbol', 'client', 'service'])
+
+def get_invoice_period(now=None):
+    """Get the YYMM code of the previous month (invoices bill the work done last month)"""
+    now = now or datetime.now()
+    # If January, previous month is December of previous year
+    if now.month == 1:
         prev_month = 12
         prev_year = now.year - 1
     else:
         prev_month = now.month - 1
         prev_year = now.year
 
-    # Format: YYMM (previous month)
-    date_code = f"{prev_year % 100:02d}{prev_month:02d}"
+    return f"{prev_year % 100:02d}{prev_month:02d}"
 
-    with get_db_connection() as conn:
-        cursor = conn.cursor()
+def get_client_prefix(client_name):
+    """Get the first letter of each word (up to 3) of a client name, uppercased"""
+    words = client_name.split()
+    return ''.join([word[0] for word in words[:3]]).upper()
 
-        # Get client name
-        cursor.execute('SELECT name FROM clients WHERE id = ?', (client_id,))
-        client_name = cursor.fetchone()[0]
+def generate_invoice_number(client_id, client_name=None):
+    """Generate a sequential invoice number based on previous month, client prefix and a counter.
 
-        # Get first letter of each word (up to 3) and convert to uppercase
-        words = client_name.split()
-        prefix = ''.join([word[0] for word in words[:3]]).upper()
+    The counter is incremented inside the current transaction, so within a
+    request the number is only consumed if the invoice is saved too.
+    """
+    # Format: YYMM (previous month)
+    date_code = get_invoice_period()
 
-        # Count invoices from this date for this client
-        cursor.execute(
-            'SELECT COUNT(*) FROM invoices WHERE invoice_number LIKE ? AND client_id = ?',
-            (f'{date_code}-{prefix}-%', client_id)
-        )
-        count = cursor.fetchone()[0]
+    # Get client name unless the caller already has it
+    if client_name is None:
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT name FROM clients WHERE id = ?', (client_id,))
+            client_name = cursor.fetchone()[0]
+
+    # Create invoice number: YYMM-PRE-COUNT (e.g., 2504-AIO-1) by default
+    return allocate_document_numbers('invoice', date_code, prefix=get_client_prefix(client_name))[0]
 
-        # Create invoice number: YYMM-PRE-COUNT (e.g., 2504-AIO-1)
-        return f"{date_code}-{prefix}-{(count + 1):01d}"
+def save_invoice(client_id, service_id, quantity, date, invoice_number, apply_iva=True, apply_irpf=True,
+                 client=None, service=None, totals=None):
+    """Save an invoice to the database with tax application preferences.
 
-def save_invoice(client_id, service_id, quantity, date, invoice_number, apply_iva=True, apply_irpf=True):
-    """Save an invoice to the database with tax application preferences"""
+    Callers that already fetched the client/service rows (a clients table row or
+    ClientRecord) or computed the totals can pass them in to avoid querying and
+    calculating them again.
+    """
     from src import utils
 
+    # Dates are stored as ISO YYYY-MM-DD so they sort and range-filter on the index
+    date = utils.to_iso_date(date)
+
     with get_db_connection() as conn:
         cursor = conn.cursor()
 
-        # Get service price to calculate totals
-        cursor.execute('SELECT unit_price FROM services WHERE id = ?', (service_id,))
-        service_price = cursor.fetchone()[0]
+        if totals is None:
+            # Get service price to calculate totals
+            if service is not None:
+                service_price = service[2]
+            else:
+                cursor.execute('SELECT unit_price FROM services WHERE id = ?', (service_id,))
+                service_price = cursor.fetchone()[0]
 
-        # Get client currency info
-        cursor.execute('SELECT currency_code, currency_symbol FROM clients WHERE id = ?', (client_id,))
-        client_currency = cursor.fetchone()
-        currency_code = client_currency[0] if client_currency and client_currency[0] else 'EUR'
-        currency_symbol = client_currency[1] if client_currency and client_currency[1] else '€'
+            # Calculate totals using the utils function
+            totals = utils.calculate_invoice_totals(service_price, quantity, apply_iva, apply_irpf)
 
-        # Calculate totals using the utils function
-        totals = utils.calculate_invoice_totals(service_price, quantity, apply_iva, apply_irpf)
+        # Get client currency info
+        if client is None:
+            cursor.execute(f"SELECT {', '.join(ClientRecord._fields)} FROM clients WHERE id = ?", (client_id,))
+            client = cursor.fetchone()
+        client = ClientRecord(*client)
+        currency_code = client.currency_code or 'EUR'
+        currency_symbol = client.currency_symbol or '€'
 
         cursor.execute('''
         INSERT INTO invoices (client_id, service_id, quantity, date, invoice_number, apply_iva, apply_irpf,
@@ -97,12 +127,9 @@ def get_recent_invoices(limit=5):
         JOIN services s ON i.service_id = s.id
         '''
 
-        # Common order by clause
+        # Common order by clause (ISO dates sort chronologically)
         order_by = '''
-        ORDER BY
-            substr(i.date, 7, 4) DESC,  -- Year
-            substr(i.date, 4, 2) DESC,  -- Month
-            substr(i.date, 1, 2) DESC   -- Day
+        ORDER BY i.date DESC, i.id DESC
         '''
 
         # First, get invoices from AIO (limited to 2)
@@ -127,54 +154,76 @@ def get_recent_invoices(limit=5):
         # Combine and sort all invoices by date
         all_invoices = aio_invoices + other_invoices
 
-        # Sort by date (DD/MM/YYYY format)
-        all_invoices.sort(key=lambda x: (
-            int(x[2].split('/')[2]),  # Year
-            int(x[2].split('/')[1]),  # Month
-            int(x[2].split('/')[0])   # Day
-        ), reverse=True)
+        # Sort by date, newest first
+        all_invoices.sort(key=lambda x: (x[2], x[0]), reverse=True)
 
         # Limit to the specified number of invoices
         return all_invoices[:limit]
 
+# Invoice, client and service columns of an InvoiceRecord; amounts are the ones
+# stored when the invoice was saved, legacy rows without stored taxes fall back
+# to their subtotal
+_INVOICE_RECORD_SQL = '''
+SELECT i.id, i.client_id, i.service_id, i.quantity, i.date, i.invoice_number,
+       i.apply_iva, i.apply_irpf,
+       COALESCE(i.subtotal, s.unit_price * i.quantity) AS subtotal,
+       COALESCE(i.iva_amount, 0), COALESCE(i.irpf_amount, 0),
+       COALESCE(i.total_amount, i.subtotal, s.unit_price * i.quantity),
+       COALESCE(i.currency_code, c.currency_code),
+       COALESCE(i.currency_symbol, c.currency_symbol),
+       c.id, c.name, c.tax_id, c.address, c.country, c.email, c.currency_code, c.currency_symbol,
+       s.id, s.description, s.unit_price, s.unit_type
+FROM invoices i
+JOIN clients c ON i.client_id = c.id
+JOIN services s ON i.service_id = s.id
+'''
+
+def _to_invoice_record(row):
+    return InvoiceRecord(*row[:14], client=ClientRecord(*row[14:22]), service=ServiceRecord(*row[22:]))
+
 def get_invoice_by_number(invoice_number):
-    """Get a specific invoice by its number"""
+    """
+    Get a specific invoice by its number, with its client and service, in one query.
+
+    Returns:
+        InvoiceRecord: The invoice, with ClientRecord and ServiceRecord fields, or None
+    """
     with get_db_connection() as conn:
         cursor = conn.cursor()
+        cursor.execute(_INVOICE_RECORD_SQL + 'WHERE i.invoice_number = ? LIMIT 1', (invoice_number,))
+        row = cursor.fetchone()
 
-        # First get the invoice data
-        cursor.execute('''
-        SELECT * FROM invoices WHERE invoice_number = ? LIMIT 1
-        ''', (invoice_number,))
-
-        invoice_data = cursor.fetchone()
-
-        if not invoice_data:
-            return None
-
-        # Get client data separately
-        cursor.execute('SELECT * FROM clients WHERE id = ?', (invoice_data[1],))
-        client_data = cursor.fetchone()
-
-        # Get service data separately
-        cursor.execute('SELECT * FROM services WHERE id = ?', (invoice_data[2],))
-        service_data = cursor.fetchone()
-
-        # Format the data into a structured dictionary
-        invoice = {
-            'id': invoice_data[0],
-            'client_id': invoice_data[1],
-            'service_id': invoice_data[2],
-            'quantity': invoice_data[3],
-            'date': invoice_data[4],
-            'invoice_number': invoice_data[5],
-            'apply_iva': invoice_data[6],
-            'apply_irpf': invoice_data[7],
-            'client': client_data,  # Complete client data
-            'service': service_data  # Complete service data
-        }
-
-        return invoice
+    return _to_invoice_record(row) if row else None
+
+def get_invoice_currency(invoice):
+    """
+    Get the (code, symbol) an InvoiceRecord is billed in.
+
+    The currency is stored with the invoice; only legacy rows without one
+    fall back to the configured default.
+    """
+    from src import utils
+
+    if invoice.currency_code:
+        return invoice.currency_code, invoice.currency_symbol or ('$' if invoice.currency_code == 'USD' else '€')
+    return tuple(utils.get_default_currency())
+
+def get_invoice_records(date_from, date_to):
+    """
+    Get the invoices dated in [date_from, date_to) as InvoiceRecords, in one query.
+
+    Args:
+        date_from (str): First ISO date included
+        date_to (str): First ISO date excluded
+
+    Returns:
+        list: InvoiceRecords ordered by date and number
+    """
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(_INVOICE_RECORD_SQL + 'WHERE i.date >= ? AND i.date < ? ORDER BY i.date, i.invoice_number',
+                       (date_from, date_to))
+        return [_to_invoice_record(row) for row in cursor.fetchall()]
 
 def delete_invoice(invoice_number):
     """Delete an invoice from the database by its number"""
@@ -192,6 +241,7 @@ def delete_invoice(invoice_number):
             # Delete the invoice
             cursor.execute('DELETE FROM invoices WHERE invoice_number = ?', (invoice_number,))
             conn.commit()
+            after_commit(lambda: invalidate_invoice(invoice_number))
             return True
     except Exception as e:
         print(f"Error deleting invoice: {e}")
@@ -202,7 +252,7 @@ def get_invoices_by_year(year):
     with get_db_connection() as conn:
         cursor = conn.cursor()
 
-        # Extract year from date field (format: DD/MM/YYYY)
+        # Range predicate on the ISO date so the date index is used
         cursor.execute('''
         SELECT i.id, i.invoice_number, i.date, c.name, s.description, i.quantity,
                COALESCE(i.subtotal, s.unit_price * i.quantity) AS subtotal,
@@ -215,13 +265,86 @@ def get_invoices_by_year(year):
         FROM invoices i
         JOIN clients c ON i.client_id = c.id
         JOIN services s ON i.service_id = s.id
-        WHERE substr(i.date, 7, 4) = ?
+        WHERE i.date >= ? AND i.date < ?
         ORDER BY i.date DESC
-        ''', (str(year),))
+        ''', get_year_date_range(year))
 
         invoices = cursor.fetchall()
         return invoices
 
+# Columns of an invoice listing row, shared by the yearly list and the paged list
+INVOICE_LIST_COLUMNS = (
+    'id', 'invoice_number', 'date', 'client_name', 'service', 'quantity', 'subtotal',
+    'apply_iva', 'apply_irpf', 'client_id', 'currency_symbol', 'iva_amount',
+    'irpf_amount', 'total_amount', 'currency_code'
+)
+
+def list_invoices(filters=None, sort=None, direction=None, limit=DEFAULT_PAGE_SIZE, after=None):
+    """
+    Get one page of invoices matching the given filters.
+
+    Args:
+        filters (dict): Filter values, see INVOICE_LISTING in src/models/queries.py
+                        (year, month, date_from, date_to, client_id, client, currency,
+                        min_amount, max_amount, apply_iva, apply_irpf, search)
+        sort (str): 'date', 'number', 'client' or 'amount'
+        direction (str): 'asc' or 'desc'
+        limit (int): Page size
+        after (str): Cursor of the last row of the previous page
+
+    Returns:
+        tuple: (rows in the get_invoices_by_year format, cursor of the next page or None)
+
+    Raises:
+        ValueError: If a filter value is invalid
+    """
+    rows, _, next_cursor = run_listing(INVOICE_LISTING, filters, sort, direction, limit, after)
+    return rows, next_cursor
+
+def get_invoices_page(year, limit=DEFAULT_PAGE_SIZE, after=None):
+    """
+    Get one page of a year's invoices, newest first.
+
+    Pages are keyset-paginated on (date, id), so fetching a page seeks the date
+    index instead of skipping over all the previous rows.
+    """
+    return list_invoices({'year': year}, limit=limit, after=after)
+
+def summarize_invoices(filters=None):
+    """
+    Get the totals of all invoices matching the filters, computed in SQL.
+
+    Returns:
+        dict: 'count', 'total_amount' (sum of the subtotals the listing shows) and 'unique_clients'
+    """
+    count, total_amount, unique_clients = summarize_listing(INVOICE_LISTING, filters)
+    return {'count': count, 'total_amount': total_amount, 'unique_clients': unique_clients}
+
+def get_invoice_summary_by_year(year):
+    """
+    Get the totals of a year's invoices computed in SQL.
+
+    Returns:
+        dict: 'count', 'total_amount' (sum of the subtotals the listing shows), 'unique_clients'
+              and the sorted 'client_names'
+    """
+    summary = summarize_invoices({'year': year})
+    summary['client_names'] = get_invoice_client_names(year)
+    return summary
+
+def get_invoice_client_names(year):
+    """Get the sorted names of clients invoiced in a year"""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+        SELECT DISTINCT c.name
+        FROM invoices i
+        JOIN clients c ON i.client_id = c.id
+        WHERE i.date >= ? AND i.date < ?
+        ORDER BY c.name
+        ''', get_year_date_range(year))
+        return [row[0] for row in cursor.fetchall()]
+
 def get_available_invoice_years():
     """Get list of years for which invoices exist"""
     with get_db_connection() as conn:
@@ -229,7 +352,7 @@ def get_available_invoice_years():
 
         # Extract unique years from date field
         cursor.execute('''
-        SELECT DISTINCT substr(date, 7, 4) as year
+        SELECT DISTINCT substr(date, 1, 4) as year
         FROM invoices
         WHERE date IS NOT NULL AND length(date) >= 10
         ORDER BY year DESC
@@ -0,0 +1,565 @@
+"""
+Versioned schema migrations for the Invoice Generator database.
+
+Each migration runs once, in order, and is recorded in the schema_version
+table. When the database is already current, migrate() costs a single query.
+"""
+import json
+import re
+import sqlite3
+from datetime import datetime
+
+# Ordered list of (version, description, function)
+MIGRATIONS = []
+
+def migration(version, description):
+    """Register a migration function under a schema version"""
+    def decorator(func):
+        MIGRATIONS.append((version, description, func))
+        MIGRATIONS.sort(key=lambda item: item[0])
+        return func
+    return decorator
+
+def get_latest_version():
+    """Get the schema version the code expects"""
+    return MIGRATIONS[-1][0] if MIGRATIONS else 0
+
+def get_schema_version(conn):
+    """Get the schema version recorded in the database (0 if never migrated)"""
+    try:
+        row = conn.execute('SELECT MAX(version) FROM schema_version').fetchone()
+    except sqlite3.OperationalError:
+        return 0
+    return row[0] or 0
+
+def migrate(conn):
+    """Apply all pending migrations and return the list of applied versions"""
+    current_version = get_schema_version(conn)
+    if current_version >= get_latest_version():
+        return []
+
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS schema_version (
+        version INTEGER PRIMARY KEY,
+        description TEXT NOT NULL,
+        applied_at TEXT NOT NULL
+    )
+    ''')
+
+    applied = []
+    for version, description, func in MIGRATIONS:
+        if version <= current_version:
+            continue
+
+        print(f"Applying migration {version}: {description}")
+        func(conn)
+        conn.execute(
+            'INSERT INTO schema_version (version, description, applied_at) VALUES (?, ?, ?)',
+            (version, description, datetime.now().isoformat(timespec='seconds'))
+        )
+        conn.commit()
+        applied.append(version)
+
+    return applied
+
+def _table_exists(cursor, table):
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,))
+    return cursor.fetchone() is not None
+
+def _get_columns(cursor, table):
+    cursor.execute(f'PRAGMA table_info({table})')
+    return [column[1] for column in cursor.fetchall()]
+
+
+@migration(1, 'Create core tables')
+def _create_core_tables(conn):
+    cursor = conn.cursor()
+
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS clients (
+        id INTEGER PRIMARY KEY,
+        name TEXT NOT NULL,
+        tax_id TEXT NOT NULL,
+        address TEXT NOT NULL,
+        country TEXT NOT NULL,
+        email TEXT,
+        currency_code TEXT,
+        currency_symbol TEXT
+    )
+    ''')
+
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS services (
+        id INTEGER PRIMARY KEY,
+        description TEXT NOT NULL,
+        unit_price REAL NOT NULL,
+        unit_type TEXT NOT NULL
+    )
+    ''')
+
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS invoices (
+        id INTEGER PRIMARY KEY,
+        client_id INTEGER NOT NULL,
+        service_id INTEGER NOT NULL,
+        quantity INTEGER NOT NULL,
+        date TEXT NOT NULL,
+        invoice_number TEXT NOT NULL,
+        apply_iva BOOLEAN DEFAULT 1,
+        apply_irpf BOOLEAN DEFAULT 1,
+        subtotal REAL,
+        iva_amount REAL,
+        irpf_amount REAL,
+        total_amount REAL,
+        currency_code TEXT,
+        currency_symbol TEXT,
+        FOREIGN KEY (client_id) REFERENCES clients (id),
+        FOREIGN KEY (service_id) REFERENCES services (id)
+    )
+    ''')
+
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS estimates (
+        id INTEGER PRIMARY KEY,
+        estimate_number TEXT NOT NULL,
+        client_id INTEGER NOT NULL,
+        service_id INTEGER NOT NULL,
+        quantity REAL NOT NULL,
+        issue_date TEXT NOT NULL,
+        valid_until_date TEXT NOT NULL,
+        subtotal REAL NOT NULL,
+        iva_amount REAL NOT NULL,
+        irpf_rate REAL NOT NULL,
+        irpf_amount REAL NOT NULL,
+        total REAL NOT NULL,
+        currency TEXT NOT NULL,
+        status TEXT NOT NULL,
+        notes TEXT,
+        terms TEXT,
+        FOREIGN KEY (client_id) REFERENCES clients (id),
+        FOREIGN KEY (service_id) REFERENCES services (id)
+    )
+    ''')
+
+
+@migration(2, 'Add columns missing from legacy clients and invoices tables')
+def _add_legacy_columns(conn):
+    # Databases created before these columns existed; introspection only runs once
+    cursor = conn.cursor()
+    required_columns = {
+        'clients': [('currency_code', 'TEXT'), ('currency_symbol', 'TEXT')],
+        'invoices': [
+            ('subtotal', 'REAL'),
+            ('iva_amount', 'REAL'),
+            ('irpf_amount', 'REAL'),
+            ('total_amount', 'REAL'),
+            ('currency_code', 'TEXT'),
+            ('currency_symbol', 'TEXT')
+        ]
+    }
+
+    for table, columns in required_columns.items():
+        existing_columns = _get_columns(cursor, table)
+        for col_name, col_type in columns:
+            if col_name not in existing_columns:
+                cursor.execute(f'ALTER TABLE {table} ADD COLUMN {col_name} {col_type}')
+
+
+@migration(3, 'Backfill client currencies from country')
+def _backfill_client_currencies(conn):
+    conn.execute('''
+    UPDATE clients
+    SET currency_code = CASE WHEN UPPER(country) IN ('USA', 'EEUU', 'UNITED STATES', 'ESTADOS UNIDOS')
+                             THEN 'USD' ELSE 'EUR' END,
+        currency_symbol = CASE WHEN UPPER(country) IN ('USA', 'EEUU', 'UNITED STATES', 'ESTADOS UNIDOS')
+                               THEN '$' ELSE '€' END
+    WHERE currency_code IS NULL OR currency_symbol IS NULL
+    ''')
+
+
+@migration(4, 'Create expense and income tables')
+def _create_finance_tables(conn):
+    cursor = conn.cursor()
+
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS expense_categories (
+        id INTEGER PRIMARY KEY,
+        name TEXT NOT NULL,
+        description TEXT
+    )
+    ''')
+
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS income_sources (
+        id INTEGER PRIMARY KEY,
+        name TEXT NOT NULL,
+        description TEXT
+    )
+    ''')
+
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS expenses (
+        id INTEGER PRIMARY KEY,
+        category_id INTEGER NOT NULL,
+        description TEXT NOT NULL,
+        date TEXT NOT NULL,
+        amount REAL NOT NULL,
+        payment_method TEXT,
+        receipt_image TEXT,
+        notes TEXT,
+        tax_deductible BOOLEAN DEFAULT 1,
+        created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (category_id) REFERENCES expense_categories (id)
+    )
+    ''')
+
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS incomes (
+        id INTEGER PRIMARY KEY,
+        source_id INTEGER NOT NULL,
+        description TEXT NOT NULL,
+        date TEXT NOT NULL,
+        amount REAL NOT NULL,
+        notes TEXT,
+        created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (source_id) REFERENCES income_sources (id)
+    )
+    ''')
+
+    # Category and source ids match the keyword maps in src/finance/category_matcher.py,
+    # which seed the categorization rules
+    cursor.executemany('INSERT OR IGNORE INTO expense_categories (id, name) VALUES (?, ?)', [
+        (1, 'Material de oficina'),
+        (2, 'Transporte'),
+        (3, 'Comidas'),
+        (4, 'Servicios profesionales'),
+        (5, 'Seguridad Social'),
+        (6, 'Seguro médico'),
+        (7, 'Suministros'),
+        (8, 'Equipamiento'),
+        (9, 'Formación'),
+        (10, 'Otros')
+    ])
+    cursor.executemany('INSERT OR IGNORE INTO income_sources (id, name) VALUES (?, ?)', [
+        (1, 'Facturas'),
+        (2, 'Devoluciones de impuestos'),
+        (3, 'Subvenciones'),
+        (4, 'Otros')
+    ])
+
+
+# Date columns stored as ISO YYYY-MM-DD text, with the index that covers each one
+DATE_COLUMNS = (
+    ('invoices', 'date', 'idx_invoices_date'),
+    ('estimates', 'issue_date', 'idx_estimates_issue_date'),
+    ('estimates', 'valid_until_date', None),
+    ('expenses', 'date', 'idx_expenses_date'),
+    ('incomes', 'date', 'idx_incomes_date'),
+)
+
+def migrate_dates_to_iso(conn, batch_size=500):
+    """Rewrite DD/MM/YYYY dates as ISO YYYY-MM-DD in committed batches.
+
+    Only rows still in the legacy format are selected, so an interrupted run
+    simply resumes where it stopped the next time it is called.
+    """
+    from src.utils import to_iso_date
+
+    cursor = conn.cursor()
+    converted = 0
+    for table, column, _ in DATE_COLUMNS:
+        if not _table_exists(cursor, table):
+            continue
+
+        last_rowid = 0
+        while True:
+            cursor.execute(f'''
+            SELECT rowid, {column} FROM {table}
+            WHERE rowid > ? AND {column} LIKE '%/%/%'
+            ORDER BY rowid
+            LIMIT ?
+            ''', (last_rowid, batch_size))
+            rows = cursor.fetchall()
+            if not rows:
+                break
+
+            last_rowid = rows[-1][0]
+            updates = [(to_iso_date(value), rowid) for rowid, value in rows]
+            cursor.executemany(f'UPDATE {table} SET {column} = ? WHERE rowid = ?', updates)
+            conn.commit()
+            converted += len(updates)
+
+    if converted:
+        print(f"Converted {converted} dates to ISO format")
+    return converted
+
+def create_date_indexes(conn):
+    """Create B-tree indexes on the date columns used for year/month filtering"""
+    cursor = conn.cursor()
+    for table, column, index_name in DATE_COLUMNS:
+        if index_name and _table_exists(cursor, table):
+            cursor.execute(f'CREATE INDEX IF NOT EXISTS {index_name} ON {table} ({column})')
+
+
+@migration(5, 'Convert dates to ISO format and index date columns')
+def _iso_dates(conn):
+    migrate_dates_to_iso(conn)
+    create_date_indexes(conn)
+
+
+@migration(6, 'Create document number sequences and unique number indexes')
+def _create_number_sequences(conn):
+    cursor = conn.cursor()
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS number_sequences (
+        series TEXT NOT NULL,
+        period TEXT NOT NULL,
+        last_value INTEGER NOT NULL,
+        PRIMARY KEY (series, period)
+    )
+    ''')
+
+    # Seed the counters from numbers issued with the default templates. Client
+    # prefixes may hold any character (ÑT, A&B), so the counter follows the last dash
+    counters = {}
+    patterns = (
+        ('invoices', 'invoice_number', re.compile(r'^(\d{4})-(.+)-(\d+)$'), lambda m: (f'invoice:{m[2]}', m[1], m[3])),
+        ('estimates', 'estimate_number', re.compile(r'^(\d{4}-\d{2})-P(\d+)$'), lambda m: ('estimate', m[1], m[2])),
+    )
+    for table, column, pattern, key in patterns:
+        cursor.execute(f'SELECT {column} FROM {table}')
+        for (number,) in cursor.fetchall():
+            match = pattern.match(number or '')
+            if match:
+                series, period, value = key(match)
+                counters[(series, period)] = max(counters.get((series, period), 0), int(value))
+
+    cursor.executemany('''
+    INSERT INTO number_sequences (series, period, last_value) VALUES (?, ?, ?)
+    ON CONFLICT (series, period) DO UPDATE SET last_value = MAX(last_value, excluded.last_value)
+    ''', [(series, period, value) for (series, period), value in counters.items()])
+
+    for table, column, index_name in (('invoices', 'invoice_number', 'idx_invoices_number'),
+                                      ('estimates', 'estimate_number', 'idx_estimates_number')):
+        try:
+            cursor.execute(f'CREATE UNIQUE INDEX IF NOT EXISTS {index_name} ON {table} ({column})')
+        except sqlite3.IntegrityError:
+            # Older numbering could mint duplicates; keep them searchable and report them
+            print(f"Warning: duplicate values in {table}.{column}; created a non-unique index instead")
+            cursor.execute(f'CREATE INDEX IF NOT EXISTS {index_name} ON {table} ({column})')
+
+
+@migration(7, 'Move user preferences from config.json to the database')
+def _create_user_preferences(conn):
+    from src.utils import load_config
+
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS user_preferences (
+        key TEXT PRIMARY KEY,
+        value TEXT NOT NULL,
+        updated_at TEXT NOT NULL
+    )
+    ''')
+
+    # One-time seed: carry over the selections older versions saved in config.json,
+    # which no longer holds preferences
+    preferences = load_config().get('preferences', {})
+    now = datetime.now().isoformat(timespec='seconds')
+    conn.executemany(
+        'INSERT OR IGNORE INTO user_preferences (key, value, updated_at) VALUES (?, ?, ?)',
+        [(key, json.dumps(value), now) for key, value in preferences.items() if value is not None]
+    )
+
+
+@migration(8, 'Create monthly invoice rollup maintained by triggers')
+def _create_invoice_rollup(conn):
+    from src.models.rollup import create_rollup_triggers, rebuild_invoice_rollup
+
+    # Legacy invoices may lack stored amounts; fill them from the client and
+    # service so the rollup and the invoice rows agree
+    conn.execute('''
+    UPDATE invoices SET
+        currency_code = COALESCE(currency_code, (SELECT currency_code FROM clients WHERE clients.id = invoices.client_id), 'EUR'),
+        currency_symbol = COALESCE(currency_symbol, (SELECT currency_symbol FROM clients WHERE clients.id = invoices.client_id), '€'),
+        subtotal = COALESCE(subtotal, quantity * (SELECT unit_price FROM services WHERE services.id = invoices.service_id))
+    WHERE currency_code IS NULL OR currency_symbol IS NULL OR subtotal IS NULL
+    ''')
+
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS invoice_monthly_rollup (
+        year INTEGER NOT NULL,
+        month INTEGER NOT NULL,
+        client_id INTEGER NOT NULL,
+        currency_code TEXT NOT NULL,
+        invoice_count INTEGER NOT NULL,
+        subtotal REAL NOT NULL,
+        total_amount REAL NOT NULL,
+        PRIMARY KEY (year, month, client_id, currency_code)
+    )
+    ''')
+    create_rollup_triggers(conn)
+    rebuild_invoice_rollup(conn)
+
+
+@migration(9, 'Create historical exchange rate table')
+def _create_fx_rates(conn):
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS fx_rates (
+        date TEXT NOT NULL,
+        currency TEXT NOT NULL,
+        rate REAL NOT NULL,
+        PRIMARY KEY (currency, date)
+    )
+    ''')
+
+
+@migration(10, 'Create user-editable categorization rules')
+def _create_categorization_rules(conn):
+    from src.finance.category_matcher import (
+        EXPENSE_KEYWORDS, INCOME_KEYWORDS, NON_DEDUCTIBLE_CATEGORIES, NON_DEDUCTIBLE_KEYWORDS
+    )
+
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS categorization_rules (
+        id INTEGER PRIMARY KEY,
+        pattern TEXT NOT NULL,
+        match_type TEXT NOT NULL DEFAULT 'contains',
+        kind TEXT NOT NULL,
+        target_id INTEGER,
+        priority INTEGER NOT NULL DEFAULT 100,
+        tax_deductible INTEGER,
+        updated_at TEXT NOT NULL
+    )
+    ''')
+
+    # Bumped by the triggers below so the compiled rules in memory know when to reload
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS categorization_rules_version (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        version INTEGER NOT NULL
+    )
+    ''')
+    conn.execute('INSERT OR IGNORE INTO categorization_rules_version (id, version) VALUES (1, 0)')
+    for event in ('INSERT', 'UPDATE', 'DELETE'):
+        conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS categorization_rules_{event.lower()}
+        AFTER {event} ON categorization_rules
+        BEGIN
+            UPDATE categorization_rules_version SET version = version + 1;
+        END
+        ''')
+
+    cursor = conn.cursor()
+    if 'tax_deductible' not in _get_columns(cursor, 'expense_categories'):
+        cursor.execute('ALTER TABLE expense_categories ADD COLUMN tax_deductible INTEGER NOT NULL DEFAULT 1')
+    cursor.executemany('UPDATE expense_categories SET tax_deductible = 0 WHERE id = ?',
+                       [(category_id,) for category_id in NON_DEDUCTIBLE_CATEGORIES])
+    conn.execute('''
+    CREATE TRIGGER IF NOT EXISTS expense_categories_deductible_update
+    AFTER UPDATE OF tax_deductible ON expense_categories
+    BEGIN
+        UPDATE categorization_rules_version SET version = version + 1;
+    END
+    ''')
+
+    # Seed with the built-in keyword maps, keeping their priority order
+    now = datetime.now().isoformat(timespec='seconds')
+    rules = [(keyword, 'contains', 'expense', None, 0, 0, now) for keyword in NON_DEDUCTIBLE_KEYWORDS]
+    for kind, keywords_by_target in (('expense', EXPENSE_KEYWORDS), ('income', INCOME_KEYWORDS)):
+        for position, (target_id, keywords) in enumerate(keywords_by_target.items(), start=1):
+            rules.extend((keyword, 'contains', kind, target_id, position * 10, None, now) for keyword in keywords)
+    cursor.executemany('''
+    INSERT INTO categorization_rules (pattern, match_type, kind, target_id, priority, tax_deductible, updated_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', rules)
+
+
+@migration(11, 'Create merchant category cache learned from past transactions')
+def _create_merchant_categories(conn):
+    from src.finance.merchant_cache import normalize_merchant
+
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS merchant_categories (
+        kind TEXT NOT NULL,
+        merchant TEXT NOT NULL,
+        target_id INTEGER NOT NULL,
+        tax_deductible INTEGER,
+        source TEXT NOT NULL,
+        rules_version INTEGER,
+        updated_at TEXT NOT NULL,
+        PRIMARY KEY (kind, merchant)
+    )
+    ''')
+
+    # Learn the categories of transactions entered by hand; the latest one of a merchant wins
+    now = datetime.now().isoformat(timespec='seconds')
+    learned = {}
+    cursor = conn.cursor()
+    cursor.execute('''
+    SELECT description, category_id, tax_deductible FROM expenses
+    WHERE notes IS NULL OR notes != 'Imported from BBVA statement' ORDER BY id
+    ''')
+    for description, category_id, tax_deductible in cursor.fetchall():
+        learned[('expense', normalize_merchant(description))] = (category_id, tax_deductible)
+    cursor.execute('''
+    SELECT description, source_id FROM incomes
+    WHERE notes IS NULL OR notes != 'Imported from BBVA statement' ORDER BY id
+    ''')
+    for description, source_id in cursor.fetchall():
+        learned[('income', normalize_merchant(description))] = (source_id, None)
+
+    conn.executemany('''
+    INSERT OR REPLACE INTO merchant_categories (kind, merchant, target_id, tax_deductible, source, rules_version, updated_at)
+    VALUES (?, ?, ?, ?, 'manual', NULL, ?)
+    ''', [(kind, merchant, target_id, tax_deductible, now)
+          for (kind, merchant), (target_id, tax_deductible) in learned.items() if merchant and target_id is not None])
+
+
+@migration(12, 'Create bank statement import job table')
+def _create_import_jobs(conn):
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS import_jobs (
+        id TEXT PRIMARY KEY,
+        filename TEXT NOT NULL,
+        status TEXT NOT NULL,
+        rows_read INTEGER NOT NULL DEFAULT 0,
+        expenses_imported INTEGER NOT NULL DEFAULT 0,
+        incomes_imported INTEGER NOT NULL DEFAULT 0,
+        duplicates INTEGER NOT NULL DEFAULT 0,
+        errors TEXT,
+        message TEXT,
+        created_at TEXT NOT NULL,
+        finished_at TEXT
+    )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_import_jobs_created_at ON import_jobs (created_at)')
+
+
+@migration(13, 'Keep the uploaded file and options of import jobs so failed imports can be resumed')
+def _add_import_job_resume_columns(conn):
+    cursor = conn.cursor()
+    columns = _get_columns(cursor, 'import_jobs')
+    for name, column_type in (('path', 'TEXT'), ('statement_format', 'TEXT'),
+                              ('default_expense_category', 'INTEGER'), ('default_income_source', 'INTEGER')):
+        if name not in columns:
+            cursor.execute(f'ALTER TABLE import_jobs ADD COLUMN {name} {column_type}')
+
+
+@migration(14, 'Version exchange rates so in-place corrections reload the in-memory rate index')
+def _create_fx_rates_version(conn):
+    # Bumped by the triggers below; rate corrections change neither the row count nor MAX(rowid)
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS fx_rates_version (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        version INTEGER NOT NULL
+    )
+    ''')
+    conn.execute('INSERT OR IGNORE INTO fx_rates_version (id, version) VALUES (1, 0)')
+    for event in ('INSERT', 'UPDATE', 'DELETE'):
+        conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS fx_rates_{event.lower()}
+        AFTER {event} ON fx_rates
+        BEGIN
+            UPDATE fx_rates_version SET version = version + 1;
+        END
+        ''')
@@ -0,0 +1,122 @@
+"""
+User preference storage for the Invoice Generator application.
+
+Preferences such as the last selected client and service live in the
+user_preferences table instead of config.json. Writes are buffered in memory
+and coalesced into one background flush per FLUSH_DELAY seconds, so saving a
+preference never adds a database or file write to the request that changed it.
+"""
+import atexit
+import json
+import sqlite3
+import threading
+from datetime import datetime
+from src.models import db
+from src.models.db import get_db_connection
+
+# Seconds to wait for further changes before writing buffered preferences
+FLUSH_DELAY = 2.0
+
+# Failed flushes of a database retried (waiting twice as long each time) before its values are dropped
+MAX_FLUSH_RETRIES = 5
+
+_lock = threading.Lock()
+_pending = {}  # db_path -> {key: value}
+_failures = {}  # db_path -> consecutive failed flushes
+_timer = None
+
+def get_preferences(db_path=None):
+    """
+    Get all stored preferences, including changes not flushed yet.
+
+    Returns:
+        dict: Preference values keyed by name
+    """
+    db_path = db_path or db.DB_FILE
+    with get_db_connection(db_path) as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT key, value FROM user_preferences')
+        preferences = {key: json.loads(value) for key, value in cursor.fetchall()}
+
+    with _lock:
+        preferences.update(_pending.get(db_path, {}))
+    return preferences
+
+def get_preference(key, default=None, db_path=None):
+    """Get a single preference value"""
+    return get_preferences(db_path).get(key, default)
+
+def set_preferences(db_path=None, **values):
+    """
+    Buffer preference changes; they are written by a background flush.
+
+    Args:
+        **values: Preference values keyed by name (must be JSON serializable)
+    """
+    db_path = db_path or db.DB_FILE
+    with _lock:
+        _pending.setdefault(db_path, {}).update(values)
+        _schedule_flush()
+
+def _schedule_flush(delay=None):
+    """Start the background flush if none is pending (call with _lock held)"""
+    global _timer
+    if _timer is None:
+        _timer = threading.Timer(FLUSH_DELAY if delay is None else delay, flush_preferences)
+        _timer.daemon = True
+        _timer.start()
+
+def flush_preferences():
+    """
+    Write all buffered preference changes to the database.
+
+    Called by the background timer and at interpreter exit. It uses its own
+    transaction, so call it outside a request or unit of work. Values that
+    can't be written (e.g. the database is locked) are buffered again and
+    retried by another flush, unless they were changed in the meantime.
+    Retries back off exponentially; after MAX_FLUSH_RETRIES failures in a
+    row the values of that database are dropped and reported.
+
+    Returns:
+        int: Number of preference values written
+    """
+    global _timer
+
+    with _lock:
+        pending = dict(_pending)
+        _pending.clear()
+        if _timer is not None:
+            _timer.cancel()
+            _timer = None
+
+    written = 0
+    now = datetime.now().isoformat(timespec='seconds')
+    for db_path, values in pending.items():
+        try:
+            with get_db_connection(db_path) as conn:
+                conn.executemany('''
+                INSERT INTO user_preferences (key, value, updated_at) VALUES (?, ?, ?)
+                ON CONFLICT (key) DO UPDATE SET value = excluded.value, updated_at = excluded.updated_at
+                ''', [(key, json.dumps(value), now) for key, value in values.items()])
+                conn.commit()
+            written += len(values)
+            with _lock:
+                _failures.pop(db_path, None)
+        except sqlite3.Error as e:
+            print(f"Error saving preferences: {e}")
+            with _lock:
+                failures = _failures.get(db_path, 0) + 1
+                if failures > MAX_FLUSH_RETRIES:
+                    # A database that keeps failing (read-only, missing table) must not retry forever
+                    _failures.pop(db_path, None)
+                    print(f"Dropping preferences not saved after {failures} attempts: {values}")
+                    continue
+                _failures[db_path] = failures
+                # Newer values set while this flush was running take precedence
+                buffered = _pending.setdefault(db_path, {})
+                for key, value in values.items():
+                    buffered.setdefault(key, value)
+                _schedule_flush(FLUSH_DELAY * 2 ** failures)
+    return written
+
+atexit.register(flush_preferences)
@@ -0,0 +1,244 @@
+"""
+Listing query builder for invoices and estimates.
+
+A listing is described once (its SELECT, its whitelisted filters and its sort
+keys); user-supplied filter values are converted and bound as parameters, and
+only whitelisted SQL fragments are ever interpolated. Pages are keyset
+paginated on (sort key, id), so each page is an index seek however deep the
+listing goes.
+"""
+import base64
+import json
+from collections import namedtuple
+from datetime import datetime
+from src.models.db import get_db_connection, get_year_date_range
+from src.utils import to_iso_date
+
+# sql: WHERE fragment with ? placeholders; params: converts the raw value to a tuple of parameters
+Filter = namedtuple('Filter', ['sql', 'params'])
+
+# Default and maximum page sizes for listings
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+def _iso_date(value):
+    iso_value = str(to_iso_date(value))
+    datetime.strptime(iso_value, '%Y-%m-%d')
+    return iso_value
+
+def _flag(value):
+    if str(value).lower() in ('1', 'true', 'yes', 'on'):
+        return 1
+    if str(value).lower() in ('0', 'false', 'no', 'off'):
+        return 0
+    raise ValueError(value)
+
+def _month(value):
+    month = int(value)
+    if not 1 <= month <= 12:
+        raise ValueError(value)
+    return f'{month:02d}'
+
+def _like(value, count):
+    pattern = '%' + str(value).replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+    return (pattern,) * count
+
+class ListingSpec:
+    """The SQL and the whitelisted filters and sort keys of one listing"""
+
+    def __init__(self, select_sql, from_sql, id_column, filters, sorts, default_sort, summary_sql):
+        self.select_sql = select_sql
+        self.from_sql = from_sql
+        self.id_column = id_column
+        self.filters = filters
+        self.sorts = sorts
+        self.default_sort = default_sort
+        self.summary_sql = summary_sql
+
+    def where(self, filters):
+        """
+        Translate filter values into a WHERE clause and its parameters.
+
+        Unknown filter names and empty or 'all' values are ignored.
+
+        Raises:
+            ValueError: If a filter value cannot be converted
+        """
+        clauses = []
+        params = []
+        for name, value in (filters or {}).items():
+            definition = self.filters.get(name)
+            if definition is None or value is None or str(value).strip() in ('', 'all'):
+                continue
+            try:
+                values = definition.params(str(value).strip())
+            except (ValueError, TypeError):
+                raise ValueError(f"Invalid value for filter '{name}': {value}")
+            clauses.append(definition.sql)
+            params.extend(values)
+
+        where_clause = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        return where_clause, params
+
+    def order(self, sort=None, direction=None):
+        """Get the (sort expression, direction) for a whitelisted sort key"""
+        if sort not in self.sorts:
+            sort = self.default_sort[0]
+        if direction not in ('asc', 'desc'):
+            direction = self.default_sort[1] if sort == self.default_sort[0] else 'asc'
+        return self.sorts[sort], direction
+
+def encode_cursor(sort_value, row_id):
+    """Encode the (sort value, id) position of the last row of a page"""
+    return base64.urlsafe_b64encode(json.dumps([sort_value, row_id]).encode()).decode().rstrip('=')
+
+def decode_cursor(cursor_value):
+    """Decode a page cursor into (sort value, id); returns None for a missing or invalid cursor"""
+    if not cursor_value:
+        return None
+    try:
+        padded = cursor_value + '=' * (-len(cursor_value) % 4)
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return sort_value, int(row_id)
+    except (ValueError, TypeError):
+        return None
+
+def run_listing(spec, filters=None, sort=None, direction=None, limit=DEFAULT_PAGE_SIZE, after=None):
+    """
+    Fetch one page of a listing.
+
+    Args:
+        spec (ListingSpec): Listing definition
+        filters (dict): Filter values by name (e.g. request.args)
+        sort (str): Sort key name
+        direction (str): 'asc' or 'desc'
+        limit (int): Page size (capped at MAX_PAGE_SIZE)
+        after (str): Cursor of the last row of the previous page
+
+    Returns:
+        tuple: (rows, column names, cursor of the next page or None)
+
+    Raises:
+        ValueError: If a filter value is invalid
+    """
+    limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+    where_clause, params = spec.where(filters)
+    sort_expression, direction = spec.order(sort, direction)
+
+    position = decode_cursor(after)
+    if position:
+        operator = '<' if direction == 'desc' else '>'
+        keyset = (f'({sort_expression} {operator} ? OR '
+                  f'({sort_expression} = ? AND {spec.id_column} {operator} ?))')
+        where_clause = f'{where_clause} AND {keyset}' if where_clause else f'WHERE {keyset}'
+        params.extend([position[0], position[0], position[1]])
+
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(f'''
+        SELECT {spec.select_sql}, {sort_expression} AS _sort_value
+        {spec.from_sql}
+        {where_clause}
+        ORDER BY {sort_expression} {direction}, {spec.id_column} {direction}
+        LIMIT ?
+        ''', params + [limit + 1])
+
+        rows = cursor.fetchall()
+        columns = [description[0] for description in cursor.description][:-1]
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1][-1], rows[-1][0])
+    return [row[:-1] for row in rows], columns, next_cursor
+
+def summarize_listing(spec, filters=None):
+    """
+    Aggregate the whole filtered listing (not just one page) in SQL.
+
+    Returns:
+        tuple: The values of the spec's summary expressions
+    """
+    where_clause, params = spec.where(filters)
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(f'SELECT {spec.summary_sql} {spec.from_sql} {where_clause}', params)
+        return cursor.fetchone()
+
+
+# Amount shown, filtered, sorted and summed in invoice listings: the subtotal before taxes
+# (legacy rows may lack stored amounts)
+_INVOICE_AMOUNT = 'COALESCE(i.subtotal, s.unit_price * i.quantity)'
+
+INVOICE_LISTING = ListingSpec(
+    select_sql=f'''i.id, i.invoice_number, i.date, c.name, s.description, i.quantity,
+        {_INVOICE_AMOUNT} AS subtotal,
+        i.apply_iva, i.apply_irpf, i.client_id,
+        COALESCE(c.currency_symbol, '€') AS currency_symbol,
+        COALESCE(i.iva_amount, 0) AS iva_amount,
+        COALESCE(i.irpf_amount, 0) AS irpf_amount,
+        COALESCE(i.total_amount, s.unit_price * i.quantity) AS total_amount,
+        COALESCE(i.currency_code, 'EUR') AS currency_code''',
+    from_sql='''FROM invoices i
+        JOIN clients c ON i.client_id = c.id
+        JOIN services s ON i.service_id = s.id''',
+    id_column='i.id',
+    filters={
+        'year': Filter('i.date >= ? AND i.date < ?', get_year_date_range),
+        'month': Filter('substr(i.date, 6, 2) = ?', lambda value: (_month(value),)),
+        'date_from': Filter('i.date >= ?', lambda value: (_iso_date(value),)),
+        'date_to': Filter('i.date <= ?', lambda value: (_iso_date(value),)),
+        'client_id': Filter('i.client_id = ?', lambda value: (int(value),)),
+        'client': Filter('c.name = ?', lambda value: (value,)),
+        'currency': Filter("COALESCE(i.currency_code, 'EUR') = ?", lambda value: (value.upper(),)),
+        'min_amount': Filter(f'{_INVOICE_AMOUNT} >= ?', lambda value: (float(value),)),
+        'max_amount': Filter(f'{_INVOICE_AMOUNT} <= ?', lambda value: (float(value),)),
+        'apply_iva': Filter('i.apply_iva = ?', lambda value: (_flag(value),)),
+        'apply_irpf': Filter('i.apply_irpf = ?', lambda value: (_flag(value),)),
+        'search': Filter("(i.invoice_number LIKE ? ESCAPE '\\' OR c.name LIKE ? ESCAPE '\\' "
+                         "OR s.description LIKE ? ESCAPE '\\')", lambda value: _like(value, 3)),
+    },
+    sorts={
+        'date': 'i.date',
+        'number': 'i.invoice_number',
+        'client': 'c.name',
+        'amount': _INVOICE_AMOUNT,
+    },
+    default_sort=('date', 'desc'),
+    summary_sql=f'COUNT(*), COALESCE(SUM({_INVOICE_AMOUNT}), 0), COUNT(DISTINCT i.client_id)'
+)
+
+ESTIMATE_LISTING = ListingSpec(
+    select_sql='''e.id, e.estimate_number, e.issue_date, e.valid_until_date AS valid_until,
+        c.name AS client_name, s.description AS service_name, e.total AS total_amount,
+        e.currency, COALESCE(c.currency_symbol, '€') AS currency_symbol, e.status''',
+    from_sql='''FROM estimates e
+        JOIN clients c ON e.client_id = c.id
+        JOIN services s ON e.service_id = s.id''',
+    id_column='e.id',
+    filters={
+        'year': Filter('e.issue_date >= ? AND e.issue_date < ?', get_year_date_range),
+        'month': Filter('substr(e.issue_date, 6, 2) = ?', lambda value: (_month(value),)),
+        'date_from': Filter('e.issue_date >= ?', lambda value: (_iso_date(value),)),
+        'date_to': Filter('e.issue_date <= ?', lambda value: (_iso_date(value),)),
+        'client_id': Filter('e.client_id = ?', lambda value: (int(value),)),
+        'client': Filter('c.name = ?', lambda value: (value,)),
+        'currency': Filter('e.currency = ?', lambda value: (value.upper(),)),
+        'status': Filter('e.status = ?', lambda value: (value,)),
+        'min_amount': Filter('e.total >= ?', lambda value: (float(value),)),
+        'max_amount': Filter('e.total <= ?', lambda value: (float(value),)),
+        'apply_irpf': Filter('(e.irpf_rate > 0) = ?', lambda value: (_flag(value),)),
+        'search': Filter("(e.estimate_number LIKE ? ESCAPE '\\' OR c.name LIKE ? ESCAPE '\\' "
+                         "OR s.description LIKE ? ESCAPE '\\')", lambda value: _like(value, 3)),
+    },
+    sorts={
+        'date': 'e.issue_date',
+        'number': 'e.estimate_number',
+        'client': 'c.name',
+        'amount': 'e.total',
+        'status': 'e.status',
+        'valid_until': 'e.valid_until_date',
+    },
+    default_sort=('date', 'desc'),
+    summary_sql='COUNT(*), COALESCE(SUM(e.total), 0), COUNT(DISTINCT e.client_id)'
+)
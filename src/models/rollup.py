@@ -0,0 +1,117 @@
+"""
+Pre-aggregated monthly invoice totals for the dashboard statistics.
+
+invoice_monthly_rollup holds one row per (year, month, client, currency) with
+the invoice count, subtotal and total. Triggers on the invoices table keep it
+current on every insert, update and delete, so the statistics read a handful
+of rows instead of scanning and joining the whole invoice history.
+
+Usage:
+    python -m src.models.rollup [--db PATH]
+
+rebuilds the rollup from the invoices table.
+"""
+import argparse
+import sys
+from src.models import db
+from src.models.db import get_db_connection
+
+# Rollup key and measures for one invoice row (NEW or OLD inside a trigger)
+_ROLLUP_ROW_SQL = '''
+    CAST(substr({row}.date, 1, 4) AS INTEGER),
+    CAST(substr({row}.date, 6, 2) AS INTEGER),
+    {row}.client_id,
+    COALESCE({row}.currency_code, 'EUR')'''
+
+_ADD_ROW_SQL = '''
+    INSERT INTO invoice_monthly_rollup (year, month, client_id, currency_code, invoice_count, subtotal, total_amount)
+    VALUES ({key}, 1, COALESCE({row}.subtotal, 0), COALESCE({row}.total_amount, 0))
+    ON CONFLICT (year, month, client_id, currency_code) DO UPDATE SET
+        invoice_count = invoice_count + 1,
+        subtotal = subtotal + excluded.subtotal,
+        total_amount = total_amount + excluded.total_amount;'''
+
+_REMOVE_ROW_SQL = '''
+    UPDATE invoice_monthly_rollup SET
+        invoice_count = invoice_count - 1,
+        subtotal = subtotal - COALESCE({row}.subtotal, 0),
+        total_amount = total_amount - COALESCE({row}.total_amount, 0)
+    WHERE (year, month, client_id, currency_code) = ({key});
+    DELETE FROM invoice_monthly_rollup
+    WHERE (year, month, client_id, currency_code) = ({key}) AND invoice_count <= 0;'''
+
+def _add_row(row):
+    return _ADD_ROW_SQL.format(key=_ROLLUP_ROW_SQL.format(row=row), row=row)
+
+def _remove_row(row):
+    return _REMOVE_ROW_SQL.format(key=_ROLLUP_ROW_SQL.format(row=row), row=row)
+
+def create_rollup_triggers(conn):
+    """Create the triggers that keep invoice_monthly_rollup in step with invoices"""
+    conn.execute(f'''
+    CREATE TRIGGER IF NOT EXISTS trg_invoices_rollup_insert AFTER INSERT ON invoices
+    BEGIN{_add_row('NEW')}
+    END
+    ''')
+    conn.execute(f'''
+    CREATE TRIGGER IF NOT EXISTS trg_invoices_rollup_delete AFTER DELETE ON invoices
+    BEGIN{_remove_row('OLD')}
+    END
+    ''')
+    conn.execute(f'''
+    CREATE TRIGGER IF NOT EXISTS trg_invoices_rollup_update
+    AFTER UPDATE OF date, client_id, currency_code, subtotal, total_amount ON invoices
+    BEGIN{_remove_row('OLD')}{_add_row('NEW')}
+    END
+    ''')
+
+def rebuild_invoice_rollup(conn=None):
+    """
+    Recompute invoice_monthly_rollup from the invoices table.
+
+    Args:
+        conn: Connection to use; defaults to a pooled connection that is committed
+
+    Returns:
+        int: Number of rollup rows written
+    """
+    if conn is None:
+        with get_db_connection() as conn:
+            count = rebuild_invoice_rollup(conn)
+            conn.commit()
+        return count
+
+    cursor = conn.cursor()
+    cursor.execute('DELETE FROM invoice_monthly_rollup')
+    cursor.execute('''
+    INSERT INTO invoice_monthly_rollup (year, month, client_id, currency_code, invoice_count, subtotal, total_amount)
+    SELECT
+        CAST(substr(date, 1, 4) AS INTEGER) AS year,
+        CAST(substr(date, 6, 2) AS INTEGER) AS month,
+        client_id,
+        COALESCE(currency_code, 'EUR') AS currency,
+        COUNT(*),
+        SUM(COALESCE(subtotal, 0)),
+        SUM(COALESCE(total_amount, 0))
+    FROM invoices
+    GROUP BY year, month, client_id, currency
+    ''')
+    cursor.execute('SELECT COUNT(*) FROM invoice_monthly_rollup')
+    return cursor.fetchone()[0]
+
+def main(argv=None):
+    """Command line entry point to rebuild the monthly rollup"""
+    parser = argparse.ArgumentParser(description='Rebuild the monthly invoice rollup table.')
+    parser.add_argument('--db', help='Database file (defaults to the application database)')
+    args = parser.parse_args(argv)
+
+    if args.db:
+        db.DB_FILE = args.db
+    db.init_db()
+
+    count = rebuild_invoice_rollup()
+    print(f"Rebuilt invoice_monthly_rollup with {count} rows")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,74 @@
+"""
+Document number sequences for the Invoice Generator application.
+
+Numbers come from a per-(series, period) counter row that is incremented
+atomically inside the caller's transaction, so minting a number is O(1) and
+two concurrent requests can never get the same value.
+"""
+from src.models.db import get_db_connection
+
+# Default number templates; override them in config.json under "numbering"
+DEFAULT_INVOICE_FORMAT = '{period}-{prefix}-{seq}'
+DEFAULT_ESTIMATE_FORMAT = '{period}-P{seq:03d}'
+
+def next_sequence_value(conn, series, period, count=1):
+    """
+    Reserve the next value(s) of a sequence.
+
+    Args:
+        conn: Connection whose transaction the increment belongs to
+        series (str): Sequence name (e.g. 'invoice:AIO' or 'estimate')
+        period (str): Period the sequence restarts on (e.g. '2504')
+        count (int): Number of consecutive values to reserve
+
+    Returns:
+        int: The first reserved value
+    """
+    cursor = conn.cursor()
+    cursor.execute('''
+    INSERT INTO number_sequences (series, period, last_value) VALUES (?, ?, ?)
+    ON CONFLICT (series, period) DO UPDATE SET last_value = last_value + excluded.last_value
+    RETURNING last_value
+    ''', (series, period, count))
+    last_value = cursor.fetchone()[0]
+    return last_value - count + 1
+
+def get_number_format(document_type):
+    """Get the number template for 'invoice' or 'estimate' from the configuration"""
+    from src.utils import get_numbering
+
+    defaults = {'invoice': DEFAULT_INVOICE_FORMAT, 'estimate': DEFAULT_ESTIMATE_FORMAT}
+    return get_numbering().get(f'{document_type}_format', defaults[document_type])
+
+def get_series_name(document_type, number_format, prefix=None):
+    """Get the sequence name; numbers are counted per prefix only if the template shows it"""
+    if prefix and '{prefix' in number_format:
+        return f'{document_type}:{prefix}'
+    return document_type
+
+def format_document_number(number_format, period, seq, prefix=''):
+    """Render a document number from its template"""
+    return number_format.format(period=period, prefix=prefix, seq=seq)
+
+def allocate_document_numbers(document_type, period, count=1, prefix=None):
+    """
+    Reserve and format one or more consecutive document numbers.
+
+    Args:
+        document_type (str): 'invoice' or 'estimate'
+        period (str): Period code the numbering restarts on
+        count (int): How many numbers to reserve
+        prefix (str): Client prefix for templates that include {prefix}
+
+    Returns:
+        list: Formatted document numbers
+    """
+    number_format = get_number_format(document_type)
+    series = get_series_name(document_type, number_format, prefix)
+
+    with get_db_connection() as conn:
+        first = next_sequence_value(conn, series, period, count)
+        conn.commit()
+
+    return [format_document_number(number_format, period, seq, prefix or '')
+            for seq in range(first, first + count)]
@@ -1,7 +1,8 @@
 """
 Service-related database operations for the Invoice Generator application.
 """
-from src.models.db import get_db_connection
+from src.models.db import after_commit, get_db_connection
+from src.render_cache import invalidate_invoices
 
 def get_services():
     """Get all services from the database"""
@@ -43,6 +44,8 @@ def update_service(service_id, description, unit_price, unit_type):
         ''', (description, unit_price, unit_type, service_id))
 
         conn.commit()
+        # Rendered invoices print the service's description and price; drop them once the update is committed
+        after_commit(invalidate_invoices)
         return True
 
 def delete_service(service_id):
@@ -1,117 +1,105 @@
 """
 Statistics and reporting functions for the Invoice Generator application.
+
+Invoice statistics read the invoice_monthly_rollup table (see
+src/models/rollup.py), which holds at most one row per year, month, client
+and currency.
 """
-from src.models.db import get_db_connection, get_date_filter_clause
+from src import utils
+from src.models.db import get_db_connection, get_date_filter_clause, get_date_filter_params
+from src.models.fx import get_rate_index
+
+MONTH_LABELS = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+
+def _get_year_filter(year=None, column='r.year'):
+    """Build the WHERE clause and parameters restricting the rollup to a year"""
+    if year:
+        return f'WHERE {column} = ?', [int(year)]
+    return '', []
+
+def _get_revenue_by_month(cursor, year, target):
+    """Get {month: revenue} in the target currency.
+
+    Rollup rows already in the target currency are summed as they are; invoices
+    in any other currency are converted at the rate of their own date, all in
+    one batch.
+    """
+    where_clause, params = _get_year_filter(year)
+    currency_filter = 'AND' if where_clause else 'WHERE'
+    cursor.execute(f'''
+    SELECT r.month, SUM(r.subtotal)
+    FROM invoice_monthly_rollup r
+    {where_clause} {currency_filter} r.currency_code = ?
+    GROUP BY r.month
+    ''', params + [target])
+    revenue = dict(cursor.fetchall())
+
+    cursor.execute(f'''
+    SELECT date, currency_code, COALESCE(subtotal, 0)
+    FROM invoices
+    WHERE {get_date_filter_clause(year)} AND COALESCE(currency_code, 'EUR') != ?
+    ''', (*get_date_filter_params(year), target))
+    foreign = cursor.fetchall()
+
+    if foreign:
+        converted = get_rate_index().convert_many(foreign, target)
+        for (invoice_date, _, _), amount in zip(foreign, converted):
+            month = int(invoice_date[5:7])
+            revenue[month] = revenue.get(month, 0) + amount
+
+    return revenue
 
 def get_invoice_stats_by_month(year=None):
     """Get invoice statistics grouped by month"""
     with get_db_connection() as conn:
         cursor = conn.cursor()
 
-        # Extract month from date field (format: DD/MM/YYYY)
-        date_filter = get_date_filter_clause(year)
+        where_clause, params = _get_year_filter(year)
 
         query = f'''
         SELECT
-            CAST(substr(date, 4, 2) AS INTEGER) as month,
-            COUNT(*) as count
-        FROM invoices
-        WHERE {date_filter}
-        GROUP BY month
-        ORDER BY month
+            r.month,
+            SUM(r.invoice_count) as count
+        FROM invoice_monthly_rollup r
+        {where_clause}
+        GROUP BY r.month
+        ORDER BY r.month
         '''
 
-        if year:
-            cursor.execute(query, (str(year),))
-        else:
-            cursor.execute(query)
+        cursor.execute(query, params)
 
         stats = cursor.fetchall()
         return stats
 
 def get_revenue_stats_by_month(year=None):
-    """Get revenue statistics grouped by month"""
-    with get_db_connection() as conn:
-        cursor = conn.cursor()
-
-        # First, get all invoices with their details
-        date_filter = get_date_filter_clause(year)
-        date_filter = date_filter.replace('date', 'i.date')  # Adjust for table alias
-
-        query = f'''
-        SELECT
-            CAST(substr(i.date, 4, 2) AS INTEGER) as month,
-            s.unit_price * i.quantity as amount,
-            c.currency_code,
-            c.currency_symbol
-        FROM invoices i
-        JOIN services s ON i.service_id = s.id
-        JOIN clients c ON i.client_id = c.id
-        WHERE {date_filter}
-        ORDER BY month
-        '''
-
-        if year:
-            cursor.execute(query, (str(year),))
-        else:
-            cursor.execute(query)
-
-        invoices = cursor.fetchall()
-
-    # Process the data to combine amounts by month
-    monthly_totals = {}
-    default_currency = '€'
-    default_currency_code = 'EUR'
-
-    for invoice in invoices:
-        month = invoice[0]
-        amount = invoice[1]
-        currency_code = invoice[2] or default_currency_code
-        currency_symbol = invoice[3] or default_currency
-
-        # Convert USD to EUR if needed (using a simple conversion rate)
-        if currency_code == 'USD':
-            # Approximate conversion rate: 1 USD = 0.85 EUR
-            amount = amount * 0.85
-            currency_symbol = '€'
-            currency_code = 'EUR'
+    """Get revenue statistics grouped by month, converted to the default currency"""
+    target, currency_symbol = utils.get_default_currency()
 
-        if month not in monthly_totals:
-            monthly_totals[month] = {'total': 0, 'currency_symbol': currency_symbol, 'currency_code': currency_code}
-
-        monthly_totals[month]['total'] += amount
+    with get_db_connection() as conn:
+        revenue = _get_revenue_by_month(conn.cursor(), year, target)
 
     # Convert to the format expected by the API
-    stats = [(month, data['total'], data['currency_symbol']) for month, data in monthly_totals.items()]
-    stats.sort()  # Sort by month
-
-    return stats
+    return [(month, amount, currency_symbol) for month, amount in sorted(revenue.items())]
 
 def get_invoice_stats_by_client(year=None):
     """Get invoice statistics grouped by client"""
     with get_db_connection() as conn:
         cursor = conn.cursor()
 
-        # Build query with conditional WHERE clause
-        where_clause = ""
-        if year:
-            where_clause = "WHERE substr(i.date, 7, 4) = ?"
+        where_clause, params = _get_year_filter(year)
 
         query = f'''
         SELECT
             c.name,
-            COUNT(*) as count
-        FROM invoices i
-        JOIN clients c ON i.client_id = c.id
+            SUM(r.invoice_count) as count
+        FROM invoice_monthly_rollup r
+        JOIN clients c ON r.client_id = c.id
         {where_clause}
         GROUP BY c.name
         ORDER BY count DESC
         '''
 
-        if year:
-            cursor.execute(query, (str(year),))
-        else:
-            cursor.execute(query)
+        cursor.execute(query, params)
 
         stats = cursor.fetchall()
         return stats
@@ -121,27 +109,108 @@ def get_monthly_invoice_stats_by_client(year=None):
     with get_db_connection() as conn:
         cursor = conn.cursor()
 
-        # Build query with conditional WHERE clause
-        where_clause = ""
-        if year:
-            where_clause = "WHERE substr(i.date, 7, 4) = ?"
+        where_clause, params = _get_year_filter(year)
 
         query = f'''
         SELECT
-            CAST(substr(i.date, 4, 2) AS INTEGER) as month,
+            r.month,
             c.name as client,
-            COUNT(*) as count
-        FROM invoices i
-        JOIN clients c ON i.client_id = c.id
+            SUM(r.invoice_count) as count
+        FROM invoice_monthly_rollup r
+        JOIN clients c ON r.client_id = c.id
         {where_clause}
-        GROUP BY month, client
-        ORDER BY month, count DESC
+        GROUP BY r.month, client
+        ORDER BY r.month, count DESC
         '''
 
-        if year:
-            cursor.execute(query, (str(year),))
-        else:
-            cursor.execute(query)
+        cursor.execute(query, params)
 
         stats = cursor.fetchall()
         return stats
+
+def get_dashboard_stats(year=None, top_clients=4, top_monthly_clients=5):
+    """
+    Get every dashboard chart series from a single pass over the rollup.
+
+    Revenue is converted to the default currency at historical exchange rates.
+
+    Args:
+        year: Year to report on (all years if None)
+        top_clients (int): Clients shown individually in the distribution chart
+        top_monthly_clients (int): Clients shown individually in the monthly chart
+
+    Returns:
+        dict: 'invoice_stats', 'revenue_stats', 'client_stats' and
+              'client_monthly_stats' in the shape of the matching /api/*_stats
+              endpoints, plus 'totals' with the invoice count and revenue
+    """
+    target, currency = utils.get_default_currency()
+
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+
+        where_clause, params = _get_year_filter(year)
+
+        cursor.execute(f'''
+        SELECT r.month, c.name, SUM(r.invoice_count)
+        FROM invoice_monthly_rollup r
+        JOIN clients c ON r.client_id = c.id
+        {where_clause}
+        GROUP BY r.month, r.client_id
+        ''', params)
+
+        rows = cursor.fetchall()
+
+        revenue = _get_revenue_by_month(cursor, year, target)
+
+    counts = [0] * 12
+    amounts = [0] * 12
+    total_invoices = 0
+    client_totals = {}
+    client_months = {}
+
+    for month, client_name, invoice_count in rows:
+        total_invoices += invoice_count
+        client_totals[client_name] = client_totals.get(client_name, 0) + invoice_count
+
+        if not 1 <= month <= 12:
+            continue
+        counts[month - 1] += invoice_count
+        client_months.setdefault(client_name, [0] * 12)[month - 1] += invoice_count
+
+    for month, amount in revenue.items():
+        if 1 <= month <= 12:
+            amounts[month - 1] += amount
+    total_revenue = sum(revenue.values())
+
+    ranked_clients = sorted(client_totals.items(), key=lambda item: item[1], reverse=True)
+
+    # Client distribution as percentages, with the long tail grouped as "Others"
+    if total_invoices > 0:
+        labels = [name for name, _ in ranked_clients[:top_clients]]
+        values = [round((count / total_invoices) * 100) for _, count in ranked_clients[:top_clients]]
+        if len(ranked_clients) > top_clients:
+            labels.append('Others')
+            values.append(round((sum(count for _, count in ranked_clients[top_clients:]) / total_invoices) * 100))
+    else:
+        labels = ['No Data']
+        values = [100]
+
+    # Monthly invoice counts per top client, with the rest stacked as "Others"
+    series = [{'name': name, 'data': client_months.get(name, [0] * 12)}
+              for name, _ in ranked_clients[:top_monthly_clients]]
+    if len(ranked_clients) > top_monthly_clients:
+        others = [0] * 12
+        for name, _ in ranked_clients[top_monthly_clients:]:
+            for index, count in enumerate(client_months.get(name, [])):
+                others[index] += count
+        series.append({'name': 'Others', 'data': others})
+
+    return {
+        'year': year,
+        'invoice_stats': {'months': MONTH_LABELS, 'counts': counts, 'year': year},
+        'revenue_stats': {'months': MONTH_LABELS, 'amounts': amounts, 'currency': currency, 'year': year},
+        'client_stats': {'labels': labels, 'values': values, 'year': year},
+        'client_monthly_stats': {'months': MONTH_LABELS, 'series': series, 'year': year},
+        'totals': {'invoices': total_invoices, 'revenue': total_revenue}
+    }
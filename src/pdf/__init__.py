@@ -0,0 +1,7 @@
+"""
+PDF rendering of invoices and estimates.
+
+src.pdf.service is the entry point used by the routes; the writer and layout
+modules are kept free of application imports because they are loaded in the
+rendering worker processes.
+"""
@@ -0,0 +1,125 @@
+"""
+Document data for invoice and estimate PDFs.
+
+Builders turn database records into plain, JSON-serializable dicts holding
+only formatted strings. The dicts are what is sent to the rendering worker
+processes and what the PDF cache key is computed from, so two requests for
+an unchanged document map to the same cached file.
+"""
+from src.models.invoices import get_invoice_currency
+from src.utils import format_date_for_display, get_default_currency, get_tax_rates
+
+LEGAL_NOTES = [
+    'Invoice subject to freelancer regime according to current legislation.',
+    'Payment period according to Law 15/2010: 30 days from issue date.',
+]
+
+def _money(symbol, amount):
+    return f'{symbol}{float(amount or 0):.2f}'
+
+def _tax_label(name, amount, subtotal, configured_rate):
+    """Label a tax line with the rate its amount was calculated with.
+
+    That is the configured rate, unless the invoice was priced before the
+    rate was changed; then the rate is worked out from its stored figures.
+    """
+    rate = configured_rate
+    if subtotal and round(subtotal * rate, 2) != round(amount, 2):
+        rate = amount / subtotal
+    return f'{name} ({round(rate * 100, 2):g}%)'
+
+def _issuer_party(issuer):
+    return {
+        'name': issuer.get('name', ''),
+        'lines': [
+            f"ID: {issuer.get('tax_id', '')}",
+            f"Address: {issuer.get('address', '')}",
+            f"{issuer.get('city', '')}, {issuer.get('country', '')}",
+            f"Phone: {issuer.get('phone', '')}",
+            f"Email: {issuer.get('email', '')}",
+        ]
+    }
+
+def _payment(issuer):
+    return ['Bank transfer', f"IBAN: {issuer.get('bank_iban', '')}", f"Bank: {issuer.get('bank_name', '')}"]
+
+def invoice_document(invoice, issuer):
+    """
+    Build the document dict of an invoice, with the same content as invoice.html.
+
+    Args:
+        invoice (InvoiceRecord): Invoice from get_invoice_by_number or get_invoice_records
+        issuer (dict): Issuer data from the configuration
+    """
+    _, symbol = get_invoice_currency(invoice)
+    client, service = invoice.client, invoice.service
+
+    tax_rates = get_tax_rates()
+    summary = [('Subtotal', _money(symbol, invoice.subtotal))]
+    if invoice.iva_amount > 0:
+        summary.append((_tax_label('VAT', invoice.iva_amount, invoice.subtotal, tax_rates.iva),
+                        _money(symbol, invoice.iva_amount)))
+    else:
+        summary.append(('VAT', 'Not applicable'))
+    if invoice.irpf_amount > 0:
+        summary.append((_tax_label('Income Tax', invoice.irpf_amount, invoice.subtotal, tax_rates.irpf),
+                        '-' + _money(symbol, invoice.irpf_amount)))
+    else:
+        summary.append(('Income Tax', 'Not applicable'))
+
+    return {
+        'title': 'INVOICE',
+        'number': invoice.invoice_number,
+        'fields': [('Date', format_date_for_display(invoice.date))],
+        'issuer': _issuer_party(issuer),
+        'client': {
+            'name': client.name,
+            'lines': [f'Tax ID: {client.tax_id}', client.address, client.country, f'Email: {client.email or ""}']
+        },
+        'items': [(service.description, invoice.quantity,
+                   f'{_money(symbol, service.unit_price)}/{service.unit_type}', _money(symbol, invoice.subtotal))],
+        'summary': summary,
+        'total': ('TOTAL', _money(symbol, invoice.total_amount)),
+        'payment': _payment(issuer),
+        'notes': LEGAL_NOTES,
+    }
+
+def estimate_document(estimate, issuer):
+    """
+    Build the document dict of an estimate.
+
+    Args:
+        estimate (dict): Estimate from get_estimate_by_number
+        issuer (dict): Issuer data from the configuration
+    """
+    symbol = estimate.get('client_currency_symbol') or get_default_currency().symbol
+
+    summary = [('Subtotal', _money(symbol, estimate['subtotal']))]
+    if estimate.get('iva_amount'):
+        summary.append(('VAT', _money(symbol, estimate['iva_amount'])))
+    if estimate.get('irpf_amount'):
+        summary.append((f"Income Tax ({float(estimate['irpf_rate']) * 100:g}%)",
+                        '-' + _money(symbol, estimate['irpf_amount'])))
+
+    fields = [('Date', format_date_for_display(estimate['issue_date']))]
+    if estimate.get('valid_until_date'):
+        fields.append(('Valid until', format_date_for_display(estimate['valid_until_date'])))
+
+    return {
+        'title': 'ESTIMATE',
+        'number': estimate['estimate_number'],
+        'fields': fields,
+        'issuer': _issuer_party(issuer),
+        'client': {
+            'name': estimate['client_name'],
+            'lines': [f"Tax ID: {estimate['client_tax_id']}", estimate['client_address'],
+                      estimate['client_country'], f"Email: {estimate.get('client_email') or ''}"]
+        },
+        'items': [(estimate['service_description'], estimate['quantity'],
+                   f"{_money(symbol, estimate['service_unit_price'])}/{estimate['service_unit_type']}",
+                   _money(symbol, estimate['subtotal']))],
+        'summary': summary,
+        'total': ('TOTAL', _money(symbol, estimate['total'])),
+        'payment': _payment(issuer),
+        'notes': [note for note in (estimate.get('notes'), estimate.get('terms')) if note],
+    }
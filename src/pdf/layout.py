@@ -0,0 +1,116 @@
+"""
+Page layout of invoice and estimate PDFs.
+
+render_document() takes a plain document dict (see src/pdf/documents.py) and
+returns PDF bytes. It imports nothing from the application, so it is cheap
+to load in the rendering worker processes.
+"""
+from src.pdf.writer import PdfWriter, PAGE_WIDTH, PAGE_HEIGHT, wrap_text
+
+MARGIN = 50
+RIGHT = PAGE_WIDTH - MARGIN
+GREY = (0.4, 0.4, 0.4)
+LIGHT_GREY = (0.92, 0.92, 0.92)
+
+class _Cursor:
+    """Vertical position on the current page, starting a new page when space runs out"""
+
+    def __init__(self, pdf):
+        self.pdf = pdf
+        self.y = PAGE_HEIGHT - MARGIN
+
+    def down(self, height):
+        if self.y - height < MARGIN:
+            self.pdf.add_page()
+            self.y = PAGE_HEIGHT - MARGIN
+        self.y -= height
+        return self.y
+
+def _party(pdf, x, y, heading, party):
+    pdf.text(x, y, heading, size=8, font='bold', color=GREY)
+    y -= 16
+    pdf.text(x, y, party.get('name', ''), size=11, font='bold')
+    for line in party.get('lines', []):
+        y -= 13
+        pdf.text(x, y, line, size=9)
+    return y
+
+def render_document(document):
+    """
+    Render a document dict to PDF bytes.
+
+    Args:
+        document (dict): 'title', 'number', 'fields', 'issuer', 'client',
+                         'items', 'summary', 'total', 'payment' and 'notes'
+
+    Returns:
+        bytes: The PDF file
+    """
+    pdf = PdfWriter()
+    cursor = _Cursor(pdf)
+
+    # Title and document fields
+    y = cursor.down(24)
+    pdf.text(MARGIN, y, document['title'], size=24, font='bold')
+    pdf.text(RIGHT, y, document['number'], size=12, font='bold', align='right')
+    for label, value in document.get('fields', []):
+        y = cursor.down(14)
+        pdf.text(RIGHT, y, f'{label}: {value}', size=9, align='right', color=GREY)
+    y = cursor.down(14)
+    pdf.line(MARGIN, y, RIGHT, y)
+
+    # Issuer and client
+    top = cursor.down(20)
+    bottom = min(_party(pdf, MARGIN, top, 'FROM', document['issuer']),
+                 _party(pdf, PAGE_WIDTH / 2 + 10, top, 'TO', document['client']))
+    cursor.y = bottom - 10
+
+    # Line items
+    y = cursor.down(24)
+    pdf.rect(MARGIN, y - 6, RIGHT - MARGIN, 20, color=LIGHT_GREY)
+    for x, label, align in ((MARGIN + 5, 'Description', 'left'), (320, 'Quantity', 'left'),
+                            (390, 'Unit price', 'left'), (RIGHT - 5, 'Amount', 'right')):
+        pdf.text(x, y, label, size=9, font='bold', align=align)
+    for description, quantity, unit_price, amount in document.get('items', []):
+        description_lines = wrap_text(description, 10, 250)
+        y = cursor.down(20)
+        pdf.text(320, y, str(quantity), size=10)
+        pdf.text(390, y, unit_price, size=10)
+        pdf.text(RIGHT - 5, y, amount, size=10, align='right')
+        pdf.text(MARGIN + 5, y, description_lines[0], size=10)
+        for line in description_lines[1:]:
+            y = cursor.down(13)
+            pdf.text(MARGIN + 5, y, line, size=10)
+    y = cursor.down(10)
+    pdf.line(MARGIN, y, RIGHT, y, color=GREY)
+
+    # Totals
+    cursor.down(8)
+    for label, value in document.get('summary', []):
+        y = cursor.down(16)
+        pdf.text(390, y, label, size=10)
+        pdf.text(RIGHT - 5, y, value, size=10, align='right')
+    if document.get('total'):
+        y = cursor.down(8)
+        pdf.line(390, y, RIGHT, y)
+        y = cursor.down(18)
+        label, value = document['total']
+        pdf.text(390, y, label, size=12, font='bold')
+        pdf.text(RIGHT - 5, y, value, size=12, font='bold', align='right')
+
+    # Payment details and notes
+    if document.get('payment'):
+        cursor.down(20)
+        y = cursor.down(14)
+        pdf.text(MARGIN, y, 'PAYMENT METHOD', size=9, font='bold', color=GREY)
+        for line in document['payment']:
+            y = cursor.down(13)
+            pdf.text(MARGIN, y, line, size=9)
+    if document.get('notes'):
+        cursor.down(16)
+        for note in document['notes']:
+            for line in wrap_text(note, 8, RIGHT - MARGIN):
+                y = cursor.down(11)
+                pdf.text(MARGIN, y, line, size=8, color=GREY)
+
+    return pdf.to_bytes(title=f"{document['title'].title()} {document['number']}")
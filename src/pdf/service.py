@@ -0,0 +1,312 @@
+"""
+Server-side PDF generation for invoices and estimates.
+
+Rendering is CPU bound, so it runs in a pool of worker processes and request
+threads only wait for the result. Rendered files are kept in an on-disk cache
+addressed by the hash of the document data (pdf_cache/ next to the database),
+so an unchanged document is rendered once. Month exports render every
+invoice of a month into a zip file in a background job that reports its
+progress; zip files are deleted an hour later, when another export starts.
+
+Usage:
+    python -m src.pdf.service 2025-05 [--db PATH] [--output FILE]
+"""
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+import uuid
+import zipfile
+from concurrent.futures import Future, ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from src.models import db
+from src.models.estimates import get_estimate_by_number
+from src.models.invoices import get_invoice_by_number, get_invoice_records
+from src.pdf.documents import invoice_document, estimate_document
+from src.pdf.layout import render_document
+from src.utils import get_issuer
+
+# Bump when the layout changes so cached files are rendered again
+RENDERER_VERSION = 1
+
+# Worker processes rendering PDFs; 0 renders in the calling thread
+PDF_WORKERS = min(4, os.cpu_count() or 1)
+
+# Finished export jobs kept for status queries
+MAX_EXPORT_JOBS = 100
+
+# Seconds an export zip is kept for downloading; older ones are deleted when a new export starts
+EXPORT_MAX_AGE = 60 * 60
+
+def get_pdf_cache_dir():
+    """Get the directory of rendered PDFs, next to the database file"""
+    return os.path.join(os.path.dirname(os.path.abspath(db.DB_FILE)), 'pdf_cache')
+
+def get_export_dir():
+    """Get the directory of month export zip files, next to the database file"""
+    return os.path.join(os.path.dirname(os.path.abspath(db.DB_FILE)), 'exports')
+
+
+_pool_lock = threading.Lock()
+_pool = None
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # Spawned workers don't inherit the server's threads and locks
+            _pool = ProcessPoolExecutor(max_workers=PDF_WORKERS, mp_context=multiprocessing.get_context('spawn'))
+        return _pool
+
+def shutdown_pdf_workers():
+    """Stop the rendering worker processes (they are started again on demand)"""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=True)
+
+def _submit(document):
+    if PDF_WORKERS <= 0:
+        future = Future()
+        try:
+            future.set_result(render_document(document))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    try:
+        return _get_pool().submit(render_document, document)
+    except BrokenProcessPool:
+        # A worker died; start a fresh pool for this and later documents
+        shutdown_pdf_workers()
+        return _get_pool().submit(render_document, document)
+
+def document_key(document):
+    """Get the content address of a document: the hash of its data and the renderer version"""
+    payload = json.dumps([RENDERER_VERSION, document], sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def _cache_path(document):
+    key = document_key(document)
+    return os.path.join(get_pdf_cache_dir(), key[:2], f'{key}.pdf')
+
+def _write_atomic(path, data):
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+def get_document_pdf(document):
+    """
+    Get the path of the PDF of a document dict, rendering it on a worker if not cached.
+
+    Returns:
+        str: Path of the PDF file in the cache
+    """
+    path = _cache_path(document)
+    if not os.path.exists(path):
+        _write_atomic(path, _submit(document).result())
+    return path
+
+def get_invoice_pdf(invoice_number):
+    """Get the path of an invoice's PDF, or None if the invoice does not exist"""
+    invoice = get_invoice_by_number(invoice_number)
+    if not invoice:
+        return None
+    return get_document_pdf(invoice_document(invoice, get_issuer()))
+
+def get_estimate_pdf(estimate_number):
+    """Get the path of an estimate's PDF, or None if the estimate does not exist"""
+    estimate = get_estimate_by_number(estimate_number)
+    if not estimate:
+        return None
+    return get_document_pdf(estimate_document(estimate, get_issuer()))
+
+def _month_range(year, month):
+    year, month = int(year), int(month)
+    if not 1 <= month <= 12:
+        raise ValueError(f"Invalid month: {month}")
+    next_year, next_month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return f'{year:04d}-{month:02d}-01', f'{next_year:04d}-{next_month:02d}-01'
+
+def _archive_name(number):
+    return re.sub(r'[^\w.-]', '_', number) + '.pdf'
+
+def export_month_pdfs(year, month, output_path, progress=None):
+    """
+    Render every invoice dated in a month into a zip file.
+
+    Cached PDFs are reused; the others are rendered in parallel on the workers.
+
+    Args:
+        year (int): Year
+        month (int): Month (1-12)
+        output_path (str): Zip file to write
+        progress (callable): Called with (done, total) as invoices are ready
+
+    Returns:
+        int: Number of invoices in the zip file
+
+    Raises:
+        ValueError: If the month is invalid
+    """
+    issuer = get_issuer()
+    documents = [invoice_document(invoice, issuer) for invoice in get_invoice_records(*_month_range(year, month))]
+    total = len(documents)
+    paths = [_cache_path(document) for document in documents]
+
+    done = 0
+    pending = {}
+    for position, (document, path) in enumerate(zip(documents, paths)):
+        if os.path.exists(path):
+            done += 1
+        else:
+            pending[_submit(document)] = position
+    if progress:
+        progress(done, total)
+
+    for future in as_completed(pending):
+        _write_atomic(paths[pending[future]], future.result())
+        done += 1
+        if progress:
+            progress(done, total)
+
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    temp_path = f'{output_path}.tmp'
+    # PDF content streams are already compressed
+    with zipfile.ZipFile(temp_path, 'w', compression=zipfile.ZIP_STORED) as archive:
+        for document, path in zip(documents, paths):
+            archive.write(path, _archive_name(document['number']))
+    os.replace(temp_path, output_path)
+    return total
+
+
+_jobs_lock = threading.Lock()
+_jobs = {}  # job id -> job dict, oldest first
+
+def prune_exports(max_age=EXPORT_MAX_AGE):
+    """
+    Delete the export zip files (and leftover partial files) older than max_age seconds.
+
+    Returns:
+        int: Number of files deleted
+    """
+    directory = get_export_dir()
+    if not os.path.isdir(directory):
+        return 0
+    cutoff = time.time() - max_age
+    deleted = 0
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+                deleted += 1
+        except OSError:
+            # Removed by a concurrent prune, or still in use
+            continue
+    return deleted
+
+def _update_job(job_id, **values):
+    with _jobs_lock:
+        _jobs[job_id].update(values)
+
+def _run_month_export(job_id, year, month, output_path):
+    _update_job(job_id, status='running')
+    try:
+        count = export_month_pdfs(year, month, output_path,
+                                  progress=lambda done, total: _update_job(job_id, done=done, total=total))
+        _update_job(job_id, status='done', total=count, path=output_path,
+                    finished_at=datetime.now().isoformat(timespec='seconds'))
+    except Exception as e:
+        print(f"Error exporting invoices for {year}-{month:02d}: {e}")
+        _update_job(job_id, status='failed', error=str(e),
+                    finished_at=datetime.now().isoformat(timespec='seconds'))
+
+def start_month_export(year, month):
+    """
+    Start a background job rendering a month's invoices into a zip file.
+
+    Returns:
+        dict: The job (see get_export_job)
+
+    Raises:
+        ValueError: If the year or month is invalid
+    """
+    year, month = int(year), int(month)
+    _month_range(year, month)
+    prune_exports()
+
+    job_id = uuid.uuid4().hex
+    output_path = os.path.join(get_export_dir(), f'invoices-{year:04d}-{month:02d}-{job_id[:8]}.zip')
+    job = {
+        'id': job_id, 'year': year, 'month': month, 'status': 'queued', 'done': 0, 'total': None,
+        'error': None, 'path': None, 'created_at': datetime.now().isoformat(timespec='seconds'),
+        'finished_at': None
+    }
+    with _jobs_lock:
+        _jobs[job_id] = job
+        finished = [key for key, value in _jobs.items() if value['status'] in ('done', 'failed')]
+        dropped = [_jobs.pop(key) for key in finished[:max(0, len(_jobs) - MAX_EXPORT_JOBS)]]
+    # The files of forgotten jobs can no longer be downloaded
+    for dropped_job in dropped:
+        if dropped_job['path'] and os.path.exists(dropped_job['path']):
+            os.remove(dropped_job['path'])
+
+    threading.Thread(target=_run_month_export, args=(job_id, year, month, output_path), daemon=True).start()
+    return get_export_job(job_id)
+
+def get_export_job(job_id):
+    """
+    Get a copy of an export job.
+
+    Returns:
+        dict: 'id', 'year', 'month', 'status' (queued, running, done or failed),
+              'done' and 'total' invoices, 'error', 'path' of the zip file,
+              'created_at' and 'finished_at'; None if the job is unknown
+    """
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+        return dict(job) if job else None
+
+def main(argv=None):
+    """Command line entry point to export a month of invoices as PDFs"""
+    parser = argparse.ArgumentParser(description='Render all invoices of a month to PDF files in a zip.')
+    parser.add_argument('month', help='Month to export, as YYYY-MM')
+    parser.add_argument('--db', help='Database file (defaults to the application database)')
+    parser.add_argument('--output', help='Zip file to write (defaults to invoices-YYYY-MM.zip)')
+    args = parser.parse_args(argv)
+
+    try:
+        year, month = (int(part) for part in args.month.split('-'))
+    except ValueError:
+        parser.error('month must be YYYY-MM')
+
+    if args.db:
+        db.DB_FILE = args.db
+    db.init_db()
+
+    output_path = args.output or f'invoices-{year:04d}-{month:02d}.zip'
+    count = export_month_pdfs(year, month, output_path,
+                              progress=lambda done, total: print(f"\rRendered {done}/{total}", end='', flush=True))
+    print(f"\nWrote {count} invoices to {output_path}")
+    shutdown_pdf_workers()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
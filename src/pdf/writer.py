@@ -0,0 +1,149 @@
+"""
+Minimal PDF writer using the standard Helvetica fonts.
+
+Only what the invoice and estimate layouts need: pages of positioned text,
+lines and filled rectangles. Text is encoded as WinAnsi (cp1252), which
+covers Spanish accents and the euro sign, so no fonts are embedded. Output
+is deterministic (no timestamps or random IDs): the same document always
+produces the same bytes.
+"""
+import zlib
+
+# Page size in points (A4)
+PAGE_WIDTH = 595
+PAGE_HEIGHT = 842
+
+FONTS = {
+    'regular': 'Helvetica',
+    'bold': 'Helvetica-Bold',
+}
+
+# Glyph widths (1/1000 em) of the printable ASCII characters (32-126), from the Adobe AFM metrics
+_WIDTHS = {
+    'regular': [
+        278, 278, 355, 556, 556, 889, 667, 191, 333, 333, 389, 584, 278, 333, 278, 278,
+        556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 278, 278, 584, 584, 584, 556,
+        1015, 667, 667, 722, 722, 667, 611, 778, 722, 278, 500, 667, 556, 833, 722, 778,
+        667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 278, 278, 278, 469, 556,
+        333, 556, 556, 500, 556, 556, 278, 556, 556, 222, 222, 500, 222, 833, 556, 556,
+        556, 556, 333, 500, 278, 556, 500, 722, 500, 500, 500, 334, 260, 334, 584,
+    ],
+    'bold': [
+        278, 333, 474, 556, 556, 889, 722, 238, 333, 333, 389, 584, 278, 333, 278, 278,
+        556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 333, 333, 584, 584, 584, 611,
+        975, 722, 722, 722, 722, 667, 611, 778, 722, 278, 556, 722, 611, 833, 722, 778,
+        667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 333, 278, 333, 584, 556,
+        333, 556, 611, 556, 611, 556, 333, 611, 611, 278, 278, 556, 278, 889, 611, 611,
+        611, 611, 389, 556, 333, 611, 556, 778, 556, 556, 500, 389, 280, 389, 584,
+    ],
+}
+# Width used for characters outside printable ASCII (accented letters, the euro sign)
+_DEFAULT_WIDTH = 556
+
+def text_width(text, size, font='regular'):
+    """Get the width of a text in points"""
+    widths = _WIDTHS[font]
+    total = 0
+    for char in text:
+        code = ord(char)
+        total += widths[code - 32] if 32 <= code <= 126 else _DEFAULT_WIDTH
+    return total * size / 1000
+
+def wrap_text(text, size, max_width, font='regular'):
+    """Split a text into lines no wider than max_width, breaking between words"""
+    lines = []
+    for paragraph in str(text).splitlines() or ['']:
+        line = ''
+        for word in paragraph.split():
+            candidate = f'{line} {word}' if line else word
+            if line and text_width(candidate, size, font) > max_width:
+                lines.append(line)
+                line = word
+            else:
+                line = candidate
+        lines.append(line)
+    return lines
+
+def _escape(text):
+    encoded = str(text).encode('cp1252', errors='replace')
+    return encoded.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)')
+
+def _number(value):
+    return f'{value:.2f}'.rstrip('0').rstrip('.') if value != int(value) else str(int(value))
+
+class PdfWriter:
+    """Collects drawing operations page by page and serializes them to PDF bytes"""
+
+    def __init__(self):
+        self._pages = []
+        self.add_page()
+
+    def add_page(self):
+        """Start a new page; later drawing goes to it"""
+        self._pages.append([])
+
+    def text(self, x, y, text, size=10, font='regular', align='left', color=(0, 0, 0)):
+        """Draw a single line of text with its baseline at y (points from the bottom)"""
+        if align == 'right':
+            x -= text_width(text, size, font)
+        elif align == 'center':
+            x -= text_width(text, size, font) / 2
+        r, g, b = color
+        self._pages[-1].append(
+            b'BT %s %s %s rg /F%d %s Tf %s %s Td (%s) Tj ET' % (
+                _number(r).encode(), _number(g).encode(), _number(b).encode(),
+                list(FONTS).index(font) + 1, _number(size).encode(),
+                _number(x).encode(), _number(y).encode(), _escape(text)))
+
+    def line(self, x1, y1, x2, y2, width=0.5, color=(0, 0, 0)):
+        """Draw a straight line"""
+        r, g, b = color
+        self._pages[-1].append(b'%s %s %s RG %s w %s %s m %s %s l S' % tuple(
+            _number(value).encode() for value in (r, g, b, width, x1, y1, x2, y2)))
+
+    def rect(self, x, y, width, height, color=(0.9, 0.9, 0.9)):
+        """Draw a filled rectangle with its lower left corner at (x, y)"""
+        r, g, b = color
+        self._pages[-1].append(b'%s %s %s rg %s %s %s %s re f' % tuple(
+            _number(value).encode() for value in (r, g, b, x, y, width, height)))
+
+    def to_bytes(self, title=''):
+        """Serialize the document"""
+        objects = []
+
+        def add(body):
+            objects.append(body)
+            return len(objects)
+
+        catalog_id = add(None)
+        pages_id = add(None)
+        font_ids = [add(b'<< /Type /Font /Subtype /Type1 /BaseFont /%s /Encoding /WinAnsiEncoding >>' % name.encode())
+                    for name in FONTS.values()]
+        fonts = b' '.join(b'/F%d %d 0 R' % (index, font_id) for index, font_id in enumerate(font_ids, start=1))
+
+        page_ids = []
+        for operations in self._pages:
+            content = zlib.compress(b'\n'.join(operations))
+            content_id = add(b'<< /Length %d /Filter /FlateDecode >>\nstream\n%s\nendstream' % (len(content), content))
+            page_ids.append(add(
+                b'<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %d %d] /Resources << /Font << %s >> >> '
+                b'/Contents %d 0 R >>' % (pages_id, PAGE_WIDTH, PAGE_HEIGHT, fonts, content_id)))
+
+        objects[catalog_id - 1] = b'<< /Type /Catalog /Pages %d 0 R >>' % pages_id
+        objects[pages_id - 1] = b'<< /Type /Pages /Kids [%s] /Count %d >>' % (
+            b' '.join(b'%d 0 R' % page_id for page_id in page_ids), len(page_ids))
+        info_id = add(b'<< /Title (%s) /Producer (Invoice Generator) >>' % _escape(title))
+
+        output = bytearray(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+        offsets = []
+        for object_id, body in enumerate(objects, start=1):
+            offsets.append(len(output))
+            output += b'%d 0 obj\n%s\nendobj\n' % (object_id, body)
+
+        xref_offset = len(output)
+        output += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1)
+        for offset in offsets:
+            output += b'%010d 00000 n \n' % offset
+        output += b'trailer\n<< /Size %d /Root %d 0 R /Info %d 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (
+            len(objects) + 1, catalog_id, info_id, xref_offset)
+        return bytes(output)
@@ -0,0 +1,133 @@
+"""
+In-memory cache of rendered documents for the Invoice Generator application.
+
+Issued invoices do not change, so their rendered HTML is kept in a
+size-bounded LRU cache together with a strong ETag (a hash of the content).
+Entries are keyed by database, document number and a hash of the issuer
+data, and are dropped when the document is deleted or the clients and
+services it prints are edited.
+"""
+import hashlib
+import json
+import threading
+from collections import OrderedDict, namedtuple
+
+# Size bounds of the rendered invoice cache
+INVOICE_CACHE_MAX_ENTRIES = 256
+INVOICE_CACHE_MAX_BYTES = 16 * 1024 * 1024
+
+CachedDocument = namedtuple('CachedDocument', ['body', 'etag'])
+
+def make_etag(body):
+    """Get a strong ETag (unquoted content hash) for a rendered document"""
+    return hashlib.sha256(body.encode('utf-8')).hexdigest()[:32]
+
+def hash_data(data):
+    """Get a stable hash of JSON-serializable data, used to key entries on the issuer"""
+    return hashlib.sha256(json.dumps(data, sort_keys=True, default=str).encode('utf-8')).hexdigest()[:16]
+
+class RenderCache:
+    """Thread-safe LRU cache of rendered documents bounded by entry count and total size"""
+
+    def __init__(self, max_entries, max_bytes):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> CachedDocument
+        self._size = 0
+        self._lock = threading.Lock()
+        self._generation = 0
+
+    @property
+    def generation(self):
+        """
+        Counter bumped by every invalidation.
+
+        Read it before loading the data to render and pass it to put(), so a
+        document rendered from data invalidated meanwhile is not stored.
+        """
+        return self._generation
+
+    def get(self, key):
+        """Get a cached document and mark it as recently used; returns None on a miss"""
+        with self._lock:
+            document = self._entries.get(key)
+            if document is not None:
+                self._entries.move_to_end(key)
+            return document
+
+    def put(self, key, body, generation=None):
+        """
+        Store a rendered document, evicting the least recently used ones.
+
+        Returns:
+            CachedDocument: The document with its ETag (stored or not)
+        """
+        document = CachedDocument(body, make_etag(body))
+        size = len(body)
+        if size > self.max_bytes:
+            return document
+
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return document
+
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= len(previous.body)
+            self._entries[key] = document
+            self._size += size
+
+            while len(self._entries) > self.max_entries or self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted.body)
+        return document
+
+    def invalidate(self, match=None):
+        """
+        Drop cached documents.
+
+        Args:
+            match (callable): Predicate on the key; drops everything if None
+        """
+        with self._lock:
+            self._generation += 1
+            if match is None:
+                self._entries.clear()
+                self._size = 0
+                return
+            for key in [key for key in self._entries if match(key)]:
+                self._size -= len(self._entries.pop(key).body)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# Rendered invoice pages, keyed by (db path, invoice number, issuer hash)
+invoice_cache = RenderCache(INVOICE_CACHE_MAX_ENTRIES, INVOICE_CACHE_MAX_BYTES)
+
+_issuer_lock = threading.Lock()
+_issuer_hash = None
+
+def get_invoice_cache_key(db_path, invoice_number, issuer):
+    """
+    Get the cache key of a rendered invoice.
+
+    When the issuer data changes, renderings made with the previous issuer
+    are dropped rather than left to age out of the LRU.
+    """
+    global _issuer_hash
+    issuer_hash = hash_data(issuer)
+    with _issuer_lock:
+        if issuer_hash != _issuer_hash:
+            if _issuer_hash is not None:
+                invoice_cache.invalidate(lambda key: key[2] != issuer_hash)
+            _issuer_hash = issuer_hash
+    return (db_path, invoice_number, issuer_hash)
+
+def invalidate_invoice(invoice_number):
+    """Drop every cached rendering of an invoice"""
+    invoice_cache.invalidate(lambda key: key[1] == invoice_number)
+
+def invalidate_invoices():
+    """Drop all cached invoices (e.g. after a client or service they print changed)"""
+    invoice_cache.invalidate()
@@ -1,18 +1,70 @@
 """
 Route definitions for the Invoice Generator application.
 """
-from flask import render_template, request, jsonify, redirect, flash, url_for
+import os
+from flask import render_template, request, jsonify, redirect, flash, url_for, make_response, send_file, Response
 from datetime import datetime
 from src import models
 from src import utils
+from src import render_cache
 from src.finance import finance_routes
 from src.models import estimates as estimate_models # Added import for estimates
+from src.models import billing as billing_models
+from src.models import db as db_models
+from src.models import exports as export_models
+from src.models.invoices import INVOICE_LIST_COLUMNS
+from src.models.queries import DEFAULT_PAGE_SIZE
+from src.pdf import service as pdf_service
 from src.utils import (
     validate_form_fields, validate_and_convert_quantity,
     validate_and_convert_irpf_rate, handle_validation_error,
     format_date_for_display
 )
 
+def get_listing_query(default_year):
+    """Get the filter and sort parameters of a listing request (everything but the page cursor)"""
+    query = {key: value for key, value in request.args.items() if key != 'after' and value}
+    query.setdefault('year', default_year)
+    return query
+
+def render_invoice(invoice_data, issuer):
+    """Render the invoice page of an InvoiceRecord"""
+    currency_code, currency_symbol = models.get_invoice_currency(invoice_data)
+
+    return render_template('invoice.html',
+                          client=invoice_data.client,
+                          service=invoice_data.service,
+                          quantity=invoice_data.quantity,
+                          date=format_date_for_display(invoice_data.date),
+                          invoice_number=invoice_data.invoice_number,
+                          subtotal=invoice_data.subtotal,
+                          iva=invoice_data.iva_amount,
+                          irpf=invoice_data.irpf_amount,
+                          total=invoice_data.total_amount,
+                          currency_code=currency_code,
+                          currency_symbol=currency_symbol,
+                          issuer=issuer)
+
+def get_estimate_view(estimate_data, currency_symbol):
+    """Get the fields estimate_detail.html shows from a get_estimate_by_number row"""
+    subtotal = estimate_data['subtotal'] or 0
+    return dict(estimate_data,
+                valid_until=estimate_data['valid_until_date'],
+                service_name=estimate_data['service_description'],
+                unit_price=estimate_data['service_unit_price'],
+                total_amount=estimate_data['total'],
+                currency_symbol=currency_symbol,
+                apply_iva=bool(estimate_data['iva_amount']),
+                iva_rate=estimate_data['iva_amount'] / subtotal if subtotal else 0,
+                apply_irpf=bool(estimate_data['irpf_amount']))
+
+def export_job_status(job):
+    """Get the public fields of an export job, with its status and download URLs"""
+    status = {key: value for key, value in job.items() if key != 'path'}
+    status['status_url'] = url_for('api_export_status', job_id=job['id'])
+    status['download_url'] = url_for('api_export_download', job_id=job['id']) if job['status'] == 'done' else None
+    return status
+
 def register_routes(app):
     """Register all application routes"""
 
@@ -24,11 +76,10 @@ def register_routes(app):
         """Main page with the invoice generation form"""
         clients = models.get_clients()
         services = models.get_services()
-        config = utils.load_config()
-
-        # Get last selections from config
-        last_client_id = config.get('preferences', {}).get('last_client_id')
-        last_service_id = config.get('preferences', {}).get('last_service_id')
+        # Get last selections from the stored preferences
+        preferences = models.get_preferences()
+        last_client_id = preferences.get('last_client_id')
+        last_service_id = preferences.get('last_service_id')
 
         # Get recent invoices (now includes currency_symbol at index 10)
         recent_invoices = models.get_recent_invoices(5) # Limit to 5 for main page
@@ -47,7 +98,7 @@ def register_routes(app):
                               last_service_id=last_service_id,
                               recent_invoices=recent_invoices,
                               recent_estimates=recent_estimates, # Pass recent estimates
-                              currency_symbol=config.get('currency', {}).get('symbol', '€'),
+                              currency_symbol=utils.get_default_currency().symbol,
                               current_page=current_page,
                               today_date=today_date)
 
@@ -107,31 +158,27 @@ def register_routes(app):
         apply_iva = request.form.get('apply_iva') == '1'  # Checkbox for IVA
         apply_irpf = request.form.get('apply_irpf') == '1'  # Checkbox for IRPF
 
-        # Handle invoice date
-        invoice_date = request.form.get('invoice_date')
-        if invoice_date:
-            formatted_date = format_date_for_display(invoice_date)
-        else:
-            formatted_date = datetime.now().strftime('%d/%m/%Y')
+        # Handle invoice date (stored as ISO YYYY-MM-DD, displayed as DD/MM/YYYY)
+        invoice_date = utils.to_iso_date(request.form.get('invoice_date') or datetime.now())
+        formatted_date = format_date_for_display(invoice_date)
 
         client = models.get_client(int(client_id))
         service = models.get_service(int(service_id))
 
+        if not client or not service:
+            return handle_validation_error('Invalid client or service selected.')
+
         # Get currency from client if available, otherwise use default from config
-        config = utils.load_config()
         if len(client) > 6 and client[6]:  # Client has currency_code
             currency_code = client[6]
             currency_symbol = client[7] if len(client) > 7 and client[7] else '$' if currency_code == 'USD' else '€'
         else:
-            currency_code = config.get('currency', {}).get('code', 'EUR')
-            currency_symbol = config.get('currency', {}).get('symbol', '€')
+            currency_code, currency_symbol = utils.get_default_currency()
 
-        # Save last selections to config
-        config['preferences']['last_client_id'] = int(client_id)
-        config['preferences']['last_service_id'] = int(service_id)
-        utils.save_config(config)
+        # Remember last selections (written in the background)
+        models.set_preferences(last_client_id=int(client_id), last_service_id=int(service_id))
 
-        invoice_number = models.generate_invoice_number(int(client_id))
+        invoice_number = models.generate_invoice_number(int(client_id), client_name=client[1])
 
         # Calculate totals
         totals = utils.calculate_invoice_totals(
@@ -141,19 +188,23 @@ def register_routes(app):
             apply_irpf
         )
 
-        # Save the invoice to database with tax preferences
+        # Save the invoice to database with tax preferences, reusing the rows and
+        # totals we already have; the request session commits it all at once
         models.save_invoice(
             int(client_id),
             int(service_id),
             int(quantity),
-            formatted_date,
+            invoice_date,
             invoice_number,
             apply_iva,
-            apply_irpf
+            apply_irpf,
+            client=client,
+            service=service,
+            totals=totals
         )
 
         # Get issuer data from config
-        issuer = config.get('issuer', {})
+        issuer = utils.get_issuer()
 
         return render_template('invoice.html',
                                client=client,
@@ -169,6 +220,20 @@ def register_routes(app):
                                currency_symbol=currency_symbol,
                                issuer=issuer)
 
+    @app.route('/api/invoices/bulk', methods=['POST'])
+    def api_generate_invoices_bulk():
+        """Create many invoices in one transaction (month-end billing runs)"""
+        data = request.get_json(silent=True)
+        items = data.get('items') if isinstance(data, dict) else data
+        if not isinstance(items, list):
+            return jsonify({'error': 'Expected a JSON list of invoice items or {"items": [...]}'}), 400
+
+        try:
+            report = billing_models.generate_invoices_bulk(items)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        return jsonify(report)
+
     @app.route('/generate_estimate', methods=['POST'])
     def generate_estimate():
         """Generate estimate based on form data"""
@@ -203,13 +268,8 @@ def register_routes(app):
             flash('Invalid client or service selected.', 'error')
             return redirect(request.referrer or '/')
 
-        config = utils.load_config()
-        # Save last selections to config
-        if 'preferences' not in config:
-            config['preferences'] = {}
-        config['preferences']['last_client_id'] = int(client_id)
-        config['preferences']['last_service_id'] = int(service_id)
-        utils.save_config(config)
+        # Remember last selections (written in the background)
+        models.set_preferences(last_client_id=int(client_id), last_service_id=int(service_id))
 
         # Generate estimate number with proper date object
         issue_date_obj = datetime.strptime(estimate_date_str, '%Y-%m-%d')
@@ -230,6 +290,7 @@ def register_routes(app):
 
         if not estimate_id:
             flash('Failed to save estimate.', 'error')
+            db_models.mark_session_failed()
             return redirect(request.referrer or '/')
 
         # Fetch the full estimate details to render the page
@@ -237,16 +298,17 @@ def register_routes(app):
         estimate_data = estimate_models.get_estimate_by_number(estimate_number)
         if not estimate_data:
             flash('Failed to retrieve estimate after saving.', 'error')
+            db_models.mark_session_failed()
             return redirect(request.referrer or '/')
             
-        issuer = config.get('issuer', {})
+        issuer = utils.get_issuer()
         
         # Determine currency symbol from client or default
-        currency_symbol = client[7] if client and len(client) > 7 and client[7] else config.get('currency', {}).get('symbol', '€')
+        currency_symbol = client[7] if client and len(client) > 7 and client[7] else utils.get_default_currency().symbol
 
 
-        # The 'estimate_detail.html' template will be created in the next step
         return render_template('estimate_detail.html', 
+                               estimate=get_estimate_view(estimate_data, currency_symbol),
                                estimate_data=estimate_data,
                                client=models.get_client(estimate_data['client_id']), # Fetch full client for template
                                service=models.get_service(estimate_data['service_id']), # Fetch full service for template
@@ -256,62 +318,27 @@ def register_routes(app):
 
     @app.route('/view_invoice/<invoice_number>')
     def view_invoice(invoice_number):
-        """View a specific invoice by its number"""
-        invoice_data = models.get_invoice_by_number(invoice_number)
-
-        if not invoice_data:
-            return "Invoice not found", 404
-
-        # Get client data
-        client = invoice_data['client']
-
-        # Get currency from client if available, otherwise use default from config
-        config = utils.load_config()
-        if client and len(client) > 6 and client[6]:  # Client has currency_code
-            currency_code = client[6]
-            currency_symbol = client[7] if len(client) > 7 and client[7] else '$' if currency_code == 'USD' else '€'
+        """View a specific invoice by its number, served from the rendered invoice cache when possible"""
+        issuer = utils.get_issuer()
+        cache_key = render_cache.get_invoice_cache_key(db_models.DB_FILE, invoice_number, issuer)
+        document = render_cache.invoice_cache.get(cache_key)
+
+        if document is None:
+            generation = render_cache.invoice_cache.generation
+            invoice_data = models.get_invoice_by_number(invoice_number)
+            if not invoice_data:
+                return "Invoice not found", 404
+            body = render_invoice(invoice_data, issuer)
+            document = render_cache.invoice_cache.put(cache_key, body, generation)
+
+        # Clients revalidate every view; unchanged invoices get an empty 304
+        if request.if_none_match.contains(document.etag):
+            response = make_response('', 304)
         else:
-            currency_code = config.get('currency', {}).get('code', 'EUR')
-            currency_symbol = config.get('currency', {}).get('symbol', '€')
-
-        # Get issuer data from config
-        issuer = config.get('issuer', {})
-
-        # Calculate totals
-        service = invoice_data['service']
-        quantity = invoice_data['quantity']
-
-        # Make sure we're using the correct price from the service
-        if service and len(service) > 2:
-            unit_price = service[2]
-            totals = utils.calculate_invoice_totals(
-                unit_price,
-                quantity,
-                invoice_data['apply_iva'],
-                invoice_data['apply_irpf']
-            )
-        else:
-            # Fallback if service data is incomplete
-            totals = {
-                'subtotal': 0,
-                'iva': 0,
-                'irpf': 0,
-                'total': 0
-            }
-
-        return render_template('invoice.html',
-                              client=client,
-                              service=service,
-                              quantity=quantity,
-                              date=invoice_data['date'],
-                              invoice_number=invoice_data['invoice_number'],
-                              subtotal=totals.get('subtotal', 0),
-                              iva=totals.get('iva_amount', 0),
-                              irpf=totals.get('irpf_amount', 0),
-                              total=totals.get('total', 0),
-                              currency_code=currency_code,
-                              currency_symbol=currency_symbol,
-                              issuer=issuer)
+            response = make_response(document.body)
+        response.set_etag(document.etag)
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
 
     @app.route('/estimate/<estimate_number>')
     def view_estimate(estimate_number):
@@ -325,14 +352,13 @@ def register_routes(app):
         client = models.get_client(estimate_data['client_id'])
         service = models.get_service(estimate_data['service_id'])
         
-        config = utils.load_config()
-        issuer = config.get('issuer', {})
+        issuer = utils.get_issuer()
         
         # Determine currency symbol from client or default
-        currency_symbol = client[7] if client and len(client) > 7 and client[7] else config.get('currency', {}).get('symbol', '€')
+        currency_symbol = client[7] if client and len(client) > 7 and client[7] else utils.get_default_currency().symbol
 
-        # 'estimate_detail.html' will be used here as well
         return render_template('estimate_detail.html',
+                               estimate=get_estimate_view(estimate_data, currency_symbol),
                                estimate_data=estimate_data,
                                client=client,
                                service=service,
@@ -341,20 +367,142 @@ def register_routes(app):
                                current_page='estimates')
 
 
+    @app.route('/view_invoice/<invoice_number>/pdf')
+    def invoice_pdf(invoice_number):
+        """Download an invoice as a PDF rendered on the server"""
+        path = pdf_service.get_invoice_pdf(invoice_number)
+        if not path:
+            return "Invoice not found", 404
+        return send_file(path, mimetype='application/pdf', download_name=f'{invoice_number}.pdf',
+                         as_attachment=request.args.get('download') == '1')
+
+    @app.route('/estimate/<estimate_number>/pdf')
+    def estimate_pdf(estimate_number):
+        """Download an estimate as a PDF rendered on the server"""
+        path = pdf_service.get_estimate_pdf(estimate_number)
+        if not path:
+            return "Estimate not found", 404
+        return send_file(path, mimetype='application/pdf', download_name=f'{estimate_number}.pdf',
+                         as_attachment=request.args.get('download') == '1')
+
+    @app.route('/api/exports/invoices', methods=['POST'])
+    def api_export_invoices():
+        """Start a background job rendering all invoices of a month into a zip of PDFs"""
+        data = request.get_json(silent=True) or request.form
+        try:
+            job = pdf_service.start_month_export(data.get('year'), data.get('month'))
+        except (TypeError, ValueError):
+            return jsonify({'error': 'Expected a valid year and month (1-12)'}), 400
+        return jsonify(export_job_status(job)), 202
+
+    @app.route('/api/exports/<job_id>')
+    def api_export_status(job_id):
+        """Get the progress of a month export job"""
+        job = pdf_service.get_export_job(job_id)
+        if not job:
+            return jsonify({'error': 'Unknown export job'}), 404
+        return jsonify(export_job_status(job))
+
+    @app.route('/api/exports/<job_id>/download')
+    def api_export_download(job_id):
+        """Download the zip file of a finished month export job"""
+        job = pdf_service.get_export_job(job_id)
+        if not job:
+            return jsonify({'error': 'Unknown export job'}), 404
+        if job['status'] != 'done':
+            return jsonify(export_job_status(job)), 409
+        if not os.path.exists(job['path']):
+            return jsonify({'error': 'The export has expired; start it again'}), 410
+        return send_file(job['path'], mimetype='application/zip', as_attachment=True,
+                         download_name=f"invoices-{job['year']:04d}-{job['month']:02d}.zip")
+
+    @app.route('/export/<kind>.<export_format>')
+    def export_data(kind, export_format):
+        """Stream invoices, expenses or incomes as CSV or XLSX (filtered by year and, for invoices, the listing filters)"""
+        if kind not in export_models.EXPORTS or export_format not in export_models.EXPORT_FORMATS:
+            return "Unknown export", 404
+
+        filters = {key: value for key, value in request.args.items() if value}
+        try:
+            if export_format == 'csv':
+                chunks = export_models.iter_csv(kind, filters)
+                mimetype = 'text/csv'
+            else:
+                chunks = export_models.iter_xlsx(kind, filters)
+                mimetype = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        filename = f"{kind}-{filters.get('year', 'all')}.{export_format}"
+        return Response(chunks, mimetype=mimetype,
+                        headers={'Content-Disposition': f'attachment; filename="{filename}"'})
+
     @app.route('/estimates')
     def list_estimates():
-        """List all estimates"""
-        # For now, using get_recent_estimates. Later, a dedicated get_all_estimates might be needed.
-        estimates_list = estimate_models.get_recent_estimates(limit=100) # Get up to 100 recent estimates
-        config = utils.load_config()
-        default_currency_symbol = config.get('currency', {}).get('symbol', '€')
-        
-        # 'all_estimates.html' will be created in a future step
+        """List estimates with server-side filtering, sorting and pagination"""
+        # Get year parameter, default to current year
+        selected_year = request.args.get('year', datetime.now().year, type=int)
+
+        # Filters, sort and page come from the query string
+        query = get_listing_query(selected_year)
+        page_size = request.args.get('page_size', DEFAULT_PAGE_SIZE, type=int)
+        after = request.args.get('after')
+
+        try:
+            estimates_list, next_cursor = estimate_models.list_estimates(
+                query, query.get('sort'), query.get('direction'), page_size, after)
+            summary = estimate_models.summarize_estimates(query)
+        except ValueError as e:
+            flash(str(e), 'error')
+            return redirect(url_for('list_estimates', year=selected_year))
+
+        available_years = estimate_models.get_available_estimate_years()
+        if not available_years:
+            available_years = [datetime.now().year]
+
+        default_currency_symbol = utils.get_default_currency().symbol
+        months = {f'{month:02d}': datetime(2000, month, 1).strftime('%B') for month in range(1, 13)}
+
         return render_template('all_estimates.html', 
                                estimates=estimates_list, 
+                               total_estimates=summary['count'],
+                               estimates_by_status=summary['by_status'],
+                               unique_clients=summary['unique_clients'],
+                               client_names=estimate_models.get_estimate_client_names(selected_year),
+                               statuses=estimate_models.ESTIMATE_STATUSES,
+                               months=months,
+                               filters=query,
+                               first_page_url=url_for('list_estimates', **query) if after else None,
+                               next_page_url=url_for('list_estimates', after=next_cursor, **query) if next_cursor else None,
+                               available_years=available_years,
+                               selected_year=selected_year,
                                default_currency_symbol=default_currency_symbol,
                                current_page='estimates')
 
+    @app.route('/api/estimates')
+    def api_estimates():
+        """Get a filtered, sorted page of estimates as JSON, with the totals of all matches"""
+        query = get_listing_query(datetime.now().year)
+        page_size = request.args.get('page_size', DEFAULT_PAGE_SIZE, type=int)
+        after = request.args.get('after')
+
+        try:
+            estimates_list, next_cursor = estimate_models.list_estimates(
+                query, query.get('sort'), query.get('direction'), page_size, after)
+            summary = estimate_models.summarize_estimates(query)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        return jsonify({
+            'estimates': estimates_list,
+            'next_cursor': next_cursor,
+            'total_estimates': summary['count'],
+            'total_amount': summary['total_amount'],
+            'unique_clients': summary['unique_clients'],
+            'estimates_by_status': summary['by_status'],
+            'year': query.get('year')
+        })
+
     @app.route('/delete_invoice/<invoice_number>')
     def delete_invoice(invoice_number):
         """Delete a specific invoice by its number"""
@@ -374,6 +522,7 @@ def register_routes(app):
             flash(f'Estimate {estimate_number} deleted successfully.', 'success')
         else:
             flash(f'Error deleting estimate {estimate_number}.', 'error')
+            db_models.mark_session_failed()
         
         # Redirect to the main page or a dedicated estimates list page
         return redirect(request.referrer or url_for('index'))
@@ -527,6 +676,14 @@ def register_routes(app):
             'year': year
         })
 
+    @app.route('/api/dashboard_data')
+    def api_dashboard_data():
+        """Get the data for every dashboard chart in one response"""
+        # Get year parameter, default to current year
+        year = request.args.get('year', datetime.now().year)
+
+        return jsonify(models.get_dashboard_stats(year))
+
     @app.route('/dashboard')
     def dashboard():
         """Dashboard page with charts and statistics"""
@@ -541,17 +698,10 @@ def register_routes(app):
         # Get basic statistics
         clients = models.get_clients()
 
-        # Get invoices for the selected year
-        year_invoices = models.get_invoices_by_year(selected_year)
-
-        # Calculate total invoices
-        total_invoices = len(year_invoices)
-
-        # Calculate total revenue
-        total_revenue = 0
-        for invoice in year_invoices:
-            subtotal = invoice[6]  # subtotal is at index 6
-            total_revenue += subtotal
+        # Get invoice count and revenue for the selected year from the monthly rollup
+        year_totals = models.get_dashboard_stats(selected_year)['totals']
+        total_invoices = year_totals['invoices']
+        total_revenue = year_totals['revenue']
 
         # Get total clients
         total_clients = len(clients)
@@ -560,8 +710,7 @@ def register_routes(app):
         current_month = datetime.now().strftime('%B %Y')
 
         # Get default currency symbol
-        config = utils.load_config()
-        currency_symbol = config.get('currency', {}).get('symbol', '€')
+        currency_symbol = utils.get_default_currency().symbol
 
         # Get current page for navbar highlighting
         current_page = 'dashboard'
@@ -578,40 +727,69 @@ def register_routes(app):
 
     @app.route('/all_invoices')
     def all_invoices():
-        """Show all invoices with filtering options"""
+        """Show all invoices with server-side filtering, sorting and pagination"""
         # Get year parameter, default to current year
-        selected_year = request.args.get('year', datetime.now().year)
+        selected_year = request.args.get('year', datetime.now().year, type=int)
+
+        # Filters, sort and page come from the query string
+        query = get_listing_query(selected_year)
+        page_size = request.args.get('page_size', DEFAULT_PAGE_SIZE, type=int)
+        after = request.args.get('after')
 
-        # Get all invoices for the selected year
-        all_invoices = models.get_invoices_by_year(selected_year)
+        try:
+            invoices, next_cursor = models.list_invoices(query, query.get('sort'), query.get('direction'), page_size, after)
+            summary = models.summarize_invoices(query)
+        except ValueError as e:
+            flash(str(e), 'error')
+            return redirect(url_for('all_invoices', year=selected_year))
 
         # Get available years from the database
         available_years = models.get_available_invoice_years()
         if not available_years:
             available_years = [datetime.now().year]
 
-        # Calculate statistics
-        total_amount = sum(invoice[6] for invoice in all_invoices)
-        unique_clients = len(set(invoice[3] for invoice in all_invoices))
-        client_names = sorted(set(invoice[3] for invoice in all_invoices))
-
         # Get default currency symbol
-        config = utils.load_config()
-        currency_symbol = config.get('currency', {}).get('symbol', '€')
+        currency_symbol = utils.get_default_currency().symbol
 
         # Get current page for navbar highlighting
         current_page = 'all_invoices'
 
         return render_template('all_invoices.html',
-                              invoices=all_invoices,
-                              total_amount=total_amount,
-                              unique_clients=unique_clients,
-                              client_names=client_names,
+                              invoices=invoices,
+                              total_invoices=summary['count'],
+                              total_amount=summary['total_amount'],
+                              unique_clients=summary['unique_clients'],
+                              client_names=models.get_invoice_client_names(selected_year),
+                              filters=query,
+                              first_page_url=url_for('all_invoices', **query) if after else None,
+                              next_page_url=url_for('all_invoices', after=next_cursor, **query) if next_cursor else None,
                               available_years=available_years,
                               selected_year=selected_year,
                               currency_symbol=currency_symbol,
                               current_page=current_page)
 
+    @app.route('/api/invoices')
+    def api_invoices():
+        """Get a filtered, sorted page of invoices as JSON, with the totals of all matches"""
+        query = get_listing_query(datetime.now().year)
+        page_size = request.args.get('page_size', DEFAULT_PAGE_SIZE, type=int)
+        after = request.args.get('after')
+
+        try:
+            invoices, next_cursor = models.list_invoices(query, query.get('sort'), query.get('direction'), page_size, after)
+            summary = models.summarize_invoices(query)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        return jsonify({
+            'invoices': [dict(zip(INVOICE_LIST_COLUMNS, invoice)) for invoice in invoices],
+            'next_cursor': next_cursor,
+            'total_invoices': summary['count'],
+            'total_amount': summary['total_amount'],
+            'unique_clients': summary['unique_clients'],
+            'year': query.get('year')
+        })
+
     @app.route('/manage_clients')
     def manage_clients():
         """Manage clients page"""
@@ -685,8 +863,7 @@ def register_routes(app):
         services = models.get_services()
 
         # Get default currency symbol
-        config = utils.load_config()
-        currency_symbol = config.get('currency', {}).get('symbol', '€')
+        currency_symbol = utils.get_default_currency().symbol
 
         # Get current page for navbar highlighting
         current_page = 'manage_services'
@@ -2,15 +2,38 @@
 Utility functions for the Invoice Generator application.
 """
 import os
+import copy
 import json
-from datetime import datetime
+import stat
+import tempfile
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime, date
 from flask import flash, redirect, request
 
 # Configuration file
 CONFIG_FILE = 'config.json'
 
-def load_config():
-    """Load configuration from config.json file"""
+# Seconds between checks of config.json for changes made outside the app
+CONFIG_CHECK_INTERVAL = 1.0
+
+TaxRates = namedtuple('TaxRates', ['iva', 'irpf'])
+Currency = namedtuple('Currency', ['code', 'symbol'])
+
+_config_cache = {'config': None, 'signature': None, 'checked_at': 0.0}
+_config_lock = threading.Lock()
+
+def _get_config_signature():
+    """Identify the current config file version by path, inode, mtime and size"""
+    try:
+        st = os.stat(CONFIG_FILE)
+    except OSError:
+        return None
+    return (CONFIG_FILE, st.st_ino, st.st_mtime_ns, st.st_size)
+
+def _read_config_file():
+    """Read config.json from disk, falling back to the default configuration"""
     if os.path.exists(CONFIG_FILE):
         try:
             with open(CONFIG_FILE, 'r') as f:
@@ -18,7 +41,59 @@ def load_config():
         except Exception as e:
             print(f"Error loading config: {e}")
 
-    # Default configuration if file doesn't exist or has errors
+    return get_default_config()
+
+def _get_cached_config():
+    """Return the shared cached configuration, re-reading the file only if it changed.
+
+    The returned dict must not be modified; use load_config() for a private copy.
+    """
+    now = time.monotonic()
+    with _config_lock:
+        cached = _config_cache['config']
+        if cached is not None and now - _config_cache['checked_at'] < CONFIG_CHECK_INTERVAL:
+            return cached
+
+        signature = _get_config_signature()
+        if cached is None or signature != _config_cache['signature']:
+            cached = _read_config_file()
+            _config_cache['config'] = cached
+            _config_cache['signature'] = signature
+        _config_cache['checked_at'] = now
+        return cached
+
+def reset_config_cache():
+    """Drop the cached configuration so the next read goes to disk"""
+    with _config_lock:
+        _config_cache.update(config=None, signature=None, checked_at=0.0)
+
+def load_config():
+    """Load configuration from the in-process cache of config.json.
+
+    Returns a copy, so callers can modify it and pass it to save_config.
+    """
+    return copy.deepcopy(_get_cached_config())
+
+def get_tax_rates():
+    """Get the default IVA and IRPF rates as a TaxRates(iva, irpf) tuple"""
+    tax_rates = _get_cached_config().get('tax_rates', {})
+    return TaxRates(tax_rates.get('default_iva', 0.21), tax_rates.get('default_irpf', 0.15))
+
+def get_default_currency():
+    """Get the default currency as a Currency(code, symbol) tuple"""
+    currency = _get_cached_config().get('currency', {})
+    return Currency(currency.get('code', 'EUR'), currency.get('symbol', '€'))
+
+def get_numbering():
+    """Get a copy of the document number templates (see src.models.sequences)"""
+    return dict(_get_cached_config().get('numbering', {}))
+
+def get_issuer():
+    """Get a copy of the issuer data printed on invoices and estimates"""
+    return dict(_get_cached_config().get('issuer', {}))
+
+def get_default_config():
+    """Default configuration if the file doesn't exist or has errors"""
     return {
         "currency": {
             "code": "EUR",
@@ -35,26 +110,50 @@ def load_config():
             "bank_iban": "ES29 0182 4919 7502 0158 2010",
             "bank_name": "BBVA"
         },
-        "preferences": {
-            "last_client_id": None,
-            "last_service_id": None
-        },
         # Added default tax rates here for central management
         "tax_rates": {
             "default_iva": 0.21,
             "default_irpf": 0.15 
+        },
+        # Document number templates (fields: period, prefix, seq)
+        "numbering": {
+            "invoice_format": "{period}-{prefix}-{seq}",
+            "estimate_format": "{period}-P{seq:03d}"
         }
     }
 
 def save_config(config):
-    """Save configuration to config.json file"""
+    """Save configuration to config.json atomically and update the cache.
+
+    The file is written to a temporary file in the same directory and renamed
+    over config.json, so readers never see a partially written file.
+    """
+    config_dir = os.path.dirname(os.path.abspath(CONFIG_FILE))
+    temp_path = None
     try:
-        with open(CONFIG_FILE, 'w') as f:
+        fd, temp_path = tempfile.mkstemp(dir=config_dir, prefix='.config-', suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
             json.dump(config, f, indent=4)
+            f.flush()
+            os.fsync(f.fileno())
+
+        # Keep the permissions of the file being replaced
+        if os.path.exists(CONFIG_FILE):
+            os.chmod(temp_path, stat.S_IMODE(os.stat(CONFIG_FILE).st_mode))
+        os.replace(temp_path, CONFIG_FILE)
+        temp_path = None
+
+        with _config_lock:
+            _config_cache['config'] = copy.deepcopy(config)
+            _config_cache['signature'] = _get_config_signature()
+            _config_cache['checked_at'] = time.monotonic()
         return True
     except Exception as e:
         print(f"Error saving config: {e}")
         return False
+    finally:
+        if temp_path and os.path.exists(temp_path):
+            os.remove(temp_path)
 
 def calculate_financials(subtotal, iva_rate, irpf_rate):
     """
@@ -84,14 +183,12 @@ def calculate_invoice_totals(service_price, quantity, apply_iva=True, apply_irpf
     This function might be refactored or deprecated if invoice creation
     logic is updated to use calculate_financials more directly with rates from config.
     """
-    config = load_config()
-    default_iva = config.get('tax_rates', {}).get('default_iva', 0.21)
-    default_irpf = config.get('tax_rates', {}).get('default_irpf', 0.15)
+    tax_rates = get_tax_rates()
 
     subtotal = service_price * quantity
     
-    current_iva_rate = default_iva if apply_iva else 0
-    current_irpf_rate = default_irpf if apply_irpf else 0
+    current_iva_rate = tax_rates.iva if apply_iva else 0
+    current_irpf_rate = tax_rates.irpf if apply_irpf else 0
     
     return calculate_financials(subtotal, current_iva_rate, current_irpf_rate)
 
@@ -179,3 +276,22 @@ def format_date_for_display(date_str, input_format='%Y-%m-%d', output_format='%d
         return date_obj.strftime(output_format)
     except (ValueError, TypeError):
         return date_str
+
+def to_iso_date(value):
+    """
+    Normalize a date to the ISO YYYY-MM-DD format used for storage.
+
+    Args:
+        value: date/datetime object or string (YYYY-MM-DD, DD/MM/YYYY or DD-MM-YYYY)
+
+    Returns:
+        str: ISO date string, or the original value if it cannot be parsed
+    """
+    if isinstance(value, (datetime, date)):
+        return value.strftime('%Y-%m-%d')
+    for input_format in ('%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y'):
+        try:
+            return datetime.strptime(str(value).strip()[:10], input_format).strftime('%Y-%m-%d')
+        except (ValueError, TypeError):
+            continue
+    return value
@@ -8,6 +8,29 @@ document.addEventListener('DOMContentLoaded', function() {
   initializeCharts();
 });
 
+let dashboardDataRequest = null;
+
+/**
+ * Fetch the data for every dashboard chart with a single request.
+ * The promise is shared, so each chart reuses the same response.
+ */
+function getDashboardData() {
+  if (!dashboardDataRequest) {
+    // Get current year from URL or use current year
+    const urlParams = new URLSearchParams(window.location.search);
+    const year = urlParams.get('year') || new Date().getFullYear();
+
+    dashboardDataRequest = fetch(`/api/dashboard_data?year=${year}`)
+      .then(response => {
+        if (!response.ok) {
+          throw new Error(`Dashboard data request failed with status ${response.status}`);
+        }
+        return response.json();
+      });
+  }
+  return dashboardDataRequest;
+}
+
 /**
  * Initialize all charts if their containers exist
  */
@@ -29,15 +52,10 @@ function initializeCharts() {
  * Initialize the main invoice chart (monthly invoices)
  */
 function initializeInvoiceChart() {
-  // Get current year from URL or use current year
-  const urlParams = new URLSearchParams(window.location.search);
-  const year = urlParams.get('year') || new Date().getFullYear();
-
-  // Fetch data from the server
-  fetch(`/api/invoice_stats?year=${year}`)
-    .then(response => response.json())
+  // Fetch data from the server (shared with the other dashboard charts)
+  getDashboardData()
     .then(data => {
-      renderInvoiceChart(data);
+      renderInvoiceChart(data.invoice_stats);
     })
     .catch(error => {
       console.error('Error fetching invoice stats:', error);
@@ -163,15 +181,10 @@ function renderInvoiceChart(data) {
  * Initialize the revenue chart
  */
 function initializeRevenueChart() {
-  // Get current year from URL or use current year
-  const urlParams = new URLSearchParams(window.location.search);
-  const year = urlParams.get('year') || new Date().getFullYear();
-
-  // Fetch data from the server
-  fetch(`/api/revenue_stats?year=${year}`)
-    .then(response => response.json())
+  // Fetch data from the server (shared with the other dashboard charts)
+  getDashboardData()
     .then(data => {
-      renderRevenueChart(data);
+      renderRevenueChart(data.revenue_stats);
     })
     .catch(error => {
       console.error('Error fetching revenue stats:', error);
@@ -283,15 +296,10 @@ function renderRevenueChart(data) {
  * Initialize the client distribution chart
  */
 function initializeClientDistributionChart() {
-  // Get current year from URL or use current year
-  const urlParams = new URLSearchParams(window.location.search);
-  const year = urlParams.get('year') || new Date().getFullYear();
-
-  // Fetch data from the server
-  fetch(`/api/client_stats?year=${year}`)
-    .then(response => response.json())
+  // Fetch data from the server (shared with the other dashboard charts)
+  getDashboardData()
     .then(data => {
-      renderClientDistributionChart(data);
+      renderClientDistributionChart(data.client_stats);
     })
     .catch(error => {
       console.error('Error fetching client stats:', error);
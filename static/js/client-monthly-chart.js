@@ -2,13 +2,19 @@
  * Initialize the client monthly chart
  */
 function initializeClientMonthlyChart() {
-  // Get current year from URL or use current year
-  const urlParams = new URLSearchParams(window.location.search);
-  const year = urlParams.get('year') || new Date().getFullYear();
+  // Reuse the dashboard data request made by charts.js when it is loaded
+  let request;
+  if (typeof getDashboardData === 'function') {
+    request = getDashboardData().then(data => data.client_monthly_stats);
+  } else {
+    // Get current year from URL or use current year
+    const urlParams = new URLSearchParams(window.location.search);
+    const year = urlParams.get('year') || new Date().getFullYear();
+
+    request = fetch(`/api/client_monthly_stats?year=${year}`).then(response => response.json());
+  }
 
-  // Fetch data from the server
-  fetch(`/api/client_monthly_stats?year=${year}`)
-    .then(response => response.json())
+  request
     .then(data => {
       renderClientMonthlyChart(data);
     })
@@ -0,0 +1,62 @@
+"""
+Functional tests for the categorization rules admin page.
+"""
+import unittest
+from tests.test_base import TestBase
+from src import create_app
+from src.finance.categorization_rules import get_categorization_rules
+from src.finance.category_matcher import match_expense_category
+
+
+class CategorizationRuleRouteTests(TestBase):
+    """Tests for /categorization_rules and the save and delete actions."""
+
+    def setUp(self):
+        """Set up a Flask test client."""
+        super().setUp()
+        self.app = create_app()
+        self.app.config['TESTING'] = True
+        self.client = self.app.test_client()
+
+    def test_page_lists_rules(self):
+        """Test that the page shows the seeded rules."""
+        # Act
+        response = self.client.get('/categorization_rules')
+
+        # Assert
+        self.assertEqual(response.status_code, 200)
+        html = response.get_data(as_text=True)
+        self.assertIn('Categorization Rules', html)
+        self.assertIn('ADESLAS', html)
+
+    def test_save_and_delete_rule(self):
+        """Test adding a rule from the form, using it, and deleting it."""
+        # Act
+        response = self.client.post('/save_categorization_rule', data={
+            'pattern': 'coworking', 'match_type': 'word', 'kind': 'expense', 'target_id': '1',
+            'priority': '1', 'tax_deductible': ''
+        })
+        rule = [rule for rule in get_categorization_rules('expense') if rule['pattern'] == 'coworking'][0]
+        category_id = match_expense_category('Cuota Coworking')
+        self.client.post('/delete_categorization_rule', data={'delete_id': str(rule['id'])})
+
+        # Assert
+        self.assertEqual(response.status_code, 302)
+        self.assertIsNone(rule['tax_deductible'])
+        self.assertEqual(category_id, 1)
+        self.assertEqual([r for r in get_categorization_rules() if r['pattern'] == 'coworking'], [])
+
+    def test_invalid_rule_is_reported(self):
+        """Test that an invalid regular expression is not saved."""
+        # Act
+        response = self.client.post('/save_categorization_rule', data={
+            'pattern': '(', 'match_type': 'regex', 'kind': 'expense', 'target_id': '1', 'priority': '1'
+        }, follow_redirects=True)
+
+        # Assert
+        self.assertIn('Error saving rule', response.get_data(as_text=True))
+        self.assertEqual([r for r in get_categorization_rules() if r['pattern'] == '('], [])
+
+
+if __name__ == '__main__':
+    unittest.main()
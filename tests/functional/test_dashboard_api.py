@@ -0,0 +1,48 @@
+"""
+Functional tests for the combined dashboard data endpoint.
+"""
+import unittest
+from tests.test_base import TestBase
+from src import create_app
+from src.models.invoices import save_invoice
+
+
+class DashboardDataApiTests(TestBase):
+    """Tests for /api/dashboard_data."""
+
+    def setUp(self):
+        """Set up a Flask test client and a few invoices."""
+        super().setUp()
+        self.app = create_app()
+        self.app.config['TESTING'] = True
+        self.client = self.app.test_client()
+        client_id = self.create_test_client()
+        service_id = self.create_test_service()
+        save_invoice(client_id, service_id, 1, '2025-01-10', 'D-1', apply_iva=False, apply_irpf=False)
+        save_invoice(client_id, service_id, 2, '2025-02-10', 'D-2', apply_iva=False, apply_irpf=False)
+
+    def test_dashboard_data_contains_every_chart(self):
+        """Test that one request returns the series for all dashboard charts."""
+        # Act
+        response = self.client.get('/api/dashboard_data?year=2025')
+
+        # Assert
+        self.assertEqual(response.status_code, 200)
+        data = response.get_json()
+        self.assertEqual(data['invoice_stats']['counts'][:3], [1, 1, 0])
+        self.assertEqual(data['revenue_stats']['amounts'][:2], [100.0, 200.0])
+        self.assertEqual(data['client_stats']['labels'], ['Test Client LLC'])
+        self.assertEqual(data['client_monthly_stats']['series'][0]['name'], 'Test Client LLC')
+
+    def test_dashboard_page_totals(self):
+        """Test that the dashboard page renders the yearly totals."""
+        # Act
+        response = self.client.get('/dashboard?year=2025')
+
+        # Assert
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'300.00', response.data)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+"""
+Functional tests for the streaming export endpoints.
+"""
+import unittest
+from tests.test_base import TestBase
+from src import create_app
+from src.finance.expenses import add_expense
+from src.models.invoices import save_invoice
+
+
+class ExportRouteTests(TestBase):
+    """Tests for /export/<kind>.<format>."""
+
+    def setUp(self):
+        """Set up a Flask test client with an invoice and an expense."""
+        super().setUp()
+        self.app = create_app()
+        self.app.config['TESTING'] = True
+        self.client = self.app.test_client()
+        client_id = self.create_test_client()
+        service_id = self.create_test_service()
+        save_invoice(client_id, service_id, 1, '2025-02-01', 'EXP-1', apply_iva=False, apply_irpf=False)
+        add_expense(1, 'Printer paper', 12.0, '2025-03-01')
+
+    def test_csv_download_is_streamed(self):
+        """Test the CSV export of invoices with listing filters."""
+        # Act
+        response = self.client.get('/export/invoices.csv?year=2025&client=Test Client LLC')
+
+        # Assert
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_streamed)
+        self.assertEqual(response.mimetype, 'text/csv')
+        self.assertIn('invoices-2025.csv', response.headers['Content-Disposition'])
+        self.assertIn('EXP-1', response.get_data(as_text=True))
+
+    def test_xlsx_download(self):
+        """Test the XLSX export of expenses."""
+        # Act
+        response = self.client.get('/export/expenses.xlsx?year=2025')
+
+        # Assert
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.get_data().startswith(b'PK'))
+
+    def test_invalid_exports(self):
+        """Test unknown exports and invalid filters."""
+        # Act / Assert
+        self.assertEqual(self.client.get('/export/payroll.csv').status_code, 404)
+        self.assertEqual(self.client.get('/export/invoices.pdf').status_code, 404)
+        self.assertEqual(self.client.get('/export/invoices.csv?year=abc').status_code, 400)
+
+    def test_pages_link_to_exports(self):
+        """Test the export links on the invoice and expense pages."""
+        # Act
+        invoices_page = self.client.get('/all_invoices?year=2025').get_data(as_text=True)
+        expenses_page = self.client.get('/expenses').get_data(as_text=True)
+
+        # Assert
+        self.assertIn('/export/invoices.xlsx', invoices_page)
+        self.assertIn('/export/expenses.csv', expenses_page)
+
+
+if __name__ == '__main__':
+    unittest.main()
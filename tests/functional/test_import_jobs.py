@@ -0,0 +1,190 @@
+"""
+Functional tests for background bank statement imports.
+"""
+import io
+import os
+import shutil
+import sqlite3
+import unittest
+from unittest.mock import patch
+from openpyxl import Workbook
+from tests.test_base import TestBase
+from src import create_app
+from src.finance.expenses import get_expenses
+from src.finance import import_jobs
+from src.finance.import_jobs import get_upload_dir, save_upload, shutdown_import_workers
+from src.models.db import get_db_connection
+
+
+class ImportJobTests(TestBase):
+    """Tests for /import_expenses uploads and /api/import_jobs/<id>."""
+
+    def setUp(self):
+        """Set up a Flask test client and a statement workbook."""
+        super().setUp()
+        self.app = create_app()
+        self.app.config['TESTING'] = True
+        self.client = self.app.test_client()
+
+        workbook = Workbook()
+        workbook.active.append(('Fecha', 'Concepto', 'Movimiento', 'Importe'))
+        workbook.active.append(('02/03/2025', 'Taxi aeropuerto', 'Pago con tarjeta', -25))
+        workbook.active.append(('03/03/2025', 'Factura cliente', 'Transferencia', 900))
+        buffer = io.BytesIO()
+        workbook.save(buffer)
+        self.statement = buffer.getvalue()
+
+    def tearDown(self):
+        """Wait for the import workers before the test database is removed."""
+        shutdown_import_workers()
+        # Failed jobs keep their uploads to be resumed
+        shutil.rmtree(get_upload_dir(), ignore_errors=True)
+        super().tearDown()
+
+    def test_upload_returns_immediately_and_job_completes(self):
+        """Test that an upload starts a job whose progress and result can be polled."""
+        # Act
+        response = self.client.post('/import_expenses', data={
+            'file': (io.BytesIO(self.statement), 'statement.xlsx'), 'default_category': '', 'default_source': ''
+        }, content_type='multipart/form-data')
+        job_id = response.headers['Location'].split('job=')[1]
+        shutdown_import_workers()
+        status = self.client.get(f'/api/import_jobs/{job_id}')
+        page = self.client.get(f'/import_expenses?job={job_id}')
+
+        # Assert
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(status.status_code, 200)
+        job = status.get_json()
+        self.assertEqual(job['status'], 'done')
+        self.assertEqual((job['rows_read'], job['expenses_imported'], job['incomes_imported']), (2, 1, 1))
+        self.assertEqual(job['filename'], 'statement.xlsx')
+        self.assertEqual(len(get_expenses()), 1)
+        self.assertEqual(os.listdir(get_upload_dir()), [])
+        self.assertIn('Importing statement.xlsx', page.get_data(as_text=True))
+        with get_db_connection() as conn:
+            stored = conn.execute('SELECT status, rows_read FROM import_jobs WHERE id = ?', (job_id,)).fetchone()
+        self.assertEqual(stored, ('done', 2))
+
+    def test_failed_import_is_reported(self):
+        """Test that an unreadable file ends the job as failed."""
+        # Act
+        response = self.client.post('/import_expenses', data={
+            'file': (io.BytesIO(b'not a workbook'), 'broken.xlsx')
+        }, content_type='multipart/form-data')
+        job_id = response.headers['Location'].split('job=')[1]
+        shutdown_import_workers()
+        job = self.client.get(f'/api/import_jobs/{job_id}').get_json()
+
+        # Assert
+        self.assertEqual(job['status'], 'failed')
+        self.assertTrue(job['errors'])
+        self.assertTrue(job['resumable'])
+
+    def test_upload_of_chosen_statement_format(self):
+        """Test that a CSV statement is imported with the format picked in the form."""
+        # Arrange
+        statement = b'Date;Description;Amount\n2025-03-02;Taxi aeropuerto;-25,00\n'
+
+        # Act
+        form = self.client.get('/import_expenses')
+        response = self.client.post('/import_expenses', data={
+            'file': (io.BytesIO(statement), 'movimientos.txt'), 'statement_format': 'csv'
+        }, content_type='multipart/form-data')
+        job_id = response.headers['Location'].split('job=')[1]
+        shutdown_import_workers()
+        job = self.client.get(f'/api/import_jobs/{job_id}').get_json()
+
+        # Assert
+        self.assertIn('<option value="norma43">Norma 43</option>', form.get_data(as_text=True))
+        self.assertEqual(job['status'], 'done')
+        self.assertEqual(job['expenses_imported'], 1)
+
+    def test_unsupported_file_is_rejected(self):
+        """Test that a file with an unsupported extension is not imported."""
+        # Act
+        response = self.client.post('/import_expenses', data={
+            'file': (io.BytesIO(b'%PDF-1.4'), 'statement.pdf')
+        }, content_type='multipart/form-data')
+
+        # Assert
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response.headers['Location'], '/expenses')
+
+    def test_failed_import_is_resumed_after_its_committed_rows(self):
+        """Test that a job stopped after its first batch keeps its file and finishes when resumed."""
+        # Arrange
+        import_statement = import_jobs.import_statement
+
+        def interrupted_import(path, checkpoint=None, **options):
+            def stop(conn, rows, *counters):
+                # Saves the progress of the second batch, then fails before it commits
+                checkpoint(conn, rows, *counters)
+                if rows == 2:
+                    raise sqlite3.OperationalError('database is locked')
+            return import_statement(path, batch_size=1, checkpoint=stop, **options)
+
+        with patch('src.finance.import_jobs.import_statement', side_effect=interrupted_import):
+            response = self.client.post('/import_expenses', data={
+                'file': (io.BytesIO(self.statement), 'statement.xlsx')
+            }, content_type='multipart/form-data')
+            job_id = response.headers['Location'].split('job=')[1]
+            shutdown_import_workers()
+        failed = self.client.get(f'/api/import_jobs/{job_id}').get_json()
+
+        # Act
+        self.client.post(f'/import_jobs/{job_id}/resume')
+        shutdown_import_workers()
+        resumed = self.client.get(f'/api/import_jobs/{job_id}').get_json()
+
+        # Assert
+        self.assertEqual((failed['status'], failed['rows_read'], failed['expenses_imported']), ('failed', 1, 1))
+        self.assertTrue(failed['resumable'])
+        self.assertEqual(resumed['status'], 'done')
+        self.assertEqual((resumed['rows_read'], resumed['expenses_imported'], resumed['incomes_imported']),
+                         (2, 1, 1))
+        self.assertFalse(resumed['resumable'])
+        self.assertEqual(len(get_expenses()), 1)
+        self.assertEqual(os.listdir(get_upload_dir()), [])
+
+    def test_jobs_left_running_are_marked_failed_at_start(self):
+        """Test that creating the app marks the jobs of a crashed process as interrupted."""
+        # Arrange
+        with get_db_connection() as conn:
+            conn.execute('''
+            INSERT INTO import_jobs (id, filename, status, created_at) VALUES ('stale', 'old.xlsx', 'running', '2025-01-01')
+            ''')
+            conn.commit()
+
+        # Act
+        create_app()
+        job = self.client.get('/api/import_jobs/stale').get_json()
+
+        # Assert
+        self.assertEqual(job['status'], 'failed')
+        self.assertEqual(job['message'], 'Interrupted by a restart')
+
+    def test_uploads_get_separate_files(self):
+        """Test that concurrent uploads don't share a temporary file."""
+        # Act
+        first = save_upload(io.BytesIO(b'first'), 'a.xlsx')
+        second = save_upload(io.BytesIO(b'second'), 'a.xlsx')
+
+        # Assert
+        self.assertNotEqual(first, second)
+        with open(first, 'rb') as f:
+            self.assertEqual(f.read(), b'first')
+        os.remove(first)
+        os.remove(second)
+
+    def test_unknown_job(self):
+        """Test the status of a job that does not exist."""
+        # Act
+        response = self.client.get('/api/import_jobs/missing')
+
+        # Assert
+        self.assertEqual(response.status_code, 404)
+
+
+if __name__ == '__main__':
+    unittest.main()
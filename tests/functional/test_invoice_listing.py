@@ -0,0 +1,152 @@
+"""
+Functional tests for the paginated invoice listing page and JSON API.
+"""
+import unittest
+from tests.test_base import TestBase
+from src import create_app
+from src.models.invoices import save_invoice
+from src.models.estimates import save_estimate
+from src.models.invoices import delete_invoice
+from src import utils
+
+
+class InvoiceListingApiTests(TestBase):
+    """Tests for /all_invoices and /api/invoices."""
+
+    def setUp(self):
+        """Set up a Flask test client and three invoices."""
+        super().setUp()
+        self.app = create_app()
+        self.app.config['TESTING'] = True
+        self.client = self.app.test_client()
+        client_id = self.create_test_client()
+        service_id = self.create_test_service()
+        for day in (1, 2, 3):
+            save_invoice(client_id, service_id, 1, f'2025-03-0{day}', f'L-{day}', apply_iva=False, apply_irpf=False)
+
+    def test_api_pages_with_cursor(self):
+        """Test following next_cursor through the JSON API."""
+        # Act
+        first = self.client.get('/api/invoices?year=2025&page_size=2').get_json()
+        second = self.client.get(f"/api/invoices?year=2025&page_size=2&after={first['next_cursor']}").get_json()
+
+        # Assert
+        self.assertEqual([invoice['invoice_number'] for invoice in first['invoices']], ['L-3', 'L-2'])
+        self.assertEqual([invoice['invoice_number'] for invoice in second['invoices']], ['L-1'])
+        self.assertIsNone(second['next_cursor'])
+        self.assertEqual(first['total_invoices'], 3)
+        self.assertEqual(first['invoices'][0]['client_name'], 'Test Client LLC')
+
+    def test_page_shows_year_totals_and_next_link(self):
+        """Test that the page renders one page of rows with totals for the year."""
+        # Act
+        response = self.client.get('/all_invoices?year=2025&page_size=2')
+
+        # Assert
+        self.assertEqual(response.status_code, 200)
+        html = response.get_data(as_text=True)
+        self.assertIn('L-3', html)
+        self.assertNotIn('L-1<', html)
+        self.assertIn('300.00', html)
+        self.assertIn('after=', html)
+
+    def test_api_filters_and_rejects_invalid_values(self):
+        """Test server-side filters on /api/invoices and the 400 for a bad value."""
+        # Act
+        filtered = self.client.get('/api/invoices?year=2025&search=L-2').get_json()
+        sorted_asc = self.client.get('/api/invoices?year=2025&sort=number&direction=asc').get_json()
+        invalid = self.client.get('/api/invoices?year=2025&month=13')
+
+        # Assert
+        self.assertEqual([invoice['invoice_number'] for invoice in filtered['invoices']], ['L-2'])
+        self.assertEqual(filtered['total_invoices'], 1)
+        self.assertEqual([invoice['invoice_number'] for invoice in sorted_asc['invoices']], ['L-1', 'L-2', 'L-3'])
+        self.assertEqual(invalid.status_code, 400)
+        self.assertIn('month', invalid.get_json()['error'])
+
+    def test_view_invoice_renders_stored_totals(self):
+        """Test that the invoice page shows the amounts stored with the invoice."""
+        # Act
+        response = self.client.get('/view_invoice/L-2')
+        missing = self.client.get('/view_invoice/NOPE')
+
+        # Assert
+        self.assertEqual(response.status_code, 200)
+        html = response.get_data(as_text=True)
+        self.assertIn('Test Client LLC', html)
+        self.assertIn('100.00', html)
+        self.assertEqual(missing.status_code, 404)
+
+    def test_view_invoice_revalidates_with_etag(self):
+        """Test that a repeat view with a matching If-None-Match gets a 304."""
+        # Arrange
+        first = self.client.get('/view_invoice/L-2')
+        etag = first.headers['ETag']
+
+        # Act
+        second = self.client.get('/view_invoice/L-2', headers={'If-None-Match': etag})
+
+        # Assert
+        self.assertEqual(second.status_code, 304)
+        self.assertEqual(second.headers['ETag'], etag)
+        self.assertEqual(second.get_data(), b'')
+
+    def test_cached_invoice_is_dropped_on_delete_and_issuer_change(self):
+        """Test invalidation of rendered invoices."""
+        # Arrange
+        etag = self.client.get('/view_invoice/L-3').headers['ETag']
+        config = utils.load_config()
+        config['issuer']['name'] = 'Renamed Issuer'
+        utils.save_config(config)
+
+        # Act
+        renamed = self.client.get('/view_invoice/L-3', headers={'If-None-Match': etag})
+        delete_invoice('L-3')
+        deleted = self.client.get('/view_invoice/L-3')
+
+        # Assert
+        self.assertEqual(renamed.status_code, 200)
+        self.assertIn('Renamed Issuer', renamed.get_data(as_text=True))
+        self.assertEqual(deleted.status_code, 404)
+
+
+class EstimateListingTests(TestBase):
+    """Tests for /estimates and /api/estimates."""
+
+    def setUp(self):
+        """Set up a Flask test client and two estimates."""
+        super().setUp()
+        self.app = create_app()
+        self.app.config['TESTING'] = True
+        self.client = self.app.test_client()
+        client_id = self.create_test_client()
+        service_id = self.create_test_service()
+        for day in (1, 2):
+            save_estimate(client_id, service_id, 1, f'2025-06-0{day}', '2025-07-01', 0, '', '',
+                          estimate_number_override=f'EST-{day}')
+
+    def test_page_renders_with_status_totals(self):
+        """Test that the estimates page renders the filtered listing."""
+        # Act
+        response = self.client.get('/estimates?year=2025&search=EST-2')
+
+        # Assert
+        self.assertEqual(response.status_code, 200)
+        html = response.get_data(as_text=True)
+        self.assertIn('EST-2', html)
+        self.assertNotIn('EST-1<', html)
+
+    def test_api_filters_by_status(self):
+        """Test the status filter of /api/estimates."""
+        # Act
+        drafts = self.client.get('/api/estimates?year=2025&status=Draft').get_json()
+        accepted = self.client.get('/api/estimates?year=2025&status=Accepted').get_json()
+
+        # Assert
+        self.assertEqual(drafts['total_estimates'], 2)
+        self.assertEqual(drafts['estimates_by_status'], {'Draft': 2})
+        self.assertEqual(accepted['estimates'], [])
+
+
+if __name__ == '__main__':
+    unittest.main()
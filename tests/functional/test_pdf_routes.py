@@ -0,0 +1,98 @@
+"""
+Functional tests for PDF downloads and month export jobs.
+"""
+import io
+import time
+import unittest
+import zipfile
+from unittest.mock import patch
+from tests.test_base import TestBase
+from src import create_app
+from src.models.invoices import save_invoice
+from src.models.estimates import save_estimate
+from src.pdf import service as pdf_service
+
+
+class PdfRouteTests(TestBase):
+    """Tests for /view_invoice/<n>/pdf, /estimate/<n>/pdf and /api/exports."""
+
+    def setUp(self):
+        """Set up a Flask test client, two invoices and an estimate, rendering in-process."""
+        super().setUp()
+        self.workers_patcher = patch.object(pdf_service, 'PDF_WORKERS', 0)
+        self.workers_patcher.start()
+        self.app = create_app()
+        self.app.config['TESTING'] = True
+        self.client = self.app.test_client()
+        client_id = self.create_test_client()
+        service_id = self.create_test_service()
+        save_invoice(client_id, service_id, 1, '2025-05-02', 'PDF-1', apply_iva=True, apply_irpf=True)
+        save_invoice(client_id, service_id, 2, '2025-05-03', 'PDF-2', apply_iva=False, apply_irpf=False)
+        save_estimate(client_id, service_id, 1, '2025-05-04', '2025-06-04', 0.15, 'Notes', 'Terms',
+                      estimate_number_override='EST-PDF')
+
+    def tearDown(self):
+        """Restore the worker setting."""
+        self.workers_patcher.stop()
+        super().tearDown()
+
+    def test_invoice_and_estimate_pdfs(self):
+        """Test downloading rendered invoice and estimate PDFs."""
+        # Act
+        invoice = self.client.get('/view_invoice/PDF-1/pdf?download=1')
+        estimate = self.client.get('/estimate/EST-PDF/pdf')
+        missing = self.client.get('/view_invoice/NOPE/pdf')
+
+        # Assert
+        self.assertEqual(invoice.status_code, 200)
+        self.assertEqual(invoice.mimetype, 'application/pdf')
+        self.assertIn('attachment', invoice.headers['Content-Disposition'])
+        self.assertTrue(invoice.get_data().startswith(b'%PDF'))
+        self.assertEqual(estimate.status_code, 200)
+        self.assertTrue(estimate.get_data().startswith(b'%PDF'))
+        self.assertEqual(missing.status_code, 404)
+        invoice.close()
+        estimate.close()
+
+    def test_estimate_page_links_to_pdf(self):
+        """Test that the estimate page renders with its PDF link."""
+        # Act
+        response = self.client.get('/estimate/EST-PDF')
+
+        # Assert
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('/estimate/EST-PDF/pdf', response.get_data(as_text=True))
+
+    def test_month_export_job(self):
+        """Test starting a month export, polling its progress and downloading the zip."""
+        # Act
+        started = self.client.post('/api/exports/invoices', json={'year': 2025, 'month': 5})
+        job = started.get_json()
+        deadline = time.monotonic() + 10
+        while job['status'] not in ('done', 'failed') and time.monotonic() < deadline:
+            time.sleep(0.05)
+            job = self.client.get(job['status_url']).get_json()
+        download = self.client.get(job['download_url'])
+
+        # Assert
+        self.assertEqual(started.status_code, 202)
+        self.assertEqual(job['status'], 'done')
+        self.assertEqual((job['done'], job['total']), (2, 2))
+        self.assertNotIn('path', job)
+        with zipfile.ZipFile(io.BytesIO(download.get_data())) as archive:
+            self.assertEqual(sorted(archive.namelist()), ['PDF-1.pdf', 'PDF-2.pdf'])
+        download.close()
+
+    def test_month_export_rejects_invalid_input(self):
+        """Test the 400 and 404 responses of the export API."""
+        # Act
+        invalid = self.client.post('/api/exports/invoices', json={'year': 2025, 'month': 'May'})
+        unknown = self.client.get('/api/exports/unknown')
+
+        # Assert
+        self.assertEqual(invalid.status_code, 400)
+        self.assertEqual(unknown.status_code, 404)
+
+
+if __name__ == '__main__':
+    unittest.main()
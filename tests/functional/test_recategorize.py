@@ -0,0 +1,60 @@
+"""
+Functional tests for changing the category of stored expenses and incomes.
+"""
+import os
+import unittest
+from openpyxl import Workbook
+from tests.test_base import TestBase
+from src import create_app
+from src.finance.bbva_import import import_bbva_statement
+from src.finance.expenses import get_expenses, get_incomes
+
+
+class RecategorizeTests(TestBase):
+    """Tests for /recategorize_expense and /recategorize_income."""
+
+    def setUp(self):
+        """Set up a Flask test client and a statement with one expense and one income."""
+        super().setUp()
+        self.app = create_app()
+        self.app.config['TESTING'] = True
+        self.client = self.app.test_client()
+
+        workbook = Workbook()
+        workbook.active.append(('Fecha', 'Concepto', 'Movimiento', 'Importe'))
+        workbook.active.append(('02/03/2025', 'Libreria Central 0231', 'Pago con tarjeta', -30))
+        workbook.active.append(('03/03/2025', 'Acme Consulting', 'Transferencia', 900))
+        self.path = os.path.join(self.test_dir, 'recategorize.xlsx')
+        workbook.save(self.path)
+
+    def test_recategorized_merchant_wins_on_next_import(self):
+        """Test that the category chosen for an imported expense is used by later imports."""
+        # Arrange
+        import_bbva_statement(self.path, check_duplicates=False)
+        expense_id = get_expenses()[0][0]
+        income_id = get_incomes()[0][0]
+
+        # Act
+        expense_response = self.client.post('/recategorize_expense',
+                                            data={'expense_id': expense_id, 'category_id': 7})
+        income_response = self.client.post('/recategorize_income', data={'income_id': income_id, 'source_id': 3})
+        result = import_bbva_statement(self.path, check_duplicates=False)
+
+        # Assert
+        self.assertEqual((expense_response.status_code, income_response.status_code), (302, 302))
+        self.assertEqual(result['categorized_from_cache'], 2)
+        self.assertEqual([expense[1] for expense in get_expenses()], [7, 7])
+        self.assertEqual([income[1] for income in get_incomes()], [3, 3])
+
+    def test_unknown_expense(self):
+        """Test that recategorizing a missing expense changes nothing."""
+        # Act
+        response = self.client.post('/recategorize_expense', data={'expense_id': 999, 'category_id': 9})
+
+        # Assert
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(get_expenses(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
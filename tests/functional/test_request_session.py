@@ -0,0 +1,160 @@
+"""
+Functional tests for the request-scoped database session.
+"""
+import unittest
+from unittest.mock import patch
+from tests.test_base import TestBase, DatabaseTestMixin
+from src import create_app
+from src.models.db import get_db_connection, get_pool_stats, mark_session_failed, unit_of_work
+from src.models.preferences import get_preferences
+from src.models.clients import add_client
+from src.models.services import add_service, update_service
+from src.render_cache import invoice_cache
+
+
+class RequestSessionTests(TestBase, DatabaseTestMixin):
+    """Tests for one connection and one transaction per request."""
+
+    def setUp(self):
+        """Set up a Flask test client and base data."""
+        super().setUp()
+        self.app = create_app()
+        self.app.config['TESTING'] = True
+        self.client = self.app.test_client()
+        self.client_id = self.create_test_client()
+        self.service_id = self.create_test_service()
+
+    def test_generate_invoice_commits_in_one_transaction(self):
+        """Test that invoice creation is committed once by the request session."""
+        # Arrange
+        opened_before = get_pool_stats()['connections_opened']
+
+        # Act
+        response = self.client.post('/generate_invoice', data={
+            'client_id': self.client_id,
+            'service_id': self.service_id,
+            'quantity': 2,
+            'invoice_date': '2025-06-01',
+            'apply_iva': '1',
+            'apply_irpf': '1'
+        })
+
+        # Assert
+        self.assertEqual(response.status_code, 200)
+        self.assertRecordCount('invoices', 1)
+        self.assertLessEqual(get_pool_stats()['connections_opened'] - opened_before, 1)
+
+    def test_generate_invoice_does_not_rewrite_config(self):
+        """Test that remembering the last selection no longer saves config.json."""
+        # Act
+        with patch('src.utils.save_config') as save_mock:
+            response = self.client.post('/generate_invoice', data={
+                'client_id': self.client_id,
+                'service_id': self.service_id,
+                'quantity': 1,
+                'invoice_date': '2025-06-01'
+            })
+
+        # Assert
+        self.assertEqual(response.status_code, 200)
+        save_mock.assert_not_called()
+        self.assertEqual(get_preferences()['last_client_id'], self.client_id)
+
+    def test_unit_of_work_rolls_back_on_error(self):
+        """Test that a failing unit of work leaves no partial writes."""
+        # Act
+        with self.assertRaises(RuntimeError):
+            with unit_of_work():
+                add_client('Rollback Client', 'RB1', 'Street', 'Spain', 'rb@example.com')
+                add_service('Rollback Service', 10.0, 'hour')
+                raise RuntimeError('boom')
+
+        # Assert
+        self.assertRecordCount('clients', 3)  # Two sample clients plus the test client
+        self.assertRecordCount('services', 4)  # Three sample services plus the test service
+
+    def test_model_rollback_undoes_only_its_own_call(self):
+        """Test that conn.rollback() in a model call keeps the earlier writes of the unit of work."""
+        # Act
+        with unit_of_work():
+            add_client('Kept Client', 'KC1', 'Street', 'Spain', 'kc@example.com')
+            with get_db_connection() as conn:
+                conn.execute("INSERT INTO services (description, unit_price, unit_type) VALUES ('Lost', 1, 'hour')")
+                conn.rollback()
+
+        # Assert
+        self.assertRecordCount('clients', 4)
+        self.assertRecordCount('services', 4)
+
+    def test_model_call_that_raises_keeps_no_partial_writes(self):
+        """Test that an exception leaving a model call undoes that call's writes only."""
+        # Act
+        with unit_of_work():
+            add_client('Kept Client', 'KC1', 'Street', 'Spain', 'kc@example.com')
+            try:
+                with get_db_connection() as conn:
+                    conn.execute("INSERT INTO services (description, unit_price, unit_type) VALUES ('Lost', 1, 'hour')")
+                    raise ValueError('invalid')
+            except ValueError:
+                pass
+
+        # Assert
+        self.assertRecordCount('clients', 4)
+        self.assertRecordCount('services', 4)
+
+    def test_session_rollback_discards_the_unit_of_work(self):
+        """Test that rolling back the session connection commits nothing at the end."""
+        # Act
+        with unit_of_work() as session:
+            add_client('Rollback Client', 'RB1', 'Street', 'Spain', 'rb@example.com')
+            session.connection.rollback()
+            add_service('Rollback Service', 10.0, 'hour')
+
+        # Assert
+        self.assertRecordCount('clients', 3)
+        self.assertRecordCount('services', 4)
+
+    def test_error_responses_are_rolled_back(self):
+        """Test that writes of a request answered with an error status or marked failed are not committed."""
+        # Arrange
+        @self.app.route('/test/error_status')
+        def error_status():
+            add_client('Error Client', 'EC1', 'Street', 'Spain', 'ec@example.com')
+            return 'Bad request', 400
+
+        @self.app.route('/test/error_redirect')
+        def error_redirect():
+            add_client('Redirect Client', 'RC1', 'Street', 'Spain', 'rc@example.com')
+            mark_session_failed()
+            return '', 302, {'Location': '/'}
+
+        # Act
+        status_response = self.client.get('/test/error_status')
+        redirect_response = self.client.get('/test/error_redirect')
+
+        # Assert
+        self.assertEqual((status_response.status_code, redirect_response.status_code), (400, 302))
+        self.assertRecordCount('clients', 3)
+
+    def test_cache_is_invalidated_only_after_commit(self):
+        """Test that cached invoices are dropped when the unit of work commits, not before or on rollback."""
+        # Arrange
+        invoice_cache.put(('db', 'F1', 'issuer'), '<html></html>')
+
+        # Act
+        with self.assertRaises(RuntimeError):
+            with unit_of_work():
+                update_service(self.service_id, 'Rolled Back', 10.0, 'hour')
+                raise RuntimeError('boom')
+        cached_after_rollback = invoice_cache.get(('db', 'F1', 'issuer')) is not None
+        with unit_of_work():
+            update_service(self.service_id, 'Committed', 10.0, 'hour')
+            cached_before_commit = invoice_cache.get(('db', 'F1', 'issuer')) is not None
+        cached_after_commit = invoice_cache.get(('db', 'F1', 'issuer')) is not None
+
+        # Assert
+        self.assertEqual((cached_after_rollback, cached_before_commit, cached_after_commit), (True, True, False))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+"""
+Integration tests for bulk invoice generation in the Invoice Generator.
+"""
+import json
+import os
+import unittest
+from tests.test_base import TestBase, DatabaseTestMixin
+from src.models.billing import generate_invoices_bulk, main
+from src.models.invoices import get_invoice_period
+
+
+class BulkBillingTests(TestBase, DatabaseTestMixin):
+    """Tests for month-end bulk invoice runs."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        super().setUp()
+        self.client_id = self.create_test_client()
+        self.service_id = self.create_test_service()
+
+    def test_bulk_run_creates_numbered_invoices(self):
+        """Test that valid items become sequentially numbered invoices."""
+        # Arrange
+        items = [
+            {'client_id': self.client_id, 'service_id': self.service_id, 'quantity': 2, 'date': '2025-05-31'},
+            {'client_id': self.client_id, 'service_id': self.service_id, 'quantity': 1,
+             'date': '31/05/2025', 'apply_iva': False, 'apply_irpf': False},
+        ]
+        period = get_invoice_period()
+
+        # Act
+        report = generate_invoices_bulk(items)
+
+        # Assert
+        self.assertEqual(report['created'], 2)
+        self.assertEqual(report['failed'], 0)
+        self.assertEqual([r['invoice_number'] for r in report['results']], [f'{period}-TCL-1', f'{period}-TCL-2'])
+        self.assertEqual(report['results'][0]['total'], 212.0)
+        self.assertEqual(report['results'][1]['total'], 100.0)
+        self.assertEqual(report['results'][1]['date'], '2025-05-31')
+        self.assertRecordCount('invoices', 2)
+
+    def test_invalid_items_are_reported_individually(self):
+        """Test that invalid items fail without blocking the valid ones."""
+        # Arrange
+        items = [
+            {'client_id': 9999, 'service_id': self.service_id, 'quantity': 1},
+            {'client_id': self.client_id, 'service_id': self.service_id, 'quantity': 0},
+            {'client_id': self.client_id, 'service_id': self.service_id, 'quantity': 1, 'date': 'yesterday'},
+            {'client_id': self.client_id, 'service_id': self.service_id, 'quantity': 3},
+        ]
+
+        # Act
+        report = generate_invoices_bulk(items)
+
+        # Assert
+        self.assertEqual(report['created'], 1)
+        self.assertEqual(report['failed'], 3)
+        self.assertIn('not found', report['results'][0]['error'])
+        self.assertIn('greater than 0', report['results'][1]['error'])
+        self.assertIn('Invalid date', report['results'][2]['error'])
+        self.assertTrue(report['results'][3]['success'])
+        self.assertRecordCount('invoices', 1)
+
+    def test_tax_flags_are_parsed_strictly(self):
+        """Test that string flags such as "false" turn taxes off and unknown values reject the run."""
+        # Arrange
+        items = [{'client_id': self.client_id, 'service_id': self.service_id, 'quantity': 1,
+                  'apply_iva': 'false', 'apply_irpf': '0'}]
+        invalid_items = [{'client_id': self.client_id, 'service_id': self.service_id, 'quantity': 1,
+                          'apply_iva': 'maybe'}]
+
+        # Act
+        report = generate_invoices_bulk(items)
+        with self.assertRaises(ValueError):
+            generate_invoices_bulk(invalid_items)
+
+        # Assert
+        self.assertEqual(report['results'][0]['total'], 100.0)
+        self.assertRecordCount('invoices', 1)
+
+    def test_non_object_items_are_failed_items(self):
+        """Test that entries that are not objects fail on their own, and a non-list payload is rejected."""
+        # Arrange
+        items = ['not an item', {'client_id': self.client_id, 'service_id': self.service_id, 'quantity': 1}, 7]
+        items_file = os.path.join(self.test_dir, 'items.json')
+        with open(items_file, 'w') as f:
+            json.dump({'items': {'client_id': self.client_id}}, f)
+
+        # Act
+        report = generate_invoices_bulk(items)
+        exit_code = main([items_file, '--db', self.test_db_file])
+
+        # Assert
+        self.assertEqual((report['created'], report['failed']), (1, 2))
+        self.assertEqual([result['success'] for result in report['results']], [False, True, False])
+        self.assertIn('Expected an object', report['results'][0]['error'])
+        self.assertEqual(exit_code, 1)
+        self.assertRecordCount('invoices', 1)
+
+    def test_command_line_run(self):
+        """Test the python -m src.models.billing entry point."""
+        # Arrange
+        items_file = os.path.join(self.test_dir, 'items.json')
+        with open(items_file, 'w') as f:
+            json.dump({'items': [{'client_id': self.client_id, 'service_id': self.service_id, 'quantity': 1}]}, f)
+
+        # Act
+        exit_code = main([items_file, '--db', self.test_db_file])
+
+        # Assert
+        self.assertEqual(exit_code, 0)
+        self.assertRecordCount('invoices', 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -4,7 +4,8 @@ Integration tests for invoice generation workflow in the Invoice Generator.
 import unittest
 from datetime import datetime
 from tests.test_base import TestBase, DatabaseTestMixin
-from src.models.invoices import save_invoice, get_recent_invoices
+from src.models.invoices import save_invoice, get_recent_invoices, get_invoice_by_number
+from src.models.db import get_db_connection
 
 
 class InvoiceFlowTests(TestBase, DatabaseTestMixin):
@@ -141,5 +142,28 @@ class InvoiceFlowTests(TestBase, DatabaseTestMixin):
             self.assertEqual(saved_invoice[13], expected_total)  # total_amount
 
 
+    def test_get_invoice_by_number_uses_stored_amounts(self):
+        """Test that the invoice record carries its stored totals, client and service."""
+        # Arrange
+        save_invoice(self.client_id, self.service_id, 2, '2025-06-01', 'TEST-REC', apply_iva=True, apply_irpf=True)
+        stored = [invoice for invoice in get_recent_invoices() if invoice[1] == 'TEST-REC'][0]
+        with get_db_connection() as conn:
+            conn.execute('UPDATE services SET unit_price = 999 WHERE id = ?', (self.service_id,))
+            conn.commit()
+
+        # Act
+        invoice = get_invoice_by_number('TEST-REC')
+
+        # Assert
+        self.assertEqual(invoice.invoice_number, 'TEST-REC')
+        self.assertFloatEqual(invoice.subtotal, 200.0)
+        self.assertFloatEqual(invoice.total_amount, stored[13])
+        self.assertEqual(invoice.currency_code, 'EUR')
+        self.assertEqual(invoice.client[1], 'Test Client LLC')
+        self.assertEqual(invoice.client.email, 'test@testclient.com')
+        self.assertEqual(invoice.service[2], 999)
+        self.assertIsNone(get_invoice_by_number('MISSING'))
+
+
 if __name__ == '__main__':
     unittest.main()
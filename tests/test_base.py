@@ -11,8 +11,12 @@ from unittest.mock import patch
 # Add the parent directory to sys.path to import application modules
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from src.models.db import init_db, get_db_connection
+from src.models.db import init_db, get_db_connection, close_pool
+from src.models.preferences import flush_preferences
 from src import utils
+from src.render_cache import invalidate_invoices
+from src.finance.category_matcher import reset_rule_engine
+from src.finance.merchant_cache import merchant_cache
 
 
 class TestBase(unittest.TestCase):
@@ -49,9 +53,20 @@ class TestBase(unittest.TestCase):
     
     def tearDown(self):
         """Clean up after each test method."""
+        # Write buffered preferences while the test database still exists
+        flush_preferences()
+        
         # Stop database patching
         self.db_patcher.stop()
         
+        # Close pooled connections to the test database
+        close_pool(self.test_db_file)
+        
+        # Forget invoices rendered, rules compiled and merchants cached from the test database
+        invalidate_invoices()
+        reset_rule_engine()
+        merchant_cache.clear()
+        
         # Remove test database file
         if os.path.exists(self.test_db_file):
             os.remove(self.test_db_file)
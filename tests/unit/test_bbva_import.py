@@ -0,0 +1,282 @@
+"""
+Unit tests for the streaming BBVA statement import.
+"""
+import os
+import sqlite3
+import unittest
+from unittest.mock import patch
+from openpyxl import Workbook
+from tests.test_base import TestBase, DatabaseTestMixin
+from src.finance import bbva_import
+from src.finance.bbva_import import (
+    detect_duplicate_transactions, import_bbva_statement, import_statement, iter_batches, parse_transactions,
+    _store_records
+)
+from src.finance.expenses import add_expenses_bulk, get_expenses, get_incomes
+from src.models.db import unit_of_work
+
+BBVA_HEADER = ('F.Valor', 'Fecha', 'Concepto', 'Movimiento', 'Importe', 'Divisa', 'Disponible', 'Divisa',
+               'Observaciones')
+
+
+class BBVAImportTests(TestBase, DatabaseTestMixin):
+    """Tests for parsing and importing BBVA statements in batches."""
+
+    def write_statement(self, rows, name='statement.xlsx'):
+        """Write rows to a workbook in the test directory and return its path."""
+        workbook = Workbook()
+        for row in rows:
+            workbook.active.append(row)
+        path = os.path.join(self.test_dir, name)
+        workbook.save(path)
+        return path
+
+    def test_parse_maps_bbva_columns_by_header(self):
+        """Test that the BBVA export columns are found by their header names."""
+        # Arrange
+        rows = [
+            BBVA_HEADER,
+            ('10/05/2025', '09/05/2025', 'Taxi aeropuerto', 'Pago con tarjeta', -25.5, 'EUR', 100, 'EUR', ''),
+            ('09/05/2025', '08/05/2025', 'Transferencia recibida', 'Cliente abril', 1200, 'EUR', 125.5, 'EUR', ''),
+        ]
+
+        # Act
+        transactions = list(parse_transactions(rows))
+
+        # Assert
+        self.assertEqual(transactions[0]['date'], '2025-05-09')
+        self.assertEqual(transactions[0]['description'], 'Taxi aeropuerto')
+        self.assertEqual(transactions[0]['movement'], 'Pago con tarjeta')
+        self.assertEqual(transactions[0]['type'], 'expense')
+        self.assertEqual(transactions[1]['amount'], 1200.0)
+        self.assertEqual(transactions[1]['type'], 'income')
+
+    def test_parse_falls_back_to_positional_columns_and_skips_incomplete_rows(self):
+        """Test statements without a known header and rows with missing data."""
+        # Arrange
+        rows = [
+            ('Date', 'Description', 'Amount'),
+            ('2025-01-02', 'Papel', -10),
+            (None, None, None),
+            ('2025-01-03', None, -5),
+            ('2025-01-04', 'Not an amount', 'n/a'),
+            ('2025-01-05',),
+        ]
+
+        # Act
+        transactions = list(parse_transactions(rows))
+
+        # Assert
+        self.assertEqual([(t['date'], t['description'], t['amount']) for t in transactions],
+                         [('2025-01-02', 'Papel', -10.0)])
+
+    def test_iter_batches(self):
+        """Test that batches hold up to batch_size items."""
+        # Act
+        batches = list(iter_batches(range(7), 3))
+
+        # Assert
+        self.assertEqual(batches, [[0, 1, 2], [3, 4, 5], [6]])
+
+    def test_import_in_small_batches(self):
+        """Test that every row of a statement is imported across several batches."""
+        # Arrange
+        rows = [BBVA_HEADER]
+        for day in range(1, 8):
+            rows.append((None, f'0{day}/03/2025', f'Taxi {day}', 'Pago con tarjeta', -10 - day, 'EUR', 0, 'EUR', ''))
+        rows.append((None, '09/03/2025', 'Transferencia recibida', 'Cliente', 500, 'EUR', 0, 'EUR', ''))
+        path = self.write_statement(rows)
+
+        # Act
+        result = import_bbva_statement(path, default_income_source=1, check_duplicates=False, batch_size=3)
+
+        # Assert
+        self.assertTrue(result['success'], result['message'])
+        self.assertEqual(result['expenses_imported'], 7)
+        self.assertEqual(result['incomes_imported'], 1)
+        self.assertEqual(result['rows'], 8)
+        expenses = get_expenses()
+        self.assertEqual(len(expenses), 7)
+        self.assertEqual({expense[5] for expense in expenses}, {'Tarjeta'})
+        self.assertEqual(len(get_incomes()), 1)
+
+    def test_import_reports_progress_per_batch(self):
+        """Test that the progress callback is called after each batch."""
+        # Arrange
+        rows = [BBVA_HEADER] + [(None, f'0{day}/03/2025', f'Taxi {day}', 'Pago', -10, 'EUR') for day in range(1, 6)]
+        path = self.write_statement(rows)
+        calls = []
+
+        # Act
+        import_bbva_statement(path, check_duplicates=False, batch_size=2,
+                              progress=lambda *counters: calls.append(counters))
+
+        # Assert
+        self.assertEqual(calls, [(2, 2, 0), (4, 4, 0), (5, 5, 0)])
+
+    def test_each_batch_is_committed_before_the_next(self):
+        """Test that a batch is visible to other connections as soon as it is stored."""
+        # Arrange
+        rows = [BBVA_HEADER] + [(None, f'0{day}/03/2025', f'Taxi {day}', 'Pago', -10, 'EUR') for day in range(1, 6)]
+        path = self.write_statement(rows)
+        committed = []
+
+        def count_committed(*counters):
+            with sqlite3.connect(self.test_db_file) as other:
+                committed.append(other.execute('SELECT COUNT(*) FROM expenses').fetchone()[0])
+
+        # Act
+        import_bbva_statement(path, check_duplicates=False, batch_size=2, progress=count_committed)
+
+        # Assert
+        self.assertEqual(committed, [2, 4, 5])
+
+    def test_checkpoint_commits_with_its_batch(self):
+        """Test that the checkpoint runs inside the batch's transaction and is rolled back with it."""
+        # Arrange
+        rows = [BBVA_HEADER] + [(None, f'0{day}/03/2025', f'Taxi {day}', 'Pago', -10, 'EUR') for day in range(1, 6)]
+        path = self.write_statement(rows)
+        calls = []
+
+        def checkpoint(conn, *counters):
+            with sqlite3.connect(self.test_db_file) as other:
+                committed = other.execute('SELECT COUNT(*) FROM expenses').fetchone()[0]
+            calls.append((committed,) + counters)
+            if counters[0] == 4:
+                raise sqlite3.OperationalError('disk I/O error')
+
+        # Act
+        result = bbva_import.import_statement(path, check_duplicates=False, batch_size=2, statement_format='xlsx',
+                                              checkpoint=checkpoint)
+
+        # Assert
+        self.assertFalse(result['success'])
+        self.assertEqual(calls, [(0, 2, 2, 0, 0), (2, 4, 4, 0, 0)])
+        self.assertEqual(result['rows'], 2)
+        self.assertEqual(len(get_expenses()), 2)
+
+    def test_failed_import_keeps_committed_batches_and_resumes(self):
+        """Test that an import stopped by an error can be resumed after its committed rows."""
+        # Arrange
+        rows = [BBVA_HEADER] + [(None, f'0{day}/03/2025', f'Taxi {day}', 'Pago', -10, 'EUR') for day in range(1, 6)]
+        path = self.write_statement(rows)
+        store_records = bbva_import._store_records
+        calls = []
+
+        def fail_second_batch(*args):
+            calls.append(args)
+            if len(calls) == 2:
+                raise sqlite3.OperationalError('database is locked')
+            return store_records(*args)
+
+        # Act
+        with patch('src.finance.bbva_import._store_records', side_effect=fail_second_batch):
+            failed = import_statement(path, check_duplicates=False, batch_size=2)
+        resumed = import_statement(path, check_duplicates=False, batch_size=2, skip_rows=failed['rows'])
+
+        # Assert
+        self.assertFalse(failed['success'])
+        self.assertEqual((failed['rows'], failed['expenses_imported']), (2, 2))
+        self.assertTrue(resumed['success'], resumed['message'])
+        self.assertEqual((resumed['rows'], resumed['expenses_imported']), (5, 3))
+        self.assertEqual(sorted(expense[2] for expense in get_expenses()), [f'Taxi {day}' for day in range(1, 6)])
+
+    def test_import_reports_throughput(self):
+        """Test that the result reports the rows read and the import rate."""
+        # Arrange
+        path = self.write_statement([BBVA_HEADER, (None, '02/03/2025', 'Taxi', 'Pago con tarjeta', -12, 'EUR')])
+
+        # Act
+        result = import_bbva_statement(path, check_duplicates=False)
+
+        # Assert
+        self.assertEqual(result['rows'], 1)
+        self.assertGreater(result['rows_per_second'], 0)
+
+    def test_failing_row_is_isolated_from_its_batch(self):
+        """Test that a row rejected by the database is reported and the others are kept."""
+        # Arrange
+        records = [
+            ('expense', {'category_id': 2, 'description': 'Taxi', 'amount': 12, 'date': '2025-03-02'}),
+            ('expense', {'category_id': 2, 'description': None, 'amount': 5, 'date': '2025-03-03'}),
+            ('income', {'source_id': 1, 'description': 'Cliente', 'amount': 500, 'date': '2025-03-04'}),
+        ]
+        errors = []
+
+        # Act
+        with unit_of_work() as session:
+            stored = _store_records(session.connection, records, errors)
+
+        # Assert
+        self.assertEqual(stored, (1, 1))
+        self.assertEqual(len(errors), 1)
+        self.assertIn('2025-03-03', errors[0])
+        self.assertEqual([expense[2] for expense in get_expenses()], ['Taxi'])
+        self.assertEqual(len(get_incomes()), 1)
+
+    def test_add_expenses_bulk_normalizes_dates(self):
+        """Test the bulk expense insert."""
+        # Act
+        count = add_expenses_bulk([
+            {'category_id': 1, 'description': 'Papel', 'amount': 3, 'date': '05/01/2025'},
+            {'category_id': 1, 'description': 'Tinta', 'amount': 4, 'date': '2025-01-06', 'payment_method': 'Tarjeta'},
+        ])
+
+        # Assert
+        self.assertEqual(count, 2)
+        self.assertEqual(sorted(expense[3] for expense in get_expenses()), ['2025-01-05', '2025-01-06'])
+
+    def test_duplicates_match_amount_description_and_date_window(self):
+        """Test which stored transactions are reported as duplicates."""
+        # Arrange
+        add_expenses_bulk([
+            {'category_id': 2, 'description': 'TAXI MADRID', 'amount': 12, 'date': '2025-03-01'},
+            {'category_id': 2, 'description': 'TAXI MADRID', 'amount': 12, 'date': '2025-02-01'},
+        ])
+        transactions = [
+            {'date': '2025-03-03', 'description': 'Taxi    madrid', 'amount': -12.0, 'type': 'expense'},
+            {'date': '2025-03-03', 'description': 'Taxi madrid', 'amount': -12.01, 'type': 'expense'},
+            {'date': '2025-03-10', 'description': 'Taxi madrid', 'amount': -12.0, 'type': 'expense'},
+            {'date': '2025-03-01', 'description': 'Taxi madrid', 'amount': 12.0, 'type': 'income'},
+            {'date': 'sin fecha', 'description': 'taxi', 'amount': -12.0, 'type': 'expense'},
+        ]
+
+        # Act
+        duplicates = detect_duplicate_transactions(transactions)
+
+        # Assert
+        found = [(d['new_transaction']['date'], d['existing_transaction']['date'], d['days_difference'])
+                 for d in duplicates]
+        self.assertCountEqual(found, [
+            ('2025-03-03', '2025-03-01', 2),
+            ('sin fecha', '2025-03-01', 'unknown'),
+            ('sin fecha', '2025-02-01', 'unknown'),
+        ])
+        self.assertEqual(duplicates[0]['existing_transaction']['amount'], -12)
+
+    def test_reimported_statement_is_reported_as_duplicate(self):
+        """Test that rows are checked against earlier imports, not against themselves."""
+        # Arrange
+        path = self.write_statement([BBVA_HEADER, (None, '02/03/2025', 'Taxi', 'Pago con tarjeta', -12, 'EUR')])
+
+        # Act
+        first = import_bbva_statement(path)
+        second = import_bbva_statement(path)
+
+        # Assert
+        self.assertNotIn('duplicates', first)
+        self.assertEqual(len(second['duplicates']), 1)
+        self.assertEqual(second['duplicates'][0]['days_difference'], 0)
+
+    def test_import_missing_file(self):
+        """Test the result for a file that does not exist."""
+        # Act
+        result = import_bbva_statement(os.path.join(self.test_dir, 'missing.xlsx'))
+
+        # Assert
+        self.assertFalse(result['success'])
+        self.assertEqual(result['expenses_imported'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,167 @@
+"""
+Unit tests for keyword based transaction categorization.
+"""
+import unittest
+from tests.test_base import TestBase
+from src.finance.bbva_import import is_tax_deductible
+from src.finance.categorization_rules import (
+    delete_categorization_rule, get_categorization_rules, get_categorization_rules_version, save_categorization_rule
+)
+from src.finance.category_matcher import (
+    KeywordMatcher, RuleEngine, categorize_many, get_rule_engine, match_expense_category, match_income_source
+)
+
+
+class KeywordMatcherTests(unittest.TestCase):
+    """Tests for the Aho-Corasick keyword automaton."""
+
+    def test_finds_overlapping_keywords_in_priority_order(self):
+        """Test that keywords sharing prefixes and suffixes are all found, ranked by the map order."""
+        # Arrange
+        matcher = KeywordMatcher({'a': ['HERS'], 'b': ['he', 'SHE'], 'c': ['HIS']})
+
+        # Act
+        hits = matcher.find_all('ushers')
+
+        # Assert
+        self.assertEqual(hits, [('a', 'HERS'), ('b', 'he'), ('b', 'SHE')])
+        self.assertEqual(matcher.match('ushers'), 'a')
+        self.assertEqual(matcher.match('this'), 'c')
+        self.assertEqual(matcher.match('nothing', default='x'), 'x')
+        self.assertEqual(matcher.find_all(None), [])
+
+    def test_same_keyword_in_two_labels(self):
+        """Test that a keyword listed under two labels matches the first one."""
+        # Arrange
+        matcher = KeywordMatcher({1: ['MOVIL'], 2: ['MOVIL', 'PORTATIL']})
+
+        # Act
+        hits = matcher.find_all('Compra movil y portatil')
+
+        # Assert
+        self.assertEqual(hits, [(1, 'MOVIL'), (2, 'MOVIL'), (2, 'PORTATIL')])
+
+
+class RuleEngineTests(unittest.TestCase):
+    """Tests for compiled categorization rules."""
+
+    def setUp(self):
+        """Build an engine with rules of every match type."""
+        rules = [
+            {'id': 1, 'pattern': 'taxi', 'match_type': 'contains', 'kind': 'expense', 'target_id': 2,
+             'priority': 20, 'tax_deductible': None},
+            {'id': 2, 'pattern': 'bar', 'match_type': 'word', 'kind': 'expense', 'target_id': 3,
+             'priority': 30, 'tax_deductible': None},
+            {'id': 3, 'pattern': r'^comida cliente', 'match_type': 'regex', 'kind': 'expense', 'target_id': 3,
+             'priority': 5, 'tax_deductible': 1},
+            {'id': 4, 'pattern': 'regalo', 'match_type': 'contains', 'kind': 'expense', 'target_id': None,
+             'priority': 0, 'tax_deductible': 0},
+            {'id': 5, 'pattern': 'taxi', 'match_type': 'contains', 'kind': 'income', 'target_id': 1,
+             'priority': 10, 'tax_deductible': None},
+        ]
+        self.engine = RuleEngine(rules, {2: True, 3: False})
+
+    def test_classify_picks_best_rules(self):
+        """Test that the best rule with a target and the best rule with a flag are returned."""
+        # Assert
+        self.assertEqual(self.engine.classify('Taxi regalo', 'expense'), (2, False))
+        self.assertEqual(self.engine.classify('Comida cliente bar', 'expense'), (3, True))
+        self.assertEqual(self.engine.classify('Taxi', 'income'), (1, None))
+        self.assertEqual(self.engine.classify('Barcelona', 'expense'), (None, None))
+
+    def test_is_tax_deductible(self):
+        """Test that a rule's flag takes precedence over the category's."""
+        # Assert
+        self.assertTrue(self.engine.is_tax_deductible('Taxi', 2))
+        self.assertFalse(self.engine.is_tax_deductible('Bar Pepe', 3))
+        self.assertTrue(self.engine.is_tax_deductible('Comida cliente', 3))
+        self.assertFalse(self.engine.is_tax_deductible('Taxi regalo', '2'))
+        self.assertTrue(self.engine.is_tax_deductible('Taxi', None))
+
+
+class CategorizationTests(TestBase):
+    """Tests for matching with the rules stored in the database."""
+
+    def test_match_expense_category(self):
+        """Test category priorities and the default category."""
+        # Assert
+        self.assertEqual(match_expense_category('TAXI AEROPUERTO'), 2)
+        # BAR (food) is listed before the equipment keywords
+        self.assertEqual(match_expense_category('Bar Samsung'), 3)
+        self.assertEqual(match_expense_category('Transferencia'), 10)
+        self.assertEqual(match_expense_category(''), 10)
+
+    def test_match_income_source(self):
+        """Test income source matching and the default source."""
+        # Assert
+        self.assertEqual(match_income_source('Devolucion hacienda'), 2)
+        self.assertEqual(match_income_source('Bizum'), 4)
+
+    def test_categorize_many(self):
+        """Test the batch API against the single description functions."""
+        # Arrange
+        descriptions = ['Renfe', 'Curso Udemy', None, 'Cuota autonomo']
+
+        # Act
+        expense_categories = categorize_many(descriptions)
+        income_sources = categorize_many(descriptions, kind='income')
+
+        # Assert
+        self.assertEqual(expense_categories, [match_expense_category(d) for d in descriptions])
+        self.assertEqual(expense_categories, [2, 9, 10, 5])
+        self.assertEqual(income_sources, [4, 4, 4, 4])
+        with self.assertRaises(ValueError):
+            categorize_many(descriptions, kind='transfer')
+
+    def test_is_tax_deductible(self):
+        """Test the non-deductible categories and keywords."""
+        # Assert
+        self.assertTrue(is_tax_deductible('Taxi cliente', 2))
+        self.assertFalse(is_tax_deductible('Regalo PERSONAL', 2))
+        self.assertFalse(is_tax_deductible('Menu del dia', 3))
+
+    def test_seeded_rules(self):
+        """Test that the database is seeded with the built-in keyword rules."""
+        # Act
+        rules = get_categorization_rules('income')
+
+        # Assert
+        self.assertEqual(rules[0]['pattern'], 'FACTURA')
+        self.assertEqual(rules[0]['target_name'], 'Facturas')
+
+    def test_engine_is_rebuilt_only_when_rules_change(self):
+        """Test that rule changes bump the version and reach the cached engine."""
+        # Arrange
+        engine = get_rule_engine()
+        version = get_categorization_rules_version()
+
+        # Act
+        unchanged = get_rule_engine()
+        rule_id = save_categorization_rule('Coworking', 'word', 'expense', target_id=1, priority=1)
+        added = match_expense_category('Cuota coworking mayo')
+        save_categorization_rule('Coworking', 'word', 'expense', target_id=4, priority=1, rule_id=rule_id)
+        updated = match_expense_category('Cuota coworking mayo')
+        delete_categorization_rule(rule_id)
+
+        # Assert
+        self.assertIs(unchanged, engine)
+        self.assertEqual(added, 1)
+        self.assertEqual(updated, 4)
+        self.assertEqual(match_expense_category('Cuota coworking mayo'), 5)
+        self.assertEqual(get_categorization_rules_version(), version + 3)
+
+    def test_invalid_rules_are_rejected(self):
+        """Test rule validation."""
+        # Assert
+        with self.assertRaises(ValueError):
+            save_categorization_rule('(', 'regex', 'expense', target_id=1)
+        with self.assertRaises(ValueError):
+            save_categorization_rule('Taxi', 'contains', 'transfer', target_id=1)
+        with self.assertRaises(ValueError):
+            save_categorization_rule('Taxi', 'contains', 'expense')
+        with self.assertRaises(ValueError):
+            save_categorization_rule('Taxi', 'contains', 'expense', target_id=1, rule_id=99999)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,120 @@
+"""
+Unit tests for the cached configuration layer in the Invoice Generator.
+"""
+import unittest
+import os
+import json
+import shutil
+import tempfile
+from unittest.mock import patch
+from src import utils
+
+
+class ConfigCacheTests(unittest.TestCase):
+    """Tests for load_config/save_config caching and atomic writes."""
+
+    def setUp(self):
+        """Point the configuration at a temporary file."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.config_file = os.path.join(self.temp_dir, 'config.json')
+        with open(self.config_file, 'w') as f:
+            json.dump({'tax_rates': {'default_iva': 0.21, 'default_irpf': 0.15}}, f)
+
+        self.config_patcher = patch('src.utils.CONFIG_FILE', self.config_file)
+        self.config_patcher.start()
+        utils.reset_config_cache()
+
+    def tearDown(self):
+        """Restore the real configuration file."""
+        self.config_patcher.stop()
+        utils.reset_config_cache()
+        shutil.rmtree(self.temp_dir)
+
+    def _write_externally(self, config):
+        with open(self.config_file, 'w') as f:
+            json.dump(config, f)
+        # Make sure the change is visible even on filesystems with coarse mtimes
+        stat = os.stat(self.config_file)
+        os.utime(self.config_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    def test_config_is_read_from_disk_once(self):
+        """Test that repeated loads are served from the cache."""
+        # Act
+        with patch('src.utils._read_config_file', wraps=utils._read_config_file) as read_mock:
+            for _ in range(5):
+                utils.load_config()
+
+        # Assert
+        self.assertEqual(read_mock.call_count, 1)
+
+    def test_load_config_returns_private_copy(self):
+        """Test that modifying a loaded config does not affect the cache."""
+        # Arrange
+        config = utils.load_config()
+
+        # Act
+        config['tax_rates']['default_iva'] = 0.5
+
+        # Assert
+        self.assertEqual(utils.get_tax_rates().iva, 0.21)
+
+    def test_external_change_is_picked_up(self):
+        """Test that edits made outside the app are reloaded after the check interval."""
+        # Arrange
+        utils.load_config()
+
+        # Act
+        self._write_externally({'tax_rates': {'default_iva': 0.10, 'default_irpf': 0.07}})
+        with patch('src.utils.CONFIG_CHECK_INTERVAL', 0):
+            tax_rates = utils.get_tax_rates()
+
+        # Assert
+        self.assertEqual(tax_rates, utils.TaxRates(0.10, 0.07))
+
+    def test_save_config_writes_atomically_and_updates_cache(self):
+        """Test that save_config replaces the file and serves the new values."""
+        # Arrange
+        config = utils.load_config()
+        config['issuer'] = {'name': 'New Issuer'}
+
+        # Act
+        with patch('src.utils._read_config_file') as read_mock:
+            result = utils.save_config(config)
+            issuer = utils.get_issuer()
+
+        # Assert
+        self.assertTrue(result)
+        self.assertEqual(issuer['name'], 'New Issuer')
+        read_mock.assert_not_called()
+        with open(self.config_file) as f:
+            self.assertEqual(json.load(f)['issuer']['name'], 'New Issuer')
+        self.assertEqual(os.listdir(self.temp_dir), ['config.json'])
+
+    def test_failed_save_leaves_file_untouched(self):
+        """Test that an unserializable config does not corrupt config.json."""
+        # Arrange
+        with open(self.config_file) as f:
+            original = f.read()
+
+        # Act
+        result = utils.save_config({'bad': object()})
+
+        # Assert
+        self.assertFalse(result)
+        with open(self.config_file) as f:
+            self.assertEqual(f.read(), original)
+        self.assertEqual(os.listdir(self.temp_dir), ['config.json'])
+
+    def test_accessor_defaults(self):
+        """Test the typed accessors when sections are missing."""
+        # Act
+        currency = utils.get_default_currency()
+        issuer = utils.get_issuer()
+
+        # Assert
+        self.assertEqual(currency, utils.Currency('EUR', '€'))
+        self.assertEqual(issuer, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,154 @@
+"""
+Unit tests for the database connection layer in the Invoice Generator.
+"""
+import unittest
+import threading
+from tests.test_base import TestBase
+from src.models.db import get_db_connection, get_pool_stats, savepoint, unit_of_work
+from src.models.migrations import migrate_dates_to_iso
+from src.models.invoices import save_invoice, get_invoices_by_year, get_available_invoice_years
+from src.utils import to_iso_date
+
+
+class ConnectionPoolTests(TestBase):
+    """Tests for the pooled SQLite connection manager."""
+
+    def test_connection_is_reused_between_calls(self):
+        """Test that consecutive calls reuse the same pooled connection."""
+        # Act
+        with get_db_connection() as first:
+            pass
+        with get_db_connection() as second:
+            pass
+        stats = get_pool_stats()
+
+        # Assert
+        self.assertIs(first, second)
+        self.assertEqual(stats['connections_opened'], 1)
+        self.assertGreaterEqual(stats['hits'], 1)
+
+    def test_nested_calls_share_thread_connection(self):
+        """Test that nested calls in one thread get the same connection."""
+        # Act
+        with get_db_connection() as outer:
+            with get_db_connection() as inner:
+                same = outer is inner
+
+        # Assert
+        self.assertTrue(same)
+
+    def test_threads_get_separate_connections(self):
+        """Test that concurrent threads never share a connection."""
+        # Arrange
+        seen = []
+        barrier = threading.Barrier(2)
+
+        def worker():
+            with get_db_connection() as conn:
+                barrier.wait()
+                seen.append(conn)
+
+        # Act
+        threads = [threading.Thread(target=worker) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # Assert
+        self.assertIsNot(seen[0], seen[1])
+
+    def test_pragmas_applied(self):
+        """Test that WAL mode and tuned pragmas are set on pooled connections."""
+        # Act
+        with get_db_connection() as conn:
+            journal_mode = conn.execute('PRAGMA journal_mode').fetchone()[0]
+            synchronous = conn.execute('PRAGMA synchronous').fetchone()[0]
+            temp_store = conn.execute('PRAGMA temp_store').fetchone()[0]
+
+        # Assert
+        self.assertEqual(journal_mode, 'wal')
+        self.assertEqual(synchronous, 1)  # NORMAL
+        self.assertEqual(temp_store, 2)  # MEMORY
+
+    def test_uncommitted_work_is_rolled_back_on_release(self):
+        """Test that a released connection does not keep pending writes."""
+        # Act
+        with get_db_connection() as conn:
+            conn.execute("INSERT INTO services (description, unit_price, unit_type) VALUES ('Tmp', 1, 'h')")
+        with get_db_connection() as conn:
+            count = conn.execute("SELECT COUNT(*) FROM services WHERE description = 'Tmp'").fetchone()[0]
+
+        # Assert
+        self.assertEqual(count, 0)
+
+    def test_savepoint_rolls_back_only_its_block(self):
+        """Test that a failing savepoint keeps the earlier writes of the transaction."""
+        # Act
+        with unit_of_work() as session:
+            conn = session.connection
+            conn.execute("INSERT INTO services (description, unit_price, unit_type) VALUES ('Kept', 1, 'h')")
+            with self.assertRaises(RuntimeError):
+                with savepoint(conn):
+                    conn.execute("INSERT INTO services (description, unit_price, unit_type) VALUES ('Undone', 1, 'h')")
+                    raise RuntimeError('failed')
+        with get_db_connection() as conn:
+            names = [row[0] for row in conn.execute("SELECT description FROM services WHERE unit_price = 1")]
+
+        # Assert
+        self.assertEqual(names, ['Kept'])
+
+
+
+class DateStorageTests(TestBase):
+    """Tests for ISO date storage and the legacy date migration."""
+
+    def test_to_iso_date_formats(self):
+        """Test normalization of the supported date formats."""
+        # Assert
+        self.assertEqual(to_iso_date('01/06/2025'), '2025-06-01')
+        self.assertEqual(to_iso_date('2025-06-01'), '2025-06-01')
+        self.assertEqual(to_iso_date('1/6/2025'), '2025-06-01')
+        self.assertEqual(to_iso_date('not a date'), 'not a date')
+
+    def test_legacy_dates_are_migrated_in_batches(self):
+        """Test that DD/MM/YYYY rows are rewritten as ISO dates."""
+        # Arrange
+        client_id = self.create_test_client()
+        service_id = self.create_test_service()
+        with get_db_connection() as conn:
+            conn.executemany(
+                'INSERT INTO invoices (client_id, service_id, quantity, date, invoice_number) VALUES (?, ?, 1, ?, ?)',
+                [(client_id, service_id, f'{day:02d}/03/2024', f'LEGACY-{day}') for day in range(1, 8)]
+            )
+            conn.commit()
+
+            # Act
+            converted = migrate_dates_to_iso(conn, batch_size=3)
+            dates = [row[0] for row in conn.execute('SELECT date FROM invoices ORDER BY id')]
+
+        # Assert
+        self.assertEqual(converted, 7)
+        self.assertEqual(dates[0], '2024-03-01')
+        self.assertEqual(dates[-1], '2024-03-07')
+
+    def test_year_queries_use_iso_ranges(self):
+        """Test year filtering and available years on ISO dates."""
+        # Arrange
+        client_id = self.create_test_client()
+        service_id = self.create_test_service()
+        save_invoice(client_id, service_id, 1, '31/12/2024', 'Y-2024')
+        save_invoice(client_id, service_id, 1, '2025-01-01', 'Y-2025')
+
+        # Act
+        invoices_2024 = get_invoices_by_year(2024)
+        years = get_available_invoice_years()
+
+        # Assert
+        self.assertEqual([invoice[1] for invoice in invoices_2024], ['Y-2024'])
+        self.assertEqual(invoices_2024[0][2], '2024-12-31')
+        self.assertEqual(years, [2025, 2024])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+"""
+Unit tests for streaming CSV and XLSX exports.
+"""
+import csv
+import io
+import unittest
+from datetime import date
+from openpyxl import load_workbook
+from tests.test_base import TestBase, DatabaseTestMixin
+from src.finance.expenses import add_expense, add_income
+from src.models.exports import iter_csv, iter_xlsx, iter_export_rows
+from src.models.invoices import save_invoice, INVOICE_LIST_COLUMNS
+
+
+class ExportTests(TestBase, DatabaseTestMixin):
+    """Tests for batched export rows and their CSV/XLSX serialization."""
+
+    def setUp(self):
+        """Create invoices, expenses and incomes in two years."""
+        super().setUp()
+        client_id = self.create_test_client()
+        service_id = self.create_test_service()
+        for day in range(1, 8):
+            save_invoice(client_id, service_id, 1, f'2025-02-0{day}', f'X-{day}', apply_iva=False, apply_irpf=False)
+        save_invoice(client_id, service_id, 1, '2024-12-31', 'X-OLD', apply_iva=False, apply_irpf=False)
+        add_expense(1, 'Papel y tóner', 42.5, '2025-03-01', notes='Oficina')
+        add_expense(1, 'Old expense', 10, '2024-03-01')
+        add_income(1, 'Consultoría', 1000, '2025-04-01')
+
+    def test_rows_are_fetched_in_batches_across_the_year(self):
+        """Test that small batches still yield every row of the year, in date order."""
+        # Act
+        rows = list(iter_export_rows('invoices', {'year': 2025}, batch_size=3))
+
+        # Assert
+        self.assertEqual([row[1] for row in rows], [f'X-{day}' for day in range(1, 8)])
+
+    def test_csv_has_header_and_chunks_per_batch(self):
+        """Test the CSV chunks of an export."""
+        # Act
+        chunks = list(iter_csv('invoices', {'year': '2025'}, batch_size=3))
+
+        # Assert
+        self.assertEqual(len(chunks), 3)
+        self.assertTrue(chunks[0].startswith('\ufeff'))
+        records = list(csv.reader(io.StringIO(''.join(chunks).lstrip('\ufeff'))))
+        self.assertEqual(tuple(records[0]), INVOICE_LIST_COLUMNS)
+        self.assertEqual(len(records), 8)
+
+    def test_expense_csv_filters_by_year(self):
+        """Test the expenses export and its year filter."""
+        # Act
+        text = ''.join(iter_csv('expenses', {'year': 2025}))
+
+        # Assert
+        self.assertIn('Papel y tóner', text)
+        self.assertIn('42.5', text)
+        self.assertNotIn('Old expense', text)
+
+    def test_xlsx_writes_dates_as_dates(self):
+        """Test the XLSX workbook of the incomes export."""
+        # Act
+        data = b''.join(iter_xlsx('incomes', {'year': 2025}))
+
+        # Assert
+        sheet = load_workbook(io.BytesIO(data)).active
+        rows = list(sheet.iter_rows(values_only=True))
+        self.assertEqual(rows[0], ('id', 'date', 'description', 'source', 'amount', 'notes'))
+        self.assertEqual(rows[1][1].date(), date(2025, 4, 1))
+        self.assertEqual(rows[1][2], 'Consultoría')
+
+    def test_formula_like_text_is_escaped(self):
+        """Test that text starting like a formula is exported as text in CSV and XLSX."""
+        # Arrange
+        add_expense(1, '=HYPERLINK("http://example.com")', 5, '2025-05-01', notes='@SUM(A1)')
+
+        # Act
+        text = ''.join(iter_csv('expenses', {'year': 2025}))
+        data = b''.join(iter_xlsx('expenses', {'year': 2025}))
+
+        # Assert
+        records = list(csv.reader(io.StringIO(text.lstrip('\ufeff'))))
+        self.assertIn("'=HYPERLINK(\"http://example.com\")", records[-1])
+        self.assertIn("'@SUM(A1)", records[-1])
+        rows = list(load_workbook(io.BytesIO(data)).active.iter_rows(values_only=True))
+        self.assertIn("'=HYPERLINK(\"http://example.com\")", rows[-1])
+
+    def test_invalid_filters_fail_before_streaming(self):
+        """Test that invalid input raises when the export is created."""
+        # Act / Assert
+        with self.assertRaises(ValueError):
+            iter_csv('invoices', {'month': '13'})
+        with self.assertRaises(ValueError):
+            iter_xlsx('expenses', {'year': 'abc'})
+        with self.assertRaises(ValueError):
+            iter_csv('payroll')
+
+
+if __name__ == '__main__':
+    unittest.main()
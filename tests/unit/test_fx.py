@@ -0,0 +1,137 @@
+"""
+Unit tests for historical exchange rates and multi-currency revenue.
+"""
+import unittest
+import os
+from tests.test_base import TestBase, DatabaseTestMixin
+from src.models.clients import add_client
+from src.models.db import get_db_connection
+from src.models.fx import FxRateIndex, get_rate_index, import_fx_rates, save_fx_rates
+from src.models.invoices import save_invoice
+from src.models.stats import get_revenue_stats_by_month
+
+ECB_XML = '''<?xml version="1.0" encoding="UTF-8"?>
+<gesmes:Envelope xmlns:gesmes="http://www.gesmes.org/xml/2002-08-01" xmlns="http://www.ecb.int/vocabulary/2002-08-01/eurofxref">
+  <Cube>
+    <Cube time="2025-03-03"><Cube currency="USD" rate="1.05"/><Cube currency="GBP" rate="0.83"/></Cube>
+    <Cube time="2025-03-01"><Cube currency="USD" rate="1.04"/></Cube>
+  </Cube>
+</gesmes:Envelope>
+'''
+
+
+class FxRateIndexTests(unittest.TestCase):
+    """Tests for as-of-date rate lookup and batch conversion."""
+
+    def setUp(self):
+        """Build an index with a short USD history."""
+        self.index = FxRateIndex([
+            ('2025-01-01', 'USD', 1.10),
+            ('2025-02-01', 'USD', 1.00),
+            ('2025-01-01', 'GBP', 0.80),
+        ])
+
+    def test_rate_on_uses_latest_rate_not_after_date(self):
+        """Test as-of lookup between, on and before published dates."""
+        # Assert
+        self.assertEqual(self.index.rate_on('USD', '2025-01-31'), 1.10)
+        self.assertEqual(self.index.rate_on('USD', '2025-02-01'), 1.00)
+        self.assertEqual(self.index.rate_on('USD', '2024-12-31'), 1.10)
+        self.assertEqual(self.index.rate_on('EUR', '2025-01-15'), 1.0)
+
+    def test_convert_many_matches_single_conversions(self):
+        """Test that batch conversion gives the same result as row-by-row lookup."""
+        # Arrange
+        rows = [('2025-02-10', 'USD', 100.0), ('2025-01-10', 'USD', 110.0),
+                ('2025-01-10', 'GBP', 80.0), ('2025-01-10', 'EUR', 50.0)]
+
+        # Act
+        converted = self.index.convert_many(rows)
+
+        # Assert
+        self.assertEqual([round(value, 6) for value in converted], [100.0, 100.0, 100.0, 50.0])
+        self.assertAlmostEqual(self.index.convert(100.0, 'EUR', '2025-01-10', target='GBP'), 80.0)
+
+    def test_unknown_currency_falls_back(self):
+        """Test the default USD rate and unconverted amounts for unknown currencies."""
+        # Arrange
+        empty = FxRateIndex()
+
+        # Act
+        usd, unknown = empty.convert_many([('2025-01-01', 'USD', 100.0), ('2025-01-01', 'XYZ', 5.0)])
+
+        # Assert
+        self.assertAlmostEqual(usd, 85.0)
+        self.assertEqual(unknown, 5.0)
+
+
+class FxRateStorageTests(TestBase, DatabaseTestMixin):
+    """Tests for importing rates and converting revenue statistics."""
+
+    def test_import_ecb_xml(self):
+        """Test importing an ECB eurofxref XML file."""
+        # Arrange
+        path = os.path.join(self.test_dir, 'eurofxref.xml')
+        with open(path, 'w') as f:
+            f.write(ECB_XML)
+
+        # Act
+        count = import_fx_rates(path)
+
+        # Assert
+        self.assertEqual(count, 3)
+        self.assertEqual(get_rate_index().rate_on('USD', '2025-03-02'), 1.04)
+
+    def test_import_csv(self):
+        """Test importing a date,currency,rate CSV file."""
+        # Arrange
+        path = os.path.join(self.test_dir, 'rates.csv')
+        with open(path, 'w') as f:
+            f.write('date,currency,rate\n02/01/2025,usd,1.03\n2025-01-03,GBP,N/A\n')
+
+        # Act
+        count = import_fx_rates(path)
+
+        # Assert
+        self.assertEqual(count, 1)
+        self.assertRecordCount('fx_rates', 1)
+        self.assertEqual(get_rate_index().rate_on('USD', '2025-01-05'), 1.03)
+
+    def test_corrected_rate_reloads_index(self):
+        """Test that correcting a stored rate in place is picked up by the cached index."""
+        # Arrange
+        save_fx_rates([('2025-01-01', 'USD', 1.25), ('2025-02-01', 'USD', 1.0)])
+        stale_rate = get_rate_index().rate_on('USD', '2025-01-15')
+
+        # Act
+        save_fx_rates([('2025-01-01', 'USD', 1.1)])
+        with get_db_connection() as conn:
+            conn.execute("UPDATE fx_rates SET rate = 0.9 WHERE date = '2025-02-01'")
+            conn.commit()
+
+        # Assert
+        self.assertEqual(stale_rate, 1.25)
+        self.assertEqual(get_rate_index().rate_on('USD', '2025-01-15'), 1.1)
+        self.assertEqual(get_rate_index().rate_on('USD', '2025-02-15'), 0.9)
+
+    def test_revenue_stats_convert_at_invoice_date(self):
+        """Test that revenue in foreign currencies uses the rate of each invoice date."""
+        # Arrange
+        save_fx_rates([('2025-01-01', 'USD', 1.25), ('2025-02-01', 'USD', 1.0)])
+        usd_client = add_client('US Client', 'US1', 'Street', 'USA', 'us@example.com', 'USD', '$')
+        eur_client = self.create_test_client()
+        service_id = self.create_test_service()  # 100.0 per unit
+        save_invoice(usd_client, service_id, 1, '2025-01-15', 'FX-1', apply_iva=False, apply_irpf=False)
+        save_invoice(usd_client, service_id, 1, '2025-02-15', 'FX-2', apply_iva=False, apply_irpf=False)
+        save_invoice(eur_client, service_id, 1, '2025-02-20', 'FX-3', apply_iva=False, apply_irpf=False)
+
+        # Act
+        stats = get_revenue_stats_by_month(2025)
+
+        # Assert
+        self.assertEqual([(month, round(amount, 2), symbol) for month, amount, symbol in stats],
+                         [(1, 80.0, '€'), (2, 200.0, '€')])
+
+
+if __name__ == '__main__':
+    unittest.main()
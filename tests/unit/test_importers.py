@@ -0,0 +1,240 @@
+"""
+Unit tests for the bank statement format plugins.
+"""
+import os
+import unittest
+from openpyxl import Workbook
+from tests.test_base import TestBase, DatabaseTestMixin
+from src.finance import importers
+from src.finance.bbva_import import import_statement
+from src.finance.expenses import get_expenses, get_incomes
+from src.finance.importers.base import parse_amount
+
+OFX_STATEMENT = '''OFXHEADER:100
+DATA:OFXSGML
+VERSION:102
+
+<OFX>
+<BANKMSGSRSV1><STMTTRNRS><STMTRS>
+<BANKTRANLIST>
+<STMTTRN>
+<TRNTYPE>DEBIT
+<DTPOSTED>20250510120000[+1:CET]
+<TRNAMT>-25.50
+<FITID>1
+<NAME>Taxi aeropuerto
+</STMTTRN>
+<STMTTRN>
+<TRNTYPE>CREDIT
+<DTPOSTED>20250511
+<TRNAMT>1200.00
+<FITID>2
+<NAME>Cliente &amp; Co
+<MEMO>Factura abril
+</STMTTRN>
+</BANKTRANLIST>
+</STMTRS></STMTTRNRS></BANKMSGSRSV1>
+</OFX>
+'''
+
+CAMT_STATEMENT = '''<?xml version="1.0" encoding="UTF-8"?>
+<Document xmlns="urn:iso:std:iso:20022:tech:xsd:camt.053.001.02">
+  <BkToCstmrStmt>
+    <Stmt>
+      <Ntry>
+        <Amt Ccy="EUR">25.50</Amt>
+        <CdtDbtInd>DBIT</CdtDbtInd>
+        <BookgDt><Dt>2025-05-10</Dt></BookgDt>
+        <NtryDtls><TxDtls>
+          <RltdPties><Cdtr><Nm>Taxi aeropuerto</Nm></Cdtr></RltdPties>
+        </TxDtls></NtryDtls>
+      </Ntry>
+      <Ntry>
+        <Amt Ccy="EUR">1200.00</Amt>
+        <CdtDbtInd>CRDT</CdtDbtInd>
+        <BookgDt><DtTm>2025-05-11T09:30:00</DtTm></BookgDt>
+        <NtryDtls><TxDtls>
+          <RmtInf><Ustrd>Factura abril</Ustrd></RmtInf>
+        </TxDtls></NtryDtls>
+      </Ntry>
+    </Stmt>
+  </BkToCstmrStmt>
+</Document>
+'''
+
+NORMA43_STATEMENT = '\n'.join(line.ljust(80) for line in (
+    '11018200001234567890250501250531' + '2' + '00000000100000' + '978' + '3' + 'EMPRESA',
+    '22    0001250510250510120001000000000025500000000000' + ' ' * 12 + 'REF',
+    '2301TAXI AEROPUERTO',
+    '22    0001250511250511020002000000001200000000000000' + ' ' * 12 + 'CLIENTE ABRIL',
+    '33018200001234567890',
+    '88' + '9' * 18,
+))
+
+
+class StatementImportersTests(TestBase, DatabaseTestMixin):
+    """Tests for detecting and parsing the supported statement formats."""
+
+    def write_file(self, name, content, encoding='utf-8'):
+        """Write a statement to the test directory and return its path."""
+        path = os.path.join(self.test_dir, name)
+        with open(path, 'w', encoding=encoding, newline='') as f:
+            f.write(content)
+        return path
+
+    def parse(self, path):
+        """Detect the format of a statement and return it with its transactions."""
+        statement_format, transactions = importers.iter_transactions(path)
+        return statement_format.name, list(transactions)
+
+    def test_parse_amount_understands_spanish_and_english_notation(self):
+        """Test amounts written with either decimal separator."""
+        # Arrange
+        values = {'1.234,56': 1234.56, '1,234.56': 1234.56, '-12,5 €': -12.5, '(30.00)': -30.0, '45-': -45.0,
+                  '1,500': 1500.0, 7: 7.0}
+
+        # Act
+        parsed = {value: parse_amount(value) for value in values}
+
+        # Assert
+        self.assertEqual(parsed, values)
+        with self.assertRaises(ValueError):
+            parse_amount('n/a')
+
+    def test_csv_with_preamble_semicolons_and_debit_credit_columns(self):
+        """Test a CSV statement in Windows-1252 with account lines before its header."""
+        # Arrange
+        path = self.write_file('movimientos.csv', (
+            'Cuenta;ES00 0000 0000 0000\r\n'
+            '\r\n'
+            'Fecha;Concepto;Cargo;Abono\r\n'
+            '10/05/2025;Taxi aeropuerto;25,50;\r\n'
+            '11/05/2025;Transferencia recibida;;1.200,00\r\n'
+            '12/05/2025;Sin importe;;\r\n'
+        ), encoding='cp1252')
+
+        # Act
+        name, transactions = self.parse(path)
+
+        # Assert
+        self.assertEqual(name, 'csv')
+        self.assertEqual([(t['date'], t['description'], t['amount'], t['type']) for t in transactions], [
+            ('2025-05-10', 'Taxi aeropuerto', -25.5, 'expense'),
+            ('2025-05-11', 'Transferencia recibida', 1200.0, 'income'),
+        ])
+
+    def test_ofx_transactions(self):
+        """Test an OFX 1.x statement with unclosed elements."""
+        # Arrange
+        path = self.write_file('statement.ofx', OFX_STATEMENT)
+
+        # Act
+        name, transactions = self.parse(path)
+
+        # Assert
+        self.assertEqual(name, 'ofx')
+        self.assertEqual([(t['date'], t['description'], t['amount'], t['movement']) for t in transactions], [
+            ('2025-05-10', 'Taxi aeropuerto', -25.5, 'DEBIT'),
+            ('2025-05-11', 'Cliente & Co Factura abril', 1200.0, 'CREDIT'),
+        ])
+
+    def test_ofx_tags_split_across_chunks(self):
+        """Test that a tag cut by the read chunk boundary is still parsed."""
+        # Arrange
+        path = self.write_file('statement.qfx', OFX_STATEMENT)
+        original = importers.ofx.CHUNK_SIZE
+        importers.ofx.CHUNK_SIZE = 7
+        self.addCleanup(setattr, importers.ofx, 'CHUNK_SIZE', original)
+
+        # Act
+        name, transactions = self.parse(path)
+
+        # Assert
+        self.assertEqual([t['amount'] for t in transactions], [-25.5, 1200.0])
+
+    def test_camt053_entries(self):
+        """Test a CAMT.053 statement with debit and credit entries."""
+        # Arrange
+        path = self.write_file('statement.xml', CAMT_STATEMENT)
+
+        # Act
+        name, transactions = self.parse(path)
+
+        # Assert
+        self.assertEqual(name, 'camt053')
+        self.assertEqual([(t['date'], t['description'], t['amount']) for t in transactions], [
+            ('2025-05-10', 'Taxi aeropuerto', -25.5),
+            ('2025-05-11', 'Factura abril', 1200.0),
+        ])
+
+    def test_norma43_movements_with_concept_records(self):
+        """Test a Norma 43 statement: concepts from record 23, or the reference without one."""
+        # Arrange
+        path = self.write_file('statement.n43', NORMA43_STATEMENT, encoding='cp1252')
+
+        # Act
+        name, transactions = self.parse(path)
+
+        # Assert
+        self.assertEqual(name, 'norma43')
+        self.assertEqual(
+            [(t['date'], t['description'], t['amount'], t['movement']) for t in transactions], [
+                ('2025-05-10', 'TAXI AEROPUERTO', -25.5, 'Tarjetas de crédito/débito'),
+                ('2025-05-11', 'CLIENTE ABRIL', 1200.0, 'Abonarés - entregas - ingresos'),
+            ])
+
+    def test_detects_excel_and_rejects_unknown_files(self):
+        """Test detection of workbooks and of files in no supported format."""
+        # Arrange
+        workbook = Workbook()
+        workbook.active.append(('Fecha', 'Concepto', 'Importe'))
+        excel_path = os.path.join(self.test_dir, 'statement.xlsx')
+        workbook.save(excel_path)
+        unknown_path = self.write_file('notes.pdf', '%PDF-1.4')
+
+        # Act
+        statement_format = importers.detect_format(excel_path)
+
+        # Assert
+        self.assertEqual(statement_format.name, 'xlsx')
+        with self.assertRaises(ValueError):
+            importers.detect_format(unknown_path)
+        with self.assertRaises(ValueError):
+            importers.get_format('qif')
+
+    def test_import_statement_runs_csv_through_the_import_pipeline(self):
+        """Test that a CSV statement is categorized and stored like an Excel one."""
+        # Arrange
+        path = self.write_file('statement.csv', (
+            'Date,Description,Amount\n'
+            '2025-05-10,Pago con TARJETA taxi,-25.50\n'
+            '2025-05-11,Cliente abril,1200.00\n'
+        ))
+
+        # Act
+        result = import_statement(path)
+
+        # Assert
+        self.assertTrue(result['success'], result)
+        self.assertEqual(result['format'], 'csv')
+        self.assertEqual((result['expenses_imported'], result['incomes_imported']), (1, 1))
+        expense = get_expenses()[0]
+        self.assertEqual(expense[5], 'Tarjeta')
+        self.assertIn('Imported from CSV statement', expense)
+        self.assertEqual(len(get_incomes()), 1)
+
+    def test_import_statement_reports_unrecognized_files(self):
+        """Test that a file in no supported format fails without importing anything."""
+        # Arrange
+        path = self.write_file('notes.csv', 'just some text')
+
+        # Act
+        result = import_statement(path)
+
+        # Assert
+        self.assertFalse(result['success'])
+        self.assertEqual(result['expenses_imported'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+"""
+Unit tests for paginated invoice listings in the Invoice Generator.
+"""
+import unittest
+from tests.test_base import TestBase, DatabaseTestMixin
+from src.models.invoices import save_invoice, get_invoices_page, get_invoice_summary_by_year
+
+
+class InvoicePaginationTests(TestBase, DatabaseTestMixin):
+    """Tests for keyset pagination and SQL totals."""
+
+    def setUp(self):
+        """Create seven invoices, two of them on the same day."""
+        super().setUp()
+        self.client_id = self.create_test_client()
+        self.service_id = self.create_test_service()  # 100.0 per unit
+        dates = ['2025-01-05', '2025-02-05', '2025-02-05', '2025-03-05', '2025-04-05', '2025-05-05', '2024-12-31']
+        for index, invoice_date in enumerate(dates, start=1):
+            save_invoice(self.client_id, self.service_id, 1, invoice_date, f'P-{index}',
+                         apply_iva=False, apply_irpf=False)
+
+    def test_pages_cover_year_without_gaps_or_duplicates(self):
+        """Test walking every page of a year with a small page size."""
+        # Act
+        numbers = []
+        after = None
+        pages = 0
+        while True:
+            rows, after = get_invoices_page(2025, limit=2, after=after)
+            numbers.extend(row[1] for row in rows)
+            pages += 1
+            if after is None:
+                break
+
+        # Assert
+        self.assertEqual(pages, 3)
+        self.assertEqual(numbers, ['P-6', 'P-5', 'P-4', 'P-3', 'P-2', 'P-1'])
+
+    def test_invalid_cursor_starts_from_first_page(self):
+        """Test that a malformed cursor is ignored."""
+        # Act
+        rows, next_cursor = get_invoices_page(2025, limit=10, after='garbage')
+
+        # Assert
+        self.assertEqual(len(rows), 6)
+        self.assertIsNone(next_cursor)
+
+    def test_summary_is_computed_for_whole_year(self):
+        """Test the SQL aggregate totals of a year."""
+        # Act
+        summary = get_invoice_summary_by_year(2025)
+
+        # Assert
+        self.assertEqual(summary['count'], 6)
+        self.assertFloatEqual(summary['total_amount'], 600.0)
+        self.assertEqual(summary['unique_clients'], 1)
+        self.assertEqual(summary['client_names'], ['Test Client LLC'])
+
+
+if __name__ == '__main__':
+    unittest.main()
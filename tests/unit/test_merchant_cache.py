@@ -0,0 +1,104 @@
+"""
+Unit tests for the merchant to category cache used by statement imports.
+"""
+import os
+import unittest
+from openpyxl import Workbook
+from tests.test_base import TestBase
+from src.finance.bbva_import import import_bbva_statement
+from src.finance.categorization_rules import save_categorization_rule
+from src.finance.expenses import add_expense, get_expenses
+from src.finance.merchant_cache import (
+    MerchantCache, MerchantCategory, learn_manual_category, merchant_cache, normalize_merchant
+)
+from src.models.db import get_db_connection
+from src.models.migrations import _create_merchant_categories
+
+
+class MerchantCacheTests(TestBase):
+    """Tests for remembering, looking up and evicting merchant categories."""
+
+    def test_normalize_merchant(self):
+        """Test that dates, numbers, punctuation and padding are dropped."""
+        # Assert
+        self.assertEqual(normalize_merchant('Macao nikkei    madrid  es 12/05'), 'MACAO NIKKEI MADRID ES')
+        self.assertEqual(normalize_merchant('Recibo nº 4411-22 Movistar'), 'RECIBO N MOVISTAR')
+        self.assertEqual(normalize_merchant(None), '')
+
+    def test_lookups_are_bounded_and_counted(self):
+        """Test the LRU bound and the hit and miss counters."""
+        # Arrange
+        cache = MerchantCache(max_entries=2)
+        cache.learn('expense', {'TAXI': MerchantCategory(2, None)}, 'import', rules_version=7)
+
+        # Act
+        first = cache.get_many('expense', ['TAXI', 'BAR PEPE'], 7)
+        second = cache.get_many('expense', ['TAXI', 'BAR PEPE'], 7)
+        cache.get_many('expense', ['LIBRERIA'], 7)
+        stats = cache.get_stats()
+
+        # Assert
+        self.assertEqual(first, {'TAXI': MerchantCategory(2, None)})
+        self.assertEqual(second, first)
+        self.assertEqual((stats['hits'], stats['misses'], stats['evictions']), (2, 3, 1))
+        self.assertEqual(stats['entries'], 2)
+        self.assertAlmostEqual(stats['hit_rate'], 0.4)
+
+    def test_manual_categories_win_and_import_ones_follow_the_rules_version(self):
+        """Test that imports don't replace manual categories and expire with the rules."""
+        # Arrange
+        learn_manual_category('expense', 'Libreria Central', 9, True)
+
+        # Act
+        merchant_cache.learn('expense', {'LIBRERIA CENTRAL': MerchantCategory(1, None),
+                                         'TAXI': MerchantCategory(2, None)}, 'import', rules_version=3)
+        current = merchant_cache.get_many('expense', ['LIBRERIA CENTRAL', 'TAXI'], 3)
+        after_rules_change = merchant_cache.get_many('expense', ['LIBRERIA CENTRAL', 'TAXI'], 4)
+
+        # Assert
+        self.assertEqual(current, {'LIBRERIA CENTRAL': MerchantCategory(9, True), 'TAXI': MerchantCategory(2, None)})
+        self.assertEqual(after_rules_change, {'LIBRERIA CENTRAL': MerchantCategory(9, True)})
+
+    def test_migration_learns_manual_expenses(self):
+        """Test that existing expenses entered by hand seed the cache, the latest one winning."""
+        # Arrange
+        add_expense(1, 'Coworking Sol 05/2025', 100, '2025-05-01')
+        add_expense(4, 'Coworking Sol 06/2025', 100, '2025-06-01', tax_deductible=False)
+        add_expense(2, 'Imported row', 5, '2025-06-01', notes='Imported from BBVA statement')
+
+        # Act
+        with get_db_connection() as conn:
+            _create_merchant_categories(conn)
+            conn.commit()
+
+        # Assert
+        self.assertEqual(merchant_cache.get_many('expense', ['COWORKING SOL', 'IMPORTED ROW'], 0),
+                         {'COWORKING SOL': MerchantCategory(4, False)})
+
+    def test_import_uses_known_merchants(self):
+        """Test that a second import categorizes from the cache, and manual categories apply."""
+        # Arrange
+        workbook = Workbook()
+        workbook.active.append(('Fecha', 'Concepto', 'Movimiento', 'Importe'))
+        workbook.active.append(('02/03/2025', 'Taxi 1234', 'Pago con tarjeta', -12))
+        workbook.active.append(('03/03/2025', 'Coworking Sol', 'Recibo', -100))
+        path = os.path.join(self.test_dir, 'merchants.xlsx')
+        workbook.save(path)
+        learn_manual_category('expense', 'COWORKING SOL 01/2025', 4, True)
+
+        # Act
+        first = import_bbva_statement(path, check_duplicates=False)
+        second = import_bbva_statement(path, check_duplicates=False)
+        save_categorization_rule('taxi', 'contains', 'expense', target_id=8, priority=1)
+        third = import_bbva_statement(path, check_duplicates=False)
+
+        # Assert
+        self.assertEqual(first['categorized_from_cache'], 1)
+        self.assertEqual(second['categorized_from_cache'], 2)
+        self.assertEqual(third['categorized_from_cache'], 1)
+        categories = sorted((expense[2], expense[1]) for expense in get_expenses())
+        self.assertEqual(categories, [('Coworking Sol', 4)] * 3 + [('Taxi 1234', 2)] * 2 + [('Taxi 1234', 8)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+"""
+Unit tests for the versioned schema migrations in the Invoice Generator.
+"""
+import unittest
+from tests.test_base import TestBase, DatabaseTestMixin
+from src.models.db import get_db_connection, init_db
+from src.models.migrations import migrate, get_schema_version, get_latest_version
+
+
+class MigrationTests(TestBase, DatabaseTestMixin):
+    """Tests for the schema migration engine."""
+
+    def test_new_database_is_current(self):
+        """Test that init_db brings a new database to the latest version."""
+        # Act
+        with get_db_connection() as conn:
+            version = get_schema_version(conn)
+
+        # Assert
+        self.assertEqual(version, get_latest_version())
+        self.assertTableExists('schema_version')
+        self.assertTableExists('expenses')
+        self.assertTableExists('incomes')
+        self.assertTableExists('expense_categories')
+        self.assertTableExists('income_sources')
+
+    def test_current_database_skips_migrations(self):
+        """Test that running migrations on a current database does nothing."""
+        # Act
+        with get_db_connection() as conn:
+            applied = migrate(conn)
+        init_db()
+
+        # Assert
+        self.assertEqual(applied, [])
+        self.assertRecordCount('schema_version', get_latest_version())
+
+    def test_legacy_database_is_upgraded(self):
+        """Test that a pre-migration database gets its missing columns and backfills."""
+        # Arrange: rebuild the tables the way old versions created them
+        with get_db_connection() as conn:
+            conn.executescript('''
+            DROP TABLE schema_version;
+            DROP TABLE clients;
+            DROP TABLE invoices;
+            CREATE TABLE clients (id INTEGER PRIMARY KEY, name TEXT NOT NULL, tax_id TEXT NOT NULL,
+                                  address TEXT NOT NULL, country TEXT NOT NULL, email TEXT);
+            CREATE TABLE invoices (id INTEGER PRIMARY KEY, client_id INTEGER NOT NULL, service_id INTEGER NOT NULL,
+                                   quantity INTEGER NOT NULL, date TEXT NOT NULL, invoice_number TEXT NOT NULL,
+                                   apply_iva BOOLEAN DEFAULT 1, apply_irpf BOOLEAN DEFAULT 1);
+            INSERT INTO clients (name, tax_id, address, country) VALUES ('US Co', 'X1', 'Addr', 'usa');
+            INSERT INTO clients (name, tax_id, address, country) VALUES ('ES Co', 'X2', 'Addr', 'Spain');
+            INSERT INTO invoices (client_id, service_id, quantity, date, invoice_number)
+            VALUES (1, 1, 1, '15/04/2024', '2403-UC-3');
+            ''')
+
+            # Act
+            applied = migrate(conn)
+            currencies = conn.execute('SELECT currency_code, currency_symbol FROM clients ORDER BY id').fetchall()
+            invoice_date = conn.execute('SELECT date FROM invoices').fetchone()[0]
+            counter = conn.execute(
+                "SELECT last_value FROM number_sequences WHERE series = 'invoice:UC' AND period = '2403'"
+            ).fetchone()
+
+        # Assert
+        self.assertEqual(applied, list(range(1, get_latest_version() + 1)))
+        self.assertEqual(currencies, [('USD', '$'), ('EUR', '€')])
+        self.assertEqual(invoice_date, '2024-04-15')
+        self.assertEqual(counter, (3,))
+        self.assertColumnExists('invoices', 'total_amount')
+
+    def test_number_sequences_are_seeded_for_non_ascii_prefixes(self):
+        """Test that client prefixes with accents or punctuation get their counters seeded."""
+        # Arrange: a database from before the number sequences
+        with get_db_connection() as conn:
+            conn.executescript('''
+            DROP TABLE number_sequences;
+            DELETE FROM schema_version WHERE version >= 6;
+            DELETE FROM invoices;
+            INSERT INTO invoices (client_id, service_id, quantity, date, invoice_number)
+            VALUES (1, 1, 1, '2024-04-15', '2403-ÑT-4');
+            INSERT INTO invoices (client_id, service_id, quantity, date, invoice_number)
+            VALUES (1, 1, 1, '2024-04-16', '2403-A&B-2');
+            INSERT INTO invoices (client_id, service_id, quantity, date, invoice_number)
+            VALUES (1, 1, 1, '2024-04-17', '2403-A&B-7');
+            ''')
+
+            # Act
+            migrate(conn)
+            counters = conn.execute(
+                "SELECT series, last_value FROM number_sequences WHERE period = '2403' ORDER BY series"
+            ).fetchall()
+
+        # Assert
+        self.assertEqual(counters, [('invoice:A&B', 7), ('invoice:ÑT', 4)])
+
+
+if __name__ == '__main__':
+    unittest.main()
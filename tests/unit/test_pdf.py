@@ -0,0 +1,188 @@
+"""
+Unit tests for server-side PDF rendering of invoices and estimates.
+"""
+import os
+import re
+import time
+import unittest
+import zipfile
+import zlib
+from unittest.mock import patch
+from tests.test_base import TestBase, DatabaseTestMixin
+from src import utils
+from src.models.invoices import save_invoice, get_invoice_by_number
+from src.pdf import service as pdf_service
+from src.pdf.documents import invoice_document
+from src.pdf.layout import render_document
+from src.pdf.writer import text_width, wrap_text
+
+
+def page_text(pdf_bytes):
+    """Decode the text drawn on the pages of a PDF written by PdfWriter."""
+    streams = re.findall(rb'stream\n(.*?)\nendstream', pdf_bytes, re.S)
+    content = b'\n'.join(zlib.decompress(stream) for stream in streams).decode('cp1252')
+    return re.findall(r'\((.*?)\) Tj', content)
+
+
+class PdfWriterTests(unittest.TestCase):
+    """Tests for the PDF writer and page layout."""
+
+    def setUp(self):
+        """Build a document dict with non-ASCII text and a long description."""
+        self.document = {
+            'title': 'INVOICE', 'number': 'F-1', 'fields': [('Date', '01/06/2025')],
+            'issuer': {'name': 'Iñigo Pérez', 'lines': ['Madrid']},
+            'client': {'name': 'Cliente', 'lines': ['Tax ID: X1']},
+            'items': [('Consultoría ' * 40, 2, '€100.00/hour', '€200.00')],
+            'summary': [('Subtotal', '€200.00')], 'total': ('TOTAL', '€200.00'),
+            'payment': ['Bank transfer'], 'notes': ['Note ' * 3000],
+        }
+
+    def test_cross_reference_table_points_at_objects(self):
+        """Test that every xref entry points at the start of its object."""
+        # Act
+        pdf = render_document(self.document)
+
+        # Assert
+        self.assertTrue(pdf.startswith(b'%PDF-1.4'))
+        self.assertTrue(pdf.endswith(b'%%EOF\n'))
+        xref_offset = int(pdf.rsplit(b'startxref\n', 1)[1].split(b'\n')[0])
+        entries = pdf[xref_offset:].split(b'\n')
+        for object_id in range(1, int(entries[1].split()[1])):
+            offset = int(entries[2 + object_id][:10])
+            self.assertTrue(pdf[offset:].startswith(b'%d 0 obj' % object_id))
+
+    def test_text_is_encoded_and_overflow_starts_new_page(self):
+        """Test WinAnsi text and page breaks for long content."""
+        # Act
+        pdf = render_document(self.document)
+
+        # Assert
+        text = page_text(pdf)
+        self.assertIn('Iñigo Pérez', text)
+        self.assertIn('€200.00', text)
+        self.assertRegex(pdf, rb'/Count [2-9]')
+
+    def test_output_is_deterministic(self):
+        """Test that the same document renders to the same bytes."""
+        # Act / Assert
+        self.assertEqual(render_document(self.document), render_document(self.document))
+
+    def test_wrap_text_fits_width(self):
+        """Test word wrapping against the font metrics."""
+        # Act
+        lines = wrap_text('word ' * 50, 10, 100)
+
+        # Assert
+        self.assertGreater(len(lines), 1)
+        self.assertTrue(all(text_width(line, 10) <= 100 for line in lines))
+
+
+class PdfServiceTests(TestBase, DatabaseTestMixin):
+    """Tests for the PDF cache and month exports."""
+
+    def setUp(self):
+        """Create invoices in two months."""
+        super().setUp()
+        client_id = self.create_test_client()
+        service_id = self.create_test_service()
+        save_invoice(client_id, service_id, 1, '2025-05-02', 'M-1', apply_iva=True, apply_irpf=True)
+        save_invoice(client_id, service_id, 2, '2025-05-20', 'M-2', apply_iva=False, apply_irpf=False)
+        save_invoice(client_id, service_id, 3, '2025-06-01', 'J-1', apply_iva=False, apply_irpf=False)
+
+    def test_invoice_pdf_is_rendered_once(self):
+        """Test that an unchanged invoice is served from the content-addressed cache."""
+        # Arrange
+        with patch.object(pdf_service, 'PDF_WORKERS', 0), \
+                patch.object(pdf_service, 'render_document', wraps=render_document) as render:
+            # Act
+            first = pdf_service.get_invoice_pdf('M-1')
+            second = pdf_service.get_invoice_pdf('M-1')
+
+        # Assert
+        self.assertEqual(first, second)
+        self.assertEqual(render.call_count, 1)
+        self.assertTrue(first.startswith(pdf_service.get_pdf_cache_dir()))
+        with open(first, 'rb') as f:
+            text = page_text(f.read())
+        self.assertIn('M-1', text)
+        self.assertIn('Test Client LLC', text)
+        self.assertIsNone(pdf_service.get_invoice_pdf('MISSING'))
+
+    def test_tax_labels_match_the_amounts(self):
+        """Test that the VAT and income tax labels show the rates the amounts were calculated with."""
+        # Arrange
+        config = utils.load_config()
+        config['tax_rates'] = {'default_iva': 0.10, 'default_irpf': 0.07}
+        utils.save_config(config)
+        save_invoice(self.create_test_client(), self.create_test_service(), 1, '2025-05-03', 'M-3')
+
+        # Act
+        repriced = dict(invoice_document(get_invoice_by_number('M-3'), {'name': 'Issuer'})['summary'])
+        earlier = dict(invoice_document(get_invoice_by_number('M-1'), {'name': 'Issuer'})['summary'])
+
+        # Assert
+        self.assertEqual((repriced['VAT (10%)'], repriced['Income Tax (7%)']), ('€10.00', '-€7.00'))
+        self.assertEqual((earlier['VAT (21%)'], earlier['Income Tax (15%)']), ('€21.00', '-€15.00'))
+
+    def test_document_key_changes_with_content(self):
+        """Test that edited document data maps to a different cache entry."""
+        # Arrange
+        document = invoice_document(get_invoice_by_number('M-1'), {'name': 'Issuer'})
+
+        # Act
+        renamed = dict(document, client={'name': 'Renamed', 'lines': []})
+
+        # Assert
+        self.assertNotEqual(pdf_service.document_key(document), pdf_service.document_key(renamed))
+
+    def test_month_export_renders_on_worker_processes(self):
+        """Test a month export through the process pool, with progress reporting."""
+        # Arrange
+        output_path = os.path.join(self.test_dir, 'may.zip')
+        progress = []
+
+        # Act
+        with patch.object(pdf_service, 'PDF_WORKERS', 2):
+            try:
+                count = pdf_service.export_month_pdfs(2025, 5, output_path,
+                                                      progress=lambda done, total: progress.append((done, total)))
+            finally:
+                pdf_service.shutdown_pdf_workers()
+
+        # Assert
+        self.assertEqual(count, 2)
+        self.assertEqual(progress[-1], (2, 2))
+        with zipfile.ZipFile(output_path) as archive:
+            self.assertEqual(sorted(archive.namelist()), ['M-1.pdf', 'M-2.pdf'])
+            self.assertTrue(archive.read('M-2.pdf').startswith(b'%PDF'))
+
+    def test_old_exports_are_pruned_when_an_export_starts(self):
+        """Test that zip files past their download window are deleted by the next export."""
+        # Arrange
+        os.makedirs(pdf_service.get_export_dir(), exist_ok=True)
+        old_path = os.path.join(pdf_service.get_export_dir(), 'invoices-2025-04-old.zip')
+        recent_path = os.path.join(pdf_service.get_export_dir(), 'invoices-2025-04-new.zip')
+        for path in (old_path, recent_path):
+            with open(path, 'wb') as f:
+                f.write(b'PK')
+        expired = time.time() - pdf_service.EXPORT_MAX_AGE - 60
+        os.utime(old_path, (expired, expired))
+
+        # Act
+        with patch.object(pdf_service.threading, 'Thread'):
+            pdf_service.start_month_export(2025, 5)
+
+        # Assert
+        self.assertFalse(os.path.exists(old_path))
+        self.assertTrue(os.path.exists(recent_path))
+
+    def test_invalid_month_is_rejected(self):
+        """Test that an export job needs a valid month."""
+        # Act / Assert
+        with self.assertRaises(ValueError):
+            pdf_service.start_month_export(2025, 13)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+"""
+Unit tests for the write-behind user preference store.
+"""
+import sqlite3
+import unittest
+from unittest.mock import patch
+from tests.test_base import TestBase, DatabaseTestMixin
+from src.models.db import get_db_connection
+from src.models import preferences
+from src.models.preferences import get_preferences, set_preferences, flush_preferences
+
+
+class PreferenceTests(TestBase, DatabaseTestMixin):
+    """Tests for buffered preference writes."""
+
+    def setUp(self):
+        """Keep the background flush from firing during a test."""
+        super().setUp()
+        self.delay_patcher = patch('src.models.preferences.FLUSH_DELAY', 60)
+        self.delay_patcher.start()
+
+    def tearDown(self):
+        """Stop patching the flush delay."""
+        self.delay_patcher.stop()
+        super().tearDown()
+
+    def test_pending_values_are_visible_before_flush(self):
+        """Test that reads see buffered values that are not written yet."""
+        # Act
+        set_preferences(last_client_id=1000, last_service_id=7)
+
+        # Assert
+        self.assertEqual(get_preferences()['last_client_id'], 1000)
+        with get_db_connection() as conn:
+            stored = conn.execute("SELECT value FROM user_preferences WHERE key = 'last_client_id'").fetchone()
+        self.assertNotEqual(stored, ('1000',))
+
+    def test_writes_are_coalesced_into_one_flush(self):
+        """Test that repeated changes produce one row per key with the last value."""
+        # Arrange
+        for client_id in range(1, 6):
+            set_preferences(last_client_id=client_id, last_service_id=1)
+
+        # Act
+        written = flush_preferences()
+
+        # Assert
+        self.assertEqual(written, 2)
+        self.assertRecordCount('user_preferences', 2)
+        self.assertEqual(get_preferences(), {'last_client_id': 5, 'last_service_id': 1})
+
+    def test_failed_flush_keeps_values_for_the_next_one(self):
+        """Test that values are not lost when the database can't be written, and newer ones win."""
+        # Arrange
+        set_preferences(last_client_id=1, last_service_id=1)
+
+        # Act
+        with patch('src.models.preferences.get_db_connection',
+                   side_effect=sqlite3.OperationalError('database is locked')):
+            failed = flush_preferences()
+        retry_timer = preferences._timer
+        set_preferences(last_client_id=2)
+        written = flush_preferences()
+
+        # Assert
+        self.assertEqual(failed, 0)
+        self.assertIsNotNone(retry_timer)
+        self.assertEqual(written, 2)
+        with get_db_connection() as conn:
+            stored = dict(conn.execute('SELECT key, value FROM user_preferences').fetchall())
+        self.assertEqual(stored, {'last_client_id': '2', 'last_service_id': '1'})
+
+    def test_persistent_flush_failures_back_off_and_drop_values(self):
+        """Test that a database that keeps failing is retried with growing delays, then given up on."""
+        # Arrange
+        set_preferences(last_client_id=1)
+        delays = []
+
+        # Act
+        with patch('src.models.preferences.get_db_connection',
+                   side_effect=sqlite3.OperationalError('attempt to write a readonly database')):
+            for _ in range(preferences.MAX_FLUSH_RETRIES + 1):
+                flush_preferences()
+                if preferences._timer is not None:
+                    delays.append(preferences._timer.interval)
+
+        # Assert
+        self.assertEqual(delays, [60 * 2 ** attempt for attempt in range(1, preferences.MAX_FLUSH_RETRIES + 1)])
+        self.assertIsNone(preferences._timer)
+        self.assertNotIn('last_client_id', get_preferences())
+
+    def test_single_timer_per_flush_window(self):
+        """Test that only one background flush is scheduled for a burst of writes."""
+        # Act
+        set_preferences(last_client_id=1)
+        timer = preferences._timer
+        set_preferences(last_client_id=2)
+
+        # Assert
+        self.assertIsNotNone(timer)
+        self.assertIs(preferences._timer, timer)
+        flush_preferences()
+        self.assertIsNone(preferences._timer)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,144 @@
+"""
+Unit tests for the listing query builder used by invoice and estimate listings.
+"""
+import unittest
+from tests.test_base import TestBase, DatabaseTestMixin
+from src.models.invoices import save_invoice, list_invoices, summarize_invoices
+from src.models.estimates import save_estimate, list_estimates, summarize_estimates
+from src.models.clients import add_client
+from src.models.db import get_db_connection
+from src.models.queries import INVOICE_LISTING
+
+
+class InvoiceListingQueryTests(TestBase, DatabaseTestMixin):
+    """Tests for filtering and sorting invoices in SQL."""
+
+    def setUp(self):
+        """Create invoices for two clients with different amounts and tax flags."""
+        super().setUp()
+        self.client_id = self.create_test_client()
+        self.service_id = self.create_test_service()  # 100.0 per unit
+        self.other_client_id = add_client('Other 100%_Co', 'OTH1', 'Street', 'Country', 'other@example.com')
+        save_invoice(self.client_id, self.service_id, 1, '2025-01-10', 'Q-1', apply_iva=False, apply_irpf=False)
+        save_invoice(self.client_id, self.service_id, 3, '2025-02-10', 'Q-2', apply_iva=True, apply_irpf=False)
+        save_invoice(self.other_client_id, self.service_id, 2, '2025-02-20', 'Q-3', apply_iva=False, apply_irpf=False)
+        save_invoice(self.other_client_id, self.service_id, 5, '2025-03-01', 'Q-4', apply_iva=False, apply_irpf=False)
+
+    def numbers(self, **kwargs):
+        """List invoice numbers for the given listing arguments."""
+        rows, _ = list_invoices(**kwargs)
+        return [row[1] for row in rows]
+
+    def test_filters_by_client_month_and_flags(self):
+        """Test combining whitelisted filters."""
+        # Act / Assert
+        self.assertEqual(self.numbers(filters={'year': 2025, 'client': 'Other 100%_Co'}), ['Q-4', 'Q-3'])
+        self.assertEqual(self.numbers(filters={'year': 2025, 'month': '2'}), ['Q-3', 'Q-2'])
+        self.assertEqual(self.numbers(filters={'year': 2025, 'apply_iva': 'true'}), ['Q-2'])
+        self.assertEqual(self.numbers(filters={'min_amount': '250', 'max_amount': '400'}), ['Q-2'])
+
+    def test_empty_all_and_unknown_filters_are_ignored(self):
+        """Test that only whitelisted, non-empty filters restrict the listing."""
+        # Act
+        numbers = self.numbers(filters={'year': 2025, 'client': 'all', 'month': '', 'bogus': '1; DROP TABLE invoices'})
+
+        # Assert
+        self.assertEqual(len(numbers), 4)
+
+    def test_search_escapes_like_wildcards(self):
+        """Test that % and _ in a search term are matched literally."""
+        # Act / Assert
+        self.assertEqual(self.numbers(filters={'search': '100%_'}), ['Q-4', 'Q-3'])
+        self.assertEqual(self.numbers(filters={'search': '1%1'}), [])
+
+    def test_invalid_filter_value_raises(self):
+        """Test that a value that cannot be converted raises ValueError."""
+        # Act / Assert
+        with self.assertRaises(ValueError):
+            list_invoices(filters={'month': '13'})
+        with self.assertRaises(ValueError):
+            INVOICE_LISTING.where({'min_amount': 'lots'})
+
+    def test_sort_by_amount_pages_without_gaps(self):
+        """Test keyset pagination on a non-date sort key."""
+        # Act
+        numbers = []
+        after = None
+        while True:
+            rows, after = list_invoices(sort='amount', direction='asc', limit=1, after=after)
+            numbers.extend(row[1] for row in rows)
+            if after is None:
+                break
+
+        # Assert
+        self.assertEqual(numbers, ['Q-1', 'Q-3', 'Q-2', 'Q-4'])
+
+    def test_unknown_sort_falls_back_to_date(self):
+        """Test that a sort key outside the whitelist is not interpolated."""
+        # Act / Assert
+        self.assertEqual(self.numbers(sort='i.id; DROP TABLE invoices'), ['Q-4', 'Q-3', 'Q-2', 'Q-1'])
+
+    def test_summary_covers_all_matches(self):
+        """Test that summaries aggregate every matching row, not one page."""
+        # Act
+        summary = summarize_invoices({'year': 2025, 'client': 'Other 100%_Co'})
+
+        # Assert
+        self.assertEqual(summary['count'], 2)
+        self.assertFloatEqual(summary['total_amount'], 700.0)
+        self.assertEqual(summary['unique_clients'], 1)
+
+    def test_summary_totals_the_filtered_amount(self):
+        """Test that the summary adds up the amount the rows show and the amount filters use."""
+        # Arrange
+        filters = {'min_amount': '250'}
+
+        # Act
+        rows, _ = list_invoices(filters=filters)
+        summary = summarize_invoices(filters)
+
+        # Assert
+        self.assertEqual(sorted(row[1] for row in rows), ['Q-2', 'Q-4'])
+        self.assertEqual(summary['count'], len(rows))
+        self.assertFloatEqual(summary['total_amount'], sum(row[6] for row in rows))
+        self.assertFloatEqual(summary['total_amount'], 800.0)
+
+class EstimateListingQueryTests(TestBase, DatabaseTestMixin):
+    """Tests for filtering and summarizing estimates in SQL."""
+
+    def setUp(self):
+        """Create three estimates and mark one as accepted."""
+        super().setUp()
+        client_id = self.create_test_client()
+        service_id = self.create_test_service()
+        for day in (1, 2, 3):
+            save_estimate(client_id, service_id, day, f'2025-04-0{day}', '2025-05-01', 0, '', '',
+                          estimate_number_override=f'E-{day}')
+        with get_db_connection() as conn:
+            conn.execute("UPDATE estimates SET status = 'Accepted' WHERE estimate_number = 'E-2'")
+            conn.commit()
+
+    def test_status_filter_and_summary(self):
+        """Test the status filter and the per-status counts."""
+        # Act
+        accepted, _ = list_estimates({'year': 2025, 'status': 'Accepted'})
+        summary = summarize_estimates({'year': 2025})
+
+        # Assert
+        self.assertEqual([estimate['estimate_number'] for estimate in accepted], ['E-2'])
+        self.assertEqual(accepted[0]['client_name'], 'Test Client LLC')
+        self.assertEqual(summary['count'], 3)
+        self.assertEqual(summary['by_status'], {'Draft': 2, 'Accepted': 1})
+
+    def test_sort_by_number_ascending(self):
+        """Test a whitelisted sort key and direction."""
+        # Act
+        estimates, next_cursor = list_estimates(sort='number', direction='asc', limit=2)
+
+        # Assert
+        self.assertEqual([estimate['estimate_number'] for estimate in estimates], ['E-1', 'E-2'])
+        self.assertIsNotNone(next_cursor)
+
+
+if __name__ == '__main__':
+    unittest.main()
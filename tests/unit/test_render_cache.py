@@ -0,0 +1,78 @@
+"""
+Unit tests for the rendered document cache.
+"""
+import unittest
+from src.render_cache import RenderCache, make_etag
+
+
+class RenderCacheTests(unittest.TestCase):
+    """Tests for LRU bounds, invalidation and ETags."""
+
+    def test_evicts_least_recently_used_entry(self):
+        """Test the entry-count bound."""
+        # Arrange
+        cache = RenderCache(max_entries=2, max_bytes=1000)
+        cache.put('a', 'A')
+        cache.put('b', 'B')
+        cache.get('a')
+
+        # Act
+        cache.put('c', 'C')
+
+        # Assert
+        self.assertIsNotNone(cache.get('a'))
+        self.assertIsNone(cache.get('b'))
+        self.assertIsNotNone(cache.get('c'))
+
+    def test_evicts_to_stay_within_byte_budget(self):
+        """Test the total-size bound and that oversized documents are not stored."""
+        # Arrange
+        cache = RenderCache(max_entries=10, max_bytes=10)
+
+        # Act
+        cache.put('a', 'x' * 6)
+        cache.put('b', 'y' * 6)
+        document = cache.put('big', 'z' * 11)
+
+        # Assert
+        self.assertIsNone(cache.get('a'))
+        self.assertIsNotNone(cache.get('b'))
+        self.assertIsNone(cache.get('big'))
+        self.assertEqual(document.etag, make_etag('z' * 11))
+
+    def test_invalidate_matching_keys(self):
+        """Test dropping selected entries."""
+        # Arrange
+        cache = RenderCache(max_entries=10, max_bytes=1000)
+        cache.put(('db', 'F-1', 'h'), 'one')
+        cache.put(('db', 'F-2', 'h'), 'two')
+
+        # Act
+        cache.invalidate(lambda key: key[1] == 'F-1')
+
+        # Assert
+        self.assertIsNone(cache.get(('db', 'F-1', 'h')))
+        self.assertEqual(cache.get(('db', 'F-2', 'h')).body, 'two')
+
+    def test_put_after_invalidation_is_discarded(self):
+        """Test that a rendering started before an invalidation is not cached."""
+        # Arrange
+        cache = RenderCache(max_entries=10, max_bytes=1000)
+        generation = cache.generation
+        cache.invalidate()
+
+        # Act
+        cache.put('a', 'stale', generation)
+
+        # Assert
+        self.assertIsNone(cache.get('a'))
+
+    def test_etag_depends_on_content(self):
+        """Test that ETags identify the rendered content."""
+        # Act / Assert
+        self.assertEqual(make_etag('same'), make_etag('same'))
+        self.assertNotEqual(make_etag('one'), make_etag('two'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+"""
+Unit tests for document number sequences in the Invoice Generator.
+"""
+import unittest
+import sqlite3
+from unittest.mock import patch
+from tests.test_base import TestBase
+from src.models.db import get_db_connection
+from src.models.invoices import generate_invoice_number, get_invoice_period, save_invoice
+from src.models.sequences import allocate_document_numbers
+
+
+class SequenceTests(TestBase):
+    """Tests for counter-table document numbering."""
+
+    def test_invoice_numbers_increment_per_prefix(self):
+        """Test that invoice numbers are sequential per client prefix and period."""
+        # Arrange
+        client_id = self.create_test_client()  # 'Test Client LLC' -> 'TCL'
+        period = get_invoice_period()
+
+        # Act
+        first = generate_invoice_number(client_id)
+        second = generate_invoice_number(client_id)
+
+        # Assert
+        self.assertEqual(first, f'{period}-TCL-1')
+        self.assertEqual(second, f'{period}-TCL-2')
+
+    def test_bulk_allocation_returns_consecutive_numbers(self):
+        """Test reserving several estimate numbers at once."""
+        # Act
+        numbers = allocate_document_numbers('estimate', '2025-06', count=3)
+        following = allocate_document_numbers('estimate', '2025-06')
+
+        # Assert
+        self.assertEqual(numbers, ['2025-06-P001', '2025-06-P002', '2025-06-P003'])
+        self.assertEqual(following, ['2025-06-P004'])
+
+    def test_custom_number_format(self):
+        """Test that the invoice template can be overridden in the configuration."""
+        # Arrange
+        config = {'numbering': {'invoice_format': 'F{period}/{seq:04d}'}}
+
+        # Act
+        with patch('src.utils._get_cached_config', return_value=config):
+            number = allocate_document_numbers('invoice', '2506', prefix='ABC')[0]
+
+        # Assert
+        self.assertEqual(number, 'F2506/0001')
+
+    def test_invoice_numbers_are_unique(self):
+        """Test that the database rejects a duplicate invoice number."""
+        # Arrange
+        client_id = self.create_test_client()
+        service_id = self.create_test_service()
+        save_invoice(client_id, service_id, 1, '2025-06-01', 'DUP-1')
+
+        # Act / Assert
+        with self.assertRaises(sqlite3.IntegrityError):
+            save_invoice(client_id, service_id, 1, '2025-06-02', 'DUP-1')
+
+        with get_db_connection() as conn:
+            count = conn.execute("SELECT COUNT(*) FROM invoices WHERE invoice_number = 'DUP-1'").fetchone()[0]
+        self.assertEqual(count, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+"""
+Unit tests for the monthly invoice rollup and the statistics built on it.
+"""
+import unittest
+from tests.test_base import TestBase, DatabaseTestMixin
+from src.models.db import get_db_connection
+from src.models.invoices import save_invoice, delete_invoice
+from src.models.rollup import rebuild_invoice_rollup
+from src.models.stats import (
+    get_invoice_stats_by_month,
+    get_revenue_stats_by_month,
+    get_invoice_stats_by_client,
+    get_monthly_invoice_stats_by_client,
+    get_dashboard_stats
+)
+
+
+class InvoiceRollupTests(TestBase, DatabaseTestMixin):
+    """Tests for trigger-maintained monthly invoice totals."""
+
+    def setUp(self):
+        """Create a client, a service and a few invoices."""
+        super().setUp()
+        self.client_id = self.create_test_client()
+        self.service_id = self.create_test_service()  # 100.0 per unit
+        save_invoice(self.client_id, self.service_id, 1, '2025-03-04', 'R-1', apply_iva=False, apply_irpf=False)
+        save_invoice(self.client_id, self.service_id, 2, '2025-03-20', 'R-2', apply_iva=False, apply_irpf=False)
+        save_invoice(self.client_id, self.service_id, 3, '2025-05-01', 'R-3', apply_iva=False, apply_irpf=False)
+        save_invoice(self.client_id, self.service_id, 1, '2024-03-01', 'R-4', apply_iva=False, apply_irpf=False)
+
+    def _rollup_rows(self):
+        with get_db_connection() as conn:
+            return conn.execute('''
+            SELECT year, month, client_id, currency_code, invoice_count, subtotal, total_amount
+            FROM invoice_monthly_rollup ORDER BY year, month, client_id, currency_code
+            ''').fetchall()
+
+    def test_inserts_update_rollup(self):
+        """Test that saving invoices aggregates them per month."""
+        # Act
+        stats = get_invoice_stats_by_month(2025)
+        revenue = get_revenue_stats_by_month(2025)
+
+        # Assert
+        self.assertEqual(stats, [(3, 2), (5, 1)])
+        self.assertEqual(revenue, [(3, 300.0, '€'), (5, 300.0, '€')])
+
+    def test_delete_and_update_adjust_rollup(self):
+        """Test that deleting or moving an invoice keeps the rollup exact."""
+        # Act
+        delete_invoice('R-1')
+        with get_db_connection() as conn:
+            conn.execute("UPDATE invoices SET date = '2025-05-15' WHERE invoice_number = 'R-2'")
+            conn.commit()
+
+        # Assert
+        self.assertEqual(get_invoice_stats_by_month(2025), [(5, 2)])
+        self.assertEqual(get_revenue_stats_by_month(2025), [(5, 500.0, '€')])
+
+    def test_rebuild_matches_incremental_rollup(self):
+        """Test that a full rebuild produces the same rows as the triggers."""
+        # Arrange
+        incremental = self._rollup_rows()
+
+        # Act
+        rebuild_invoice_rollup()
+
+        # Assert
+        self.assertEqual(self._rollup_rows(), incremental)
+        self.assertRecordCount('invoice_monthly_rollup', 3)
+
+    def test_client_stats(self):
+        """Test the per-client statistics read from the rollup."""
+        # Act
+        by_client = get_invoice_stats_by_client(2025)
+        monthly = get_monthly_invoice_stats_by_client(2025)
+        all_years = get_invoice_stats_by_client()
+
+        # Assert
+        self.assertEqual(by_client, [('Test Client LLC', 3)])
+        self.assertEqual(monthly, [(3, 'Test Client LLC', 2), (5, 'Test Client LLC', 1)])
+        self.assertEqual(all_years, [('Test Client LLC', 4)])
+
+    def test_dashboard_stats_match_individual_stats(self):
+        """Test that the combined dashboard data agrees with the per-chart functions."""
+        # Act
+        data = get_dashboard_stats(2025)
+
+        # Assert
+        counts = [0] * 12
+        for month, count in get_invoice_stats_by_month(2025):
+            counts[month - 1] = count
+        self.assertEqual(data['invoice_stats']['counts'], counts)
+        self.assertEqual(data['revenue_stats']['amounts'][2], 300.0)
+        self.assertEqual(data['client_stats']['labels'], ['Test Client LLC'])
+        self.assertEqual(data['client_stats']['values'], [100])
+        self.assertEqual(data['client_monthly_stats']['series'][0]['data'][:5], [0, 0, 2, 0, 1])
+        self.assertEqual(data['totals'], {'invoices': 3, 'revenue': 600.0})
+
+
+if __name__ == '__main__':
+    unittest.main()